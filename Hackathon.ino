@@ -6,6 +6,12 @@
 
 #define READOUT_DELAY 20 // about 50 Hz
 
+// 주석을 해제하면 CSV 텍스트 대신 40바이트 바이너리 프레임을 전송합니다. (python/wire_protocol.py 참고)
+// #define USE_BINARY_FRAME
+// 바이너리 모드에서 한 UDP 패킷에 묶어 보낼 샘플 수 (1이면 샘플마다 전송, 10이면 200ms마다 한 번 전송)
+#define FRAME_BATCH_SIZE 10
+#define DEVICE_ID 1 // 여러 대를 구분하기 위한 장치 번호 (보드마다 다르게 설정)
+
 // --- Wi-Fi 및 서버 정보 (사용자 환경에 맞게 수정) ---
 const char* ssid = "hotspot";
 const char* password = "12341234";
@@ -23,6 +29,75 @@ GPSdata gpsData(GPS_RX_PIN, GPS_TX_PIN);
 // 전송할 데이터를 담을 버퍼 (String 객체보다 훨씬 효율적)
 char packetBuffer[256]; 
 
+// --- 바이너리 프레임 (버전 1, 리틀 엔디언, 패딩 없음) ---
+// lat/lon 은 1e-7도 단위, 가속도는 mg, 자이로는 0.01 deg/s, 지자기는 0.1 uT 단위 정수로 보냅니다.
+#define FRAME_VERSION 1
+#define FRAME_KIND_SAMPLE 1
+#define FRAME_KIND_BATCH 2
+
+struct __attribute__((packed)) FrameHeader {
+  char magic[2];      // 'H', 'K'
+  uint8_t version;
+  uint8_t kind;
+  uint16_t deviceId;
+  uint32_t seq;       // 프레임마다 1씩 증가 (서버에서 손실 감지용). 배치는 첫 샘플의 번호
+  uint32_t millis;    // 장치 millis(). 배치는 첫 샘플의 시각
+};
+
+struct __attribute__((packed)) SamplePayload {
+  int32_t lat;
+  int32_t lon;
+  int16_t ax, ay, az;
+  int16_t gx, gy, gz;
+  int16_t mx, my, mz;
+};
+
+// 샘플 1개짜리 프레임 (40 바이트)
+struct __attribute__((packed)) SampleFrame {
+  FrameHeader header;
+  SamplePayload payload;
+};
+
+// 배치 프레임: BatchHeader 뒤에 BatchSample 이 count 개 이어집니다.
+struct __attribute__((packed)) BatchHeader {
+  FrameHeader header;
+  uint8_t count;
+  uint8_t reserved;
+};
+
+struct __attribute__((packed)) BatchSample {
+  uint16_t offsetMs;  // 배치 첫 샘플로부터의 시간 차이 (ms)
+  SamplePayload payload;
+};
+
+uint32_t frameSeq = 0;
+
+BatchSample batchSamples[FRAME_BATCH_SIZE];
+uint8_t batchCount = 0;
+uint32_t batchStartSeq = 0;
+uint32_t batchStartMillis = 0;
+
+int16_t toInt16(float value, float scale) {
+  return (int16_t)constrain(lroundf(value * scale), -32768L, 32767L);
+}
+
+void fillHeader(FrameHeader& header, uint8_t kind, uint32_t seq, uint32_t timeMs) {
+  header.magic[0] = 'H'; header.magic[1] = 'K';
+  header.version = FRAME_VERSION;
+  header.kind = kind;
+  header.deviceId = DEVICE_ID;
+  header.seq = seq;
+  header.millis = timeMs;
+}
+
+void fillPayload(SamplePayload& payload, float lat, float lon, xyzFloat& acc, xyzFloat& gyr, xyzFloat& mag) {
+  payload.lat = lround((double)lat * 1e7);
+  payload.lon = lround((double)lon * 1e7);
+  payload.ax = toInt16(acc.x, 1000); payload.ay = toInt16(acc.y, 1000); payload.az = toInt16(acc.z, 1000);
+  payload.gx = toInt16(gyr.x, 100); payload.gy = toInt16(gyr.y, 100); payload.gz = toInt16(gyr.z, 100);
+  payload.mx = toInt16(mag.x, 10); payload.my = toInt16(mag.y, 10); payload.mz = toInt16(mag.z, 10);
+}
+
 void setup() {
   Serial.begin(115200);
 
@@ -106,6 +181,41 @@ void loop() {
     xyzFloat gyr = myMPU9250.getGyrValues();
     xyzFloat magValue = myMPU9250.getMagValues();
 
+#ifdef USE_BINARY_FRAME
+#if FRAME_BATCH_SIZE > 1
+    // 샘플을 모았다가 FRAME_BATCH_SIZE 개가 되면 한 패킷으로 전송
+    if (batchCount == 0) {
+      batchStartSeq = frameSeq;
+      batchStartMillis = currentTime;
+    }
+    BatchSample& sample = batchSamples[batchCount++];
+    sample.offsetMs = (uint16_t)(currentTime - batchStartMillis);
+    fillPayload(sample.payload, lastLat, lastLon, gValue, gyr, magValue); // 1초마다 갱신되는 GPS 값 사용
+    frameSeq++;
+
+    if (batchCount == FRAME_BATCH_SIZE) {
+      BatchHeader batchHeader;
+      fillHeader(batchHeader.header, FRAME_KIND_BATCH, batchStartSeq, batchStartMillis);
+      batchHeader.count = batchCount;
+      batchHeader.reserved = 0;
+
+      udp.beginPacket(serverIP, serverPort);
+      udp.write((const uint8_t*)&batchHeader, sizeof(batchHeader));
+      udp.write((const uint8_t*)batchSamples, sizeof(BatchSample) * batchCount);
+      udp.endPacket();
+      batchCount = 0;
+    }
+#else
+    SampleFrame frame;
+    fillHeader(frame.header, FRAME_KIND_SAMPLE, frameSeq++, currentTime);
+    fillPayload(frame.payload, lastLat, lastLon, gValue, gyr, magValue); // 1초마다 갱신되는 GPS 값 사용
+
+    // UDP 패킷 전송
+    udp.beginPacket(serverIP, serverPort);
+    udp.write((const uint8_t*)&frame, sizeof(frame));
+    udp.endPacket();
+#endif
+#else
     // 데이터를 char 배열 버퍼에 포맷팅 (가장 최근 GPS 값 사용)
     snprintf(packetBuffer, sizeof(packetBuffer), 
              "%.6f,%.6f,%.2f,%.2f,%.2f,%.2f,%.2f,%.2f,%.2f,%.2f,%.2f",
@@ -121,5 +231,6 @@ void loop() {
 
     // --- (디버깅 시에만 사용) ---
     Serial.println(packetBuffer);
+#endif
   }
 }
\ No newline at end of file
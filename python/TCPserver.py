@@ -1,18 +1,28 @@
-import socket
+# TCPserver.py
+# 여러 보드의 TCP 연결을 동시에 받는 스트림 수신 서버입니다. (UDP 손실이 큰 현장용 대체 전송 경로)
+# 연결마다 재조립 버퍼를 두고 줄바꿈(CSV 텍스트) 또는 바이너리 헤더 길이 기준으로 프레임을 잘라,
+# ingest_server.py 의 UDP 경로와 같은 로그/특징 파이프라인으로 넘깁니다.
+
+import asyncio
+
+from ingest_server import IngestServer, LOG_DIR
 
 HOST = '0.0.0.0'  # 모든 인터페이스에서 수신
 PORT = 65000       # 아두이노에서 연결할 포트
 
-with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-    s.bind((HOST, PORT))
-    s.listen(1)
+
+async def main():
+    server = IngestServer(LOG_DIR)
+    await server.start_tcp(HOST, PORT)
     print("Waiting for Arduino...")
-    conn, addr = s.accept()
-    print(f"Connected by {addr}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        server.close()
+
 
-    with conn:
-        while True:
-            data = conn.recv(1024).decode('utf-8')
-            print(data.strip())  # 여기서 데이터 저장/실시간 처리 가능
-            frame = data.strip().split(',') # lat, lon, ax, ay, az, gx, gy, gz, mx, my, mz
-            
\ No newline at end of file
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n🛑 서버를 종료합니다.")
@@ -1,9 +1,14 @@
 import pandas as pd
 import numpy as np
 import folium
-from filterpy.kalman import KalmanFilter
-from filterpy.common import Q_discrete_white_noise
-from scipy.signal import find_peaks
+
+from chunked_pipeline import KalmanStage, PdrStage, RowFilter, WindowFeatureStage, ZoneAnalysisPipeline, ZoneStage
+from kalman import kalman_track_fixes
+from pdr import constant_step_length, detect_steps, pdr_path, weinberg_step_length
+from sensor_features import FRAME_COLUMNS, window_features
+from sensor_log import iter_sensor_log, load_sensor_log
+import stage_profiler
+from track_simplify import add_tracks_with_lod
 import matplotlib.pyplot as plt
 
 # ---------------------------
@@ -15,6 +20,16 @@ IS_INDOOR_MODE = True
 # 분석할 로그 파일 경로
 INPUT_CSV_PATH = 'sensor_log_2025-09-25_01-13-54.csv' # 분석할 실제 파일명으로 변경하세요.
 
+# 분석할 시간 구간 (예: '2025-09-25 01:20:00'). None 이면 처음/끝까지.
+# 세션 파일(.bin)이나 Parquet 로그는 이 구간만 디스크에서 읽습니다.
+ANALYSIS_START = None
+ANALYSIS_END = None
+
+# True 면 로그를 CHUNK_ROWS 행씩 나눠 읽으며 분석합니다. (메모리보다 큰 로그용, 구역 결과는 같음)
+# 이 모드에서 경로는 실내는 걸음마다, 실외는 GPS fix 마다 한 점으로 그립니다.
+CHUNKED_MODE = False
+CHUNK_ROWS = 200_000
+
 # 결과 저장 파일 경로
 OUTPUT_ZONES_CSV_PATH = 'special_zones_output.csv'
 OUTPUT_MAP_PATH_OUTDOOR = 'mobility_map_outdoor.html'
@@ -35,21 +50,32 @@ SAMPLING_PERIOD = 0.02
 # 가슴의 상하 움직임은 발의 충격보다 작으므로, prominence를 낮게 설정합니다.
 PDR_PEAK_PROMINENCE = 0.15 
 PDR_STEP_INTERVAL = int(0.4 / SAMPLING_PERIOD)
+# 걸음 피크의 prominence 를 계산할 구간 길이 (샘플). 이 구간 밖의 신호는 걸음 판정에 영향을 주지 않습니다.
+PDR_PEAK_WLEN = int(4.0 / SAMPLING_PERIOD)
 PDR_STEP_LENGTH = 0.65 
+# 보폭 모델: 고정 보폭(PDR_STEP_LENGTH) 또는 weinberg_step_length(k) (걸음마다 az 진폭으로 보폭 추정)
+PDR_STEP_MODEL = constant_step_length(PDR_STEP_LENGTH)
 
 # ▼▼▼ 실외 칼만 필터 튜닝 값 ▼▼▼
 KALMAN_R_VAL = 20; KALMAN_Q_VAL = 0.01
+KALMAN_SMOOTH = False  # True 면 RTS 역방향 스무딩까지 적용
+POSITION_JOIN = 'asof'  # 보정된 GPS fix 를 IMU 행에 붙이는 방식: 'asof'(직전 fix) 또는 'interp'(fix 사이 선형 보간)
 KOREA_BOUNDS = {'lat_min': 33.0, 'lat_max': 39.0, 'lon_min': 124.0, 'lon_max': 130.0}
 ZONE_RADIUS = 5
 
+# 단계별 실행 시간 / CPU 시간 / 최대 메모리 / 행 수 기록 (stage_profiler.py). 파일 경로를 주면 분석이 끝난 뒤 저장합니다.
+PROFILE_TRACE_PATH = None      # 예: 'profile_trace.json'
+PROFILE_CHROME_TRACE = False   # True 면 chrome://tracing, Perfetto 에서 여는 형식으로 저장
+PROFILE_CPROFILE_PATH = None   # 예: 'profile.prof' (함수별 시간, python -m pstats 로 열기)
+
 # =================================================================================
 # 실내 경로 추정 (PDR) 및 시각화 함수
 # =================================================================================
+@stage_profiler.stage()
 def calculate_pdr_path(df):
     print("\n--- GPS 없이 실내 경로 추정(PDR)을 시작합니다 ---")
     pdr_df = df.copy()
-    az_smooth = pdr_df['az'].rolling(window=5, center=True).mean().fillna(0)
-    steps_indices, _ = find_peaks(az_smooth, prominence=PDR_PEAK_PROMINENCE, distance=PDR_STEP_INTERVAL)
+    steps_indices, az_smooth = detect_steps(pdr_df['az'], PDR_PEAK_PROMINENCE, PDR_STEP_INTERVAL, PDR_PEAK_WLEN)
     
     if len(steps_indices) < 2:
         print("경로를 추정하기에 걸음 수가 부족합니다. PDR_PEAK_PROMINENCE 값을 조절해보세요.")
@@ -58,29 +84,11 @@ def calculate_pdr_path(df):
 
     print(f"PDR: 총 {len(steps_indices)}개의 걸음이 감지되었습니다.")
 
-    gz_rad = np.deg2rad(pdr_df['gz'])
-    heading = 0.0; pos_x = 0.0; pos_y = 0.0
-    positions = np.zeros((len(pdr_df), 2))
-    
-    for i in range(1, len(steps_indices)):
-        start_idx = steps_indices[i-1]
-        end_idx = steps_indices[i]
-        
-        heading_change = gz_rad.iloc[start_idx:end_idx].sum() * SAMPLING_PERIOD
-        heading += heading_change
-        
-        pos_x += PDR_STEP_LENGTH * np.cos(heading)
-        pos_y += PDR_STEP_LENGTH * np.sin(heading)
-        
-        prev_pos_x = positions[start_idx-1, 0]
-        prev_pos_y = positions[start_idx-1, 1]
-        for j in range(start_idx, end_idx):
-            ratio = (j - start_idx) / (end_idx - start_idx)
-            positions[j, 0] = prev_pos_x + (pos_x - prev_pos_x) * ratio
-            positions[j, 1] = prev_pos_y + (pos_y - prev_pos_y) * ratio
-            
-    positions[steps_indices[-1]:, :] = positions[steps_indices[-1]-1, :]
+    # 걸음마다 보폭 -> 자이로 누적 적분으로 방향 -> 걸음 위치 누적 합 -> 샘플 위치 보간 (모두 배열 연산, pdr.py)
+    step_lengths = PDR_STEP_MODEL(az_smooth, steps_indices)
+    positions, _, _ = pdr_path(pdr_df['gz'], steps_indices, step_lengths, SAMPLING_PERIOD)
     pdr_df['pos_x'] = positions[:, 0]; pdr_df['pos_y'] = positions[:, 1]
+    print(f"PDR: 총 이동 거리 약 {step_lengths.sum():.1f}m (평균 보폭 {step_lengths.mean():.2f}m)")
     return pdr_df
 
 def plot_indoor_path_matplotlib(pdr_df, zones_df):
@@ -88,49 +96,66 @@ def plot_indoor_path_matplotlib(pdr_df, zones_df):
         print("시각화할 경로 데이터가 없습니다."); return
 
     print(f"\n--- Matplotlib으로 실내 경로 및 특이 지점 시각화를 시작합니다 ---")
-    fig, ax = plt.subplots(figsize=(10, 10))
-    ax.plot(pdr_df['pos_x'], pdr_df['pos_y'], color='lightblue', linewidth=3, label='Estimated Full Path', zorder=1)
-    ax.scatter(pdr_df['pos_x'].iloc[0], pdr_df['pos_y'].iloc[0], c='green', s=150, label='Start', zorder=5, edgecolors='black')
-    ax.scatter(pdr_df['pos_x'].iloc[-1], pdr_df['pos_y'].iloc[-1], c='black', s=200, marker='X', label='End', zorder=5)
+    # 그래프 창이 닫힐 때까지 기다리는 시간(plt.show)은 단계 시간에 넣지 않습니다.
+    with stage_profiler.span('plot_indoor_path_matplotlib', rows=pdr_df):
+        fig, ax = plt.subplots(figsize=(10, 10))
+        ax.plot(pdr_df['pos_x'], pdr_df['pos_y'], color='lightblue', linewidth=3, label='Estimated Full Path', zorder=1)
+        ax.scatter(pdr_df['pos_x'].iloc[0], pdr_df['pos_y'].iloc[0], c='green', s=150, label='Start', zorder=5, edgecolors='black')
+        ax.scatter(pdr_df['pos_x'].iloc[-1], pdr_df['pos_y'].iloc[-1], c='black', s=200, marker='X', label='End', zorder=5)
 
-    if zones_df is not None and not zones_df.empty:
-        stair_zones = zones_df[zones_df['type'].str.contains('Stair')]
-        ramp_zones = zones_df[zones_df['type'].str.contains('Ramp')]
-        ax.scatter(stair_zones['pos_x'], stair_zones['pos_y'], c='red', s=100, marker='^', label='Stair/Bump Zones', zorder=10, edgecolors='black')
-        ax.scatter(ramp_zones['pos_x'], ramp_zones['pos_y'], c='orange', s=120, marker='s', label='Ramp Zones', zorder=10, edgecolors='black')
+        if zones_df is not None and not zones_df.empty:
+            stair_zones = zones_df[zones_df['type'].str.contains('Stair')]
+            ramp_zones = zones_df[zones_df['type'].str.contains('Ramp')]
+            ax.scatter(stair_zones['pos_x'], stair_zones['pos_y'], c='red', s=100, marker='^', label='Stair/Bump Zones', zorder=10, edgecolors='black')
+            ax.scatter(ramp_zones['pos_x'], ramp_zones['pos_y'], c='orange', s=120, marker='s', label='Ramp Zones', zorder=10, edgecolors='black')
 
-    ax.set_title('Indoor Path Estimation (PDR) with Special Zones', fontsize=16)
-    ax.set_xlabel('X Position (m)'); ax.set_ylabel('Y Position (m)')
-    ax.set_aspect('equal', adjustable='box'); ax.legend(); ax.grid(True)
-    plt.savefig(OUTPUT_MAP_PATH_INDOOR); print(f"실내 경로 지도를 '{OUTPUT_MAP_PATH_INDOOR}' 파일로 저장했습니다."); plt.show()
+        ax.set_title('Indoor Path Estimation (PDR) with Special Zones', fontsize=16)
+        ax.set_xlabel('X Position (m)'); ax.set_ylabel('Y Position (m)')
+        ax.set_aspect('equal', adjustable='box'); ax.legend(); ax.grid(True)
+        plt.savefig(OUTPUT_MAP_PATH_INDOOR); print(f"실내 경로 지도를 '{OUTPUT_MAP_PATH_INDOOR}' 파일로 저장했습니다.")
+    plt.show()
 
 # =================================================================================
 # 실외 경로 추정 (GPS) 및 공통 분석 함수
 # =================================================================================
+@stage_profiler.stage()
 def apply_kalman_filter(df):
-    kf_lat = KalmanFilter(dim_x=2, dim_z=1)
-    kf_lat.F = np.array([[1., 1.], [0., 1.]]); kf_lat.H = np.array([[1., 0.]]); kf_lat.R = KALMAN_R_VAL
-    kf_lat.Q = Q_discrete_white_noise(dim=2, dt=1., var=KALMAN_Q_VAL); kf_lat.x = np.array([[df['lat'].iloc[0]], [0.]])
-    kf_lon = KalmanFilter(dim_x=2, dim_z=1)
-    kf_lon.F = np.array([[1., 1.], [0., 1.]]); kf_lon.H = np.array([[1., 0.]]); kf_lon.R = KALMAN_R_VAL
-    kf_lon.Q = Q_discrete_white_noise(dim=2, dt=1., var=KALMAN_Q_VAL); kf_lon.x = np.array([[df['lon'].iloc[0]], [0.]])
-    lat_filtered, lon_filtered = [], []
-    for _, row in df.iterrows():
-        kf_lat.predict(); kf_lat.update(row['lat']); lat_filtered.append(kf_lat.x[0, 0])
-        kf_lon.predict(); kf_lon.update(row['lon']); lon_filtered.append(kf_lon.x[0, 0])
-    df['lat_filtered'] = lat_filtered; df['lon_filtered'] = lon_filtered
-    print("칼만 필터 적용 완료."); return df
+    # 반복 기록된 좌표 중 새 GPS fix 만 필터링하고, 결과를 IMU 행에 다시 붙입니다.
+    coords, fix_count = kalman_track_fixes(df[['lat', 'lon']].to_numpy(dtype=np.float64), KALMAN_R_VAL, KALMAN_Q_VAL,
+                                           smooth=KALMAN_SMOOTH, join=POSITION_JOIN)
+    df['lat_filtered'] = coords[:, 0]; df['lon_filtered'] = coords[:, 1]
+    print(f"칼만 필터 적용 완료. (GPS fix {fix_count}개 / {len(df)}행)"); return df
+
+def valid_gps_rows(df):
+    """비어 있거나 0 이거나 한반도 범위를 벗어난 GPS 좌표 행을 제거합니다. (행마다 독립적인 조건)"""
+    df = df.dropna(subset=['lat', 'lon'])
+    df = df[(df['lat'] != 0) & (df['lon'] != 0)]
+    return df[(df['lat'] >= KOREA_BOUNDS['lat_min']) & (df['lat'] <= KOREA_BOUNDS['lat_max']) &
+              (df['lon'] >= KOREA_BOUNDS['lon_min']) & (df['lon'] <= KOREA_BOUNDS['lon_max'])].reset_index(drop=True)
+
+def pdr_feature_frame(pdr_df):
+    """
+    PDR 결과에서 특징 추출에 필요한 컬럼만 명시적으로 선택합니다. (timestamp 등 다른 타입의 데이터가 섞이지 않도록)
+    PDR 좌표는 특징 추출 함수가 이해할 수 있도록 lat, lon 으로 이름을 바꿉니다.
+    """
+    imu_cols = ['ax', 'ay', 'az', 'gx', 'gy', 'gz', 'mx', 'my', 'mz']
+    pdr_cols = ['pos_x', 'pos_y']
+    return pdr_df[imu_cols + pdr_cols].rename(columns={'pos_x': 'lat', 'pos_y': 'lon'})
 
 # ---------------------------
 # 1. CSV 파일 로드 및 특징 추출 (수정된 최종 버전)
 # ---------------------------
-def analyze_log_file(filepath, is_indoor=False):
+@stage_profiler.stage(rows=lambda result: result[1])
+def analyze_log_file(filepath, is_indoor=False, t0=None, t1=None):
     """
     CSV 파일을 로드하고 분석합니다. is_indoor 플래그에 따라 GPS 처리 또는 PDR을 수행합니다.
+    t0, t1 을 주면 그 시간 구간만 분석합니다.
     """
     print(f"'{filepath}' 파일을 분석합니다...")
     try:
-        df = pd.read_csv(filepath)
+        with stage_profiler.span('load_sensor_log') as span:
+            df = load_sensor_log(filepath, columns=FRAME_COLUMNS, t0=t0, t1=t1)
+            span.rows = len(df)
     except FileNotFoundError:
         print(f"오류: 파일을 찾을 수 없습니다. -> {filepath}"); return None, None
     
@@ -138,48 +163,65 @@ def analyze_log_file(filepath, is_indoor=False):
         # 실내 모드: PDR 경로 계산
         pdr_df = calculate_pdr_path(df)
         
-        # ▼▼▼ 여기가 핵심 수정 부분입니다 ▼▼▼
-        # 특징 추출에 필요한 컬럼만 명시적으로 선택합니다.
-        # 이렇게 하면 timestamp 등 다른 타입의 데이터가 섞이는 것을 원천적으로 방지합니다.
-        imu_cols = ['ax', 'ay', 'az', 'gx', 'gy', 'gz', 'mx', 'my', 'mz']
-        pdr_cols = ['pos_x', 'pos_y']
-        
-        # 필요한 컬럼만으로 새로운 데이터프레임을 생성
-        feature_coord_df = pdr_df[imu_cols + pdr_cols].copy()
-        
-        # PDR 좌표를 특징 추출 함수가 이해할 수 있도록 lat, lon으로 이름 변경
-        feature_coord_df.rename(columns={'pos_x': 'lat', 'pos_y': 'lon'}, inplace=True)
-        # ▲▲▲ 수정 완료 ▲▲▲
-
+        feature_coord_df = pdr_feature_frame(pdr_df)
         processed_df = pdr_df # 시각화를 위한 전체 데이터는 그대로 유지
+        coord_cols = ('lat', 'lon')
 
     else:
         # 실외 모드 (기존 로직과 동일)
-        df.dropna(subset=['lat', 'lon'], inplace=True)
-        df = df[(df['lat'] != 0) & (df['lon'] != 0)]
-        df = df[(df['lat'] >= KOREA_BOUNDS['lat_min']) & (df['lat'] <= KOREA_BOUNDS['lat_max']) &
-                (df['lon'] >= KOREA_BOUNDS['lon_min']) & (df['lon'] <= KOREA_BOUNDS['lon_max'])].reset_index(drop=True)
+        df = valid_gps_rows(df)
         if df.empty: print("오류: 유효한 GPS 데이터가 없습니다."); return None, None
         processed_df = apply_kalman_filter(df.copy())
-        feature_coord_df = processed_df.rename(columns={'lat_filtered': 'lat', 'lon_filtered': 'lon'})
-    
-    # 공통 특징 추출 로직 (수정 없음)
-    features_list = []
-    for i in range(0, len(feature_coord_df) - WINDOW_SIZE, STEP_SIZE):
-        window = feature_coord_df.iloc[i:i + WINDOW_SIZE].copy()
-        for col in ['ax', 'ay', 'az']: window[f'{col}_smooth'] = window[col].rolling(window=2).mean()
-        window.dropna(inplace=True)
-        if window.empty: continue
-        z_acc_var = window[f'az_smooth'].var()
-        pitch_y_rad = np.mean(np.arctan2(window['ax_smooth'], np.sqrt(window['ay_smooth']**2 + window['az_smooth']**2)))
-        mean_pitch_absolute = np.abs(pitch_y_rad)
-        features_list.append({'z_variance': z_acc_var, 'mean_pitch': mean_pitch_absolute,
-                              'lat': window['lat'].median(), 'lon': window['lon'].median()})
-
-    return pd.DataFrame(features_list), processed_df
+        # 칼만 필터로 보정된 좌표의 중앙값을 특징 좌표로 사용합니다.
+        feature_coord_df = processed_df
+        coord_cols = ('lat_filtered', 'lon_filtered')
 
-def process_and_cluster_zones(feature_df):
-    if feature_df is None or feature_df.empty: return None
+    # 공통 특징 추출 로직: 모든 윈도우를 한 번에 계산합니다.
+    with stage_profiler.span('window_features', rows=len(feature_coord_df)):
+        features = window_features(feature_coord_df, WINDOW_SIZE, STEP_SIZE, *coord_cols)
+    return features, processed_df
+
+@stage_profiler.stage()
+def analyze_log_file_chunked(filepath, is_indoor=False, t0=None, t1=None):
+    """
+    analyze_log_file + process_and_cluster_zones 를 CHUNK_ROWS 행씩 읽으며 수행합니다. (메모리보다 큰 로그용, chunked_pipeline.py)
+    구역은 확정되는 대로 출력합니다. 반환값은 (구역 DataFrame 또는 None, 경로 DataFrame) 이고,
+    경로는 실내 모드면 걸음마다의 pos_x/pos_y, 실외 모드면 GPS fix 마다의 원본/보정 좌표입니다.
+    """
+    print(f"'{filepath}' 파일을 {CHUNK_ROWS}행씩 나눠 분석합니다...")
+    if is_indoor:
+        print("\n--- GPS 없이 실내 경로 추정(PDR)을 시작합니다 ---")
+        track = PdrStage(PDR_PEAK_PROMINENCE, PDR_STEP_INTERVAL, PDR_PEAK_WLEN, PDR_STEP_MODEL, SAMPLING_PERIOD)
+        row_stages = [track, RowFilter(pdr_feature_frame)]
+        coord_cols = ('lat', 'lon')
+    else:
+        if KALMAN_SMOOTH: print("참고: 나눠 읽기 모드에서는 RTS 스무딩 없이 칼만 필터만 적용합니다.")
+        row_filter = RowFilter(valid_gps_rows)
+        track = KalmanStage(KALMAN_R_VAL, KALMAN_Q_VAL, POSITION_JOIN)
+        row_stages = [row_filter, track]
+        coord_cols = ('lat_filtered', 'lon_filtered')
+    zone_stage = ZoneStage(cluster_zones, {'z_variance': VAR_THRESHOLD, 'mean_pitch': PITCH_THRESHOLD})
+    pipeline = ZoneAnalysisPipeline(row_stages, WindowFeatureStage(WINDOW_SIZE, STEP_SIZE, *coord_cols), zone_stage)
+    try:
+        for _, zones in pipeline.run(iter_sensor_log(filepath, CHUNK_ROWS, columns=FRAME_COLUMNS, t0=t0, t1=t1)):
+            for zone in zones:
+                print(f" - {zone['type']} 발견: ({zone['lat']:.6f}, {zone['lon']:.6f})")
+    except FileNotFoundError:
+        print(f"오류: 파일을 찾을 수 없습니다. -> {filepath}"); return None, None
+    stage_profiler.set_rows((row_stages[1] if is_indoor else row_filter).rows_in)
+
+    if is_indoor:
+        if track.step_count >= 2:
+            print(f"PDR: 총 {track.step_count}개의 걸음이 감지되었습니다.")
+    else:
+        if row_filter.rows_out == 0: print("오류: 유효한 GPS 데이터가 없습니다."); return None, None
+        print(f"칼만 필터 적용 완료. (GPS fix {track.fix_count}개 / {row_filter.rows_out}행)")
+        if track.ffill_rows: print(f"GPS fix 가 오래 바뀌지 않아 {track.ffill_rows}행은 보간 대신 직전 fix 값을 붙였습니다.")
+    print(f"특징 윈도우 {zone_stage.feature_count}개를 분석했습니다.")
+    return report_zones(zone_stage.zones()), track.path()
+
+def cluster_zones(feature_df):
+    """특징 DataFrame 에서 계단/경사로 구역을 찾아 dict 목록으로 반환합니다. (출력/저장 없음)"""
     # 가슴 부착 센서에 맞는 단순 임계값 기반 로직
     feature_df['is_stair'] = feature_df['z_variance'] > VAR_THRESHOLD
     feature_df['is_ramp'] = feature_df['mean_pitch'] > PITCH_THRESHOLD
@@ -198,16 +240,23 @@ def process_and_cluster_zones(feature_df):
         if len(cluster_df) >= MIN_POINTS_IN_CLUSTER:
             if not (feature_df.loc[cluster_df.index]['is_stair']).any():
                  zone_summary_list.append({'type': 'Ramp Zone', 'lat': cluster_df['lat'].mean(), 'lon': cluster_df['lon'].mean()})
+    return zone_summary_list
+
+@stage_profiler.stage()
+def process_and_cluster_zones(feature_df):
+    if feature_df is None or feature_df.empty: return None
+    return report_zones(pd.DataFrame(cluster_zones(feature_df)))
 
-    if not zone_summary_list:
+def report_zones(zones_df):
+    if zones_df.empty:
         print("분석 결과, 기준을 만족하는 특이 구역(Zone)이 발견되지 않았습니다."); return None
         
-    zones_df = pd.DataFrame(zone_summary_list)
     print(f"\n총 {len(zones_df)}개의 특이 구역(Zone)을 발견했습니다."); print(zones_df)
     zones_df.to_csv(OUTPUT_ZONES_CSV_PATH, index=False)
     print(f"특이 구역 정보를 '{OUTPUT_ZONES_CSV_PATH}' 파일에 저장했습니다.")
     return zones_df
 
+@stage_profiler.stage()
 def create_map_with_zones(zones_df, original_df):
     if (zones_df is None or zones_df.empty) and (original_df is None or original_df.empty):
         print("지도에 표시할 데이터가 없습니다."); return
@@ -216,10 +265,10 @@ def create_map_with_zones(zones_df, original_df):
     m = folium.Map(location=map_center, zoom_start=18)
 
     if not original_df.empty:
-        points_raw = original_df[['lat', 'lon']].values.tolist()
-        folium.PolyLine(points_raw, color='gray', weight=2.5, opacity=0.8, popup='Raw GPS Path').add_to(m)
-        points_filtered = original_df[['lat_filtered', 'lon_filtered']].values.tolist()
-        folium.PolyLine(points_filtered, color='blue', weight=5, opacity=0.8, popup='Kalman Filtered Path').add_to(m)
+        # 줌 단계별로 단순화한 경로 선 (track_simplify.py)
+        add_tracks_with_lod(m, [
+            (original_df['lat'], original_df['lon'], dict(color='gray', weight=2.5, opacity=0.8, popup='Raw GPS Path')),
+            (original_df['lat_filtered'], original_df['lon_filtered'], dict(color='blue', weight=5, opacity=0.8, popup='Kalman Filtered Path'))])
 
     if zones_df is not None and not zones_df.empty:
         for idx, row in zones_df.iterrows():
@@ -232,20 +281,29 @@ def create_map_with_zones(zones_df, original_df):
 # 메인 코드 실행
 # =================================================================================
 if __name__ == "__main__":
-    
+    if PROFILE_TRACE_PATH or PROFILE_CPROFILE_PATH:
+        stage_profiler.enable(PROFILE_TRACE_PATH, PROFILE_CHROME_TRACE, PROFILE_CPROFILE_PATH)
+
     if IS_INDOOR_MODE:
         print("====== [실내 모드]로 분석을 시작합니다. ======")
-        features, pdr_data_with_path = analyze_log_file(INPUT_CSV_PATH, is_indoor=True)
+        if CHUNKED_MODE:
+            zones, pdr_data_with_path = analyze_log_file_chunked(INPUT_CSV_PATH, is_indoor=True, t0=ANALYSIS_START, t1=ANALYSIS_END)
+        else:
+            features, pdr_data_with_path = analyze_log_file(INPUT_CSV_PATH, is_indoor=True, t0=ANALYSIS_START, t1=ANALYSIS_END)
+            zones = process_and_cluster_zones(features) if pdr_data_with_path is not None else None
 
         if pdr_data_with_path is not None:
-            zones = process_and_cluster_zones(features)
             if zones is not None:
                 zones.rename(columns={'lat': 'pos_x', 'lon': 'pos_y'}, inplace=True)
             plot_indoor_path_matplotlib(pdr_data_with_path, zones)
     else:
         print("====== [실외 모드]로 분석을 시작합니다. ======")
-        features, original_data_with_filter = analyze_log_file(INPUT_CSV_PATH, is_indoor=False)
-        
+        if CHUNKED_MODE:
+            zones, original_data_with_filter = analyze_log_file_chunked(INPUT_CSV_PATH, is_indoor=False, t0=ANALYSIS_START, t1=ANALYSIS_END)
+        else:
+            features, original_data_with_filter = analyze_log_file(INPUT_CSV_PATH, is_indoor=False, t0=ANALYSIS_START, t1=ANALYSIS_END)
+            zones = process_and_cluster_zones(features) if original_data_with_filter is not None else None
+
         if original_data_with_filter is not None:
-            zones = process_and_cluster_zones(features)
-            create_map_with_zones(zones, original_data_with_filter)
\ No newline at end of file
+            create_map_with_zones(zones, original_data_with_filter)
+    stage_profiler.finish()
@@ -1,16 +1,39 @@
+import os
+
 import pandas as pd
 import numpy as np
 import folium
-from filterpy.kalman import KalmanFilter
-from filterpy.common import Q_discrete_white_noise
 from scipy.signal import find_peaks
 
+from chunked_pipeline import KalmanStage, RowFilter, WindowFeatureStage, ZoneAnalysisPipeline, ZoneStage
+from kalman import kalman_track_fixes
+from sensor_features import FRAME_COLUMNS, window_features
+from sensor_log import iter_sensor_log, load_sensor_log
+import stage_profiler
+from track_simplify import add_tracks_with_lod
+from zone_store import ZoneStore
+
 # ---------------------------
 # 설정
 # ---------------------------
 INPUT_CSV_PATH = 'sensor_log_2025-09-26_06-17-39.csv' # 실제 파일명으로 변경하세요.
+# 분석할 시간 구간 (예: '2025-09-26 06:20:00'). None 이면 처음/끝까지.
+# 세션 파일(.bin)이나 Parquet 로그는 이 구간만 디스크에서 읽습니다.
+ANALYSIS_START = None
+ANALYSIS_END = None
+# True 면 로그를 CHUNK_ROWS 행씩 나눠 읽으며 분석합니다. (메모리보다 큰 로그용, 결과는 같음)
+# 이 모드에서는 지도 경로를 GPS fix 마다 한 점으로 그리고, 전체 신호가 필요한 보행 분석(4단계)은 건너뜁니다.
+CHUNKED_MODE = False
+CHUNK_ROWS = 200_000
+
 OUTPUT_ZONES_CSV_PATH = 'special_zones_kalman.csv'
 OUTPUT_MAP_PATH = 'mobility_map_kalman.html'
+# 찾은 구역을 여러 세션의 구역 지도 데이터베이스(zone_store.py)에도 합칩니다. None 이면 합치지 않습니다. (예: 'zone_map.db')
+ZONE_DB_PATH = None
+# 단계별 실행 시간 / CPU 시간 / 최대 메모리 / 행 수 기록 (stage_profiler.py). 파일 경로를 주면 분석이 끝난 뒤 저장합니다.
+PROFILE_TRACE_PATH = None      # 예: 'profile_trace.json'
+PROFILE_CHROME_TRACE = False   # True 면 chrome://tracing, Perfetto 에서 여는 형식으로 저장
+PROFILE_CPROFILE_PATH = None   # 예: 'profile.prof' (함수별 시간, python -m pstats 로 열기)
 
 WINDOW_SIZE = 10
 STEP_SIZE = 5
@@ -25,6 +48,11 @@ ZONE_RADIUS = 20
 KALMAN_R_VAL = 20
 # Q: 프로세스 노이즈(움직임의 불확실성). 값이 클수록 움직임이 급변한다고 가정함.
 KALMAN_Q_VAL = 0.01
+# True 면 필터 결과에 RTS 역방향 스무딩까지 적용합니다. (기록이 끝난 로그 분석용. 경로가 더 매끄러워지고 지연이 없어짐)
+KALMAN_SMOOTH = False
+# 필터는 새 GPS fix(약 1초에 하나)마다 한 스텝 진행합니다. 보정된 fix 를 IMU 행에 붙이는 방식:
+# 'asof' 는 다음 fix 전까지 직전 fix 값을, 'interp' 는 fix 사이를 선형 보간한 값을 씁니다.
+POSITION_JOIN = 'asof'
 
 # ▼▼▼ 유효 GPS 좌표 범위 설정 추가 ▼▼▼
 # 한반도 근처의 대략적인 위경도 경계 (Bounding Box)
@@ -49,227 +77,76 @@ MIN_RADIUS = 3
 # ▲▲▲ 여기까지 추가 ▲▲▲
 
 # ---------------------------
-# 0. 칼만 필터 적용 함수 (새로 추가)
-# ---------------------------
-# ---------------------------
-# 0. 칼만 필터 적용 함수 (수정된 버전)
+# 0. 칼만 필터 적용 함수
 # ---------------------------
+@stage_profiler.stage()
 def apply_kalman_filter(df):
-    """DataFrame에 있는 lat, lon 데이터에 칼만 필터를 적용하여 경로를 보정합니다."""
-    
-    # ------------------ ▼▼▼ 수정된 부분 ▼▼▼ ------------------
-
-    # 1. 위도(Latitude)용 칼만 필터 설정
-    kf_lat = KalmanFilter(dim_x=2, dim_z=1)
-    kf_lat.F = np.array([[1., 1.], [0., 1.]])      # 상태 전이 행렬
-    kf_lat.H = np.array([[1., 0.]])      # 측정 함수
-    kf_lat.R = KALMAN_R_VAL             # 측정 노이즈
-    kf_lat.Q = Q_discrete_white_noise(dim=2, dt=1., var=KALMAN_Q_VAL) # 프로세스 노이즈
-    kf_lat.x = np.array([[df['lat'].iloc[0]], [0.]]) # 초기 상태
-
-    # 2. 경도(Longitude)용 칼만 필터 설정 (별도로!)
-    kf_lon = KalmanFilter(dim_x=2, dim_z=1)
-    kf_lon.F = np.array([[1., 1.], [0., 1.]])
-    kf_lon.H = np.array([[1., 0.]])
-    kf_lon.R = KALMAN_R_VAL
-    kf_lon.Q = Q_discrete_white_noise(dim=2, dt=1., var=KALMAN_Q_VAL)
-    kf_lon.x = np.array([[df['lon'].iloc[0]], [0.]])
-    
-    # ------------------ ▲▲▲ 수정 완료 ▲▲▲ ------------------
-
-    # 필터링 실행 (이 부분은 동일)
-    lat_filtered, lon_filtered = [], []
-    for _, row in df.iterrows():
-        kf_lat.predict()
-        kf_lat.update(row['lat'])
-        lat_filtered.append(kf_lat.x[0, 0])
-
-        kf_lon.predict()
-        kf_lon.update(row['lon'])
-        lon_filtered.append(kf_lon.x[0, 0])
-        
-    df['lat_filtered'] = lat_filtered
-    df['lon_filtered'] = lon_filtered
-    print("칼만 필터 적용 완료. GPS 경로가 보정되었습니다.")
+    """
+    DataFrame에 있는 lat, lon 데이터에 칼만 필터를 적용하여 경로를 보정합니다. (lat/lon 을 한 번에, kalman.py)
+    IMU 행마다 반복된 좌표 중 새 GPS fix 만 필터링한 뒤, POSITION_JOIN 방식으로 모든 행에 다시 붙입니다.
+    """
+    coords, fix_count = kalman_track_fixes(df[['lat', 'lon']].to_numpy(dtype=np.float64), KALMAN_R_VAL, KALMAN_Q_VAL,
+                                           smooth=KALMAN_SMOOTH, join=POSITION_JOIN)
+    df['lat_filtered'] = coords[:, 0]
+    df['lon_filtered'] = coords[:, 1]
+    print(f"칼만 필터 적용 완료. GPS 경로가 보정되었습니다. (GPS fix {fix_count}개 / {len(df)}행)")
     return df
 
 # ---------------------------
-# 1. CSV 파일 로드 및 특징 추출 (수정됨)
-# ---------------------------
-# ---------------------------
-# 1. CSV 파일 로드 및 특징 추출 (수정된 버전)
+# 1. 로그 로드, 특징 추출 및 특이 지점 클러스터링
 # ---------------------------
-def analyze_log_file(filepath):
-    print(f"'{filepath}' 파일을 분석합니다...")
-    try:
-        df = pd.read_csv(filepath)
-    except FileNotFoundError:
-        print(f"오류: 파일을 찾을 수 없습니다. -> {filepath}")
-        return None, None
-
-    # ▼▼▼ 데이터 유효성 검사 로직 추가 ▼▼▼
-    
-    # 0,0 좌표 및 null 값 제거
-    original_rows = len(df)
-    df.dropna(subset=['lat', 'lon'], inplace=True)
+def valid_gps_rows(df):
+    """비어 있거나 0 이거나 한반도 범위를 벗어난 GPS 좌표 행을 제거합니다. (행마다 독립적인 조건)"""
+    df = df.dropna(subset=['lat', 'lon'])
     df = df[(df['lat'] != 0) & (df['lon'] != 0)]
-    
-    # 지리적 경계(Bounding Box) 필터링
-    df = df[
-        (df['lat'] >= KOREA_BOUNDS['lat_min']) &
-        (df['lat'] <= KOREA_BOUNDS['lat_max']) &
-        (df['lon'] >= KOREA_BOUNDS['lon_min']) &
-        (df['lon'] <= KOREA_BOUNDS['lon_max'])
-    ].reset_index(drop=True)
-
-    filtered_rows = len(df)
-    removed_count = original_rows - filtered_rows
-    if removed_count > 0:
-        print(f"비정상 GPS 좌표 데이터 {removed_count}개를 제거했습니다.")
-
-    # ▲▲▲ 여기까지 추가 ▲▲▲
-
-    if df.empty:
-        print("오류: 유효한 GPS 데이터가 남아있지 않습니다.")
-        return None, None
-
-    # 칼만 필터 적용 단계
-    df_kalman = apply_kalman_filter(df.copy())
-    
-    features_list = []
-    for i in range(0, len(df_kalman) - WINDOW_SIZE, STEP_SIZE):
-        window = df_kalman.iloc[i:i + WINDOW_SIZE].copy()
-        
-        for col in ['ax', 'ay', 'az']:
-            window[f'{col}_smooth'] = window[col].rolling(window=2).mean()
-        window.dropna(inplace=True)
-        if window.empty: continue
-        z_acc_var = window['az_smooth'].var()
-        pitch_y_rad = np.mean(np.arctan2(window['ax_smooth'], np.sqrt(window['ay_smooth']**2 + window['az_smooth']**2)))
-        mean_pitch_absolute = np.abs(pitch_y_rad)
-        
-        features_list.append({
-            'z_variance': z_acc_var, 'mean_pitch': mean_pitch_absolute,
-            'lat': window['lat_filtered'].median(),
-            'lon': window['lon_filtered'].median()
-        })
-        
-    return pd.DataFrame(features_list), df_kalman
+    return df[(df['lat'] >= KOREA_BOUNDS['lat_min']) & (df['lat'] <= KOREA_BOUNDS['lat_max']) &
+              (df['lon'] >= KOREA_BOUNDS['lon_min']) & (df['lon'] <= KOREA_BOUNDS['lon_max'])].reset_index(drop=True)
 
-# ---------------------------
-# 2. 특이 지점 클러스터링 (이전과 동일)
-# ---------------------------
-def process_and_cluster_zones(feature_df):
-    if feature_df is None: return None
-    # (이전 답변과 동일한 클러스터링 로직)
-    feature_df['is_stair'] = feature_df['z_variance'] > VAR_THRESHOLD
-    feature_df['is_ramp'] = feature_df['mean_pitch'] > PITCH_THRESHOLD
-    feature_df['stair_cluster_id'] = (feature_df['is_stair'].diff() != 0).cumsum()
-    feature_df['ramp_cluster_id'] = (feature_df['is_ramp'].diff() != 0).cumsum()
-    zone_summary_list = []
-    stair_clusters = feature_df[feature_df['is_stair']].groupby('stair_cluster_id')
-    for _, cluster_df in stair_clusters:
-        if len(cluster_df) >= MIN_POINTS_IN_CLUSTER:
-            zone_summary_list.append({
-                'type': 'Stair/Bump Zone', 'lat': cluster_df['lat'].mean(), 'lon': cluster_df['lon'].mean(),
-                'points_count': len(cluster_df), 'max_variance': cluster_df['z_variance'].max(), 'avg_pitch': cluster_df['mean_pitch'].mean()
-            })
-    ramp_clusters = feature_df[feature_df['is_ramp']].groupby('ramp_cluster_id')
-    for _, cluster_df in ramp_clusters:
-        if len(cluster_df) >= MIN_POINTS_IN_CLUSTER:
-            is_already_processed_as_stair = ((cluster_df['z_variance'] > VAR_THRESHOLD).any() and (cluster_df['z_variance'].mean() > VAR_THRESHOLD))
-            if not is_already_processed_as_stair:
-                 zone_summary_list.append({
-                    'type': 'Ramp Zone', 'lat': cluster_df['lat'].mean(), 'lon': cluster_df['lon'].mean(),
-                    'points_count': len(cluster_df), 'max_variance': cluster_df['z_variance'].max(), 'avg_pitch': cluster_df['mean_pitch'].mean()
-                })
-    if not zone_summary_list:
-        print("분석 결과, 기준을 만족하는 특이 구역(Zone)이 발견되지 않았습니다.")
-        return None
-    zones_df = pd.DataFrame(zone_summary_list)
-    zones_df.to_csv(OUTPUT_ZONES_CSV_PATH, index=False)
-    print(f"\n총 {len(zones_df)}개의 특이 구역(Zone)을 발견했습니다.\n{zones_df}")
-    return zones_df
-
-# ---------------------------
-# 3. Folium으로 지도 시각화 (수정됨)
-# ---------------------------
-def create_map_with_zones(zones_df, original_df):
-    if zones_df is None or zones_df.empty:
-        print("지도에 표시할 구역이 없어 시각화를 건너뜁니다.")
-        return
-
-    map_center = [zones_df['lat'].iloc[0], zones_df['lon'].iloc[0]]
-    m = folium.Map(location=map_center, zoom_start=18)
-
-    # ▼▼▼ 경로 표시 기능 추가 ▼▼▼
-    # 1. 원본 GPS 경로 (회색 실선)
-    points_raw = original_df[['lat', 'lon']].values.tolist()
-    folium.PolyLine(points_raw, color='gray', weight=2.5, opacity=0.8, popup='Raw GPS Path').add_to(m)
-    
-    # 2. 칼만 필터 보정 경로 (파란색 굵은 선)
-    points_filtered = original_df[['lat_filtered', 'lon_filtered']].values.tolist()
-    folium.PolyLine(points_filtered, color='blue', weight=5, opacity=0.8, popup='Kalman Filtered Path').add_to(m)
-
-    # (이전과 동일한 존 시각화 로직)
-    for idx, row in zones_df.iterrows():
-        zone_type = row['type']
-        color = 'red' if 'Stair' in zone_type else 'orange'
-        popup_html = f"""<b>Type:</b> {zone_type}<br><b>Points Count:</b> {row['points_count']}"""
-        folium.Circle(
-            location=[row['lat'], row['lon']], radius=ZONE_RADIUS, color=color,
-            fill=True, fill_color=color, fill_opacity=0.3, popup=folium.Popup(popup_html, max_width=250)
-        ).add_to(m)
-
-    m.save(OUTPUT_MAP_PATH)
-    print(f"\n구역 지도를 '{OUTPUT_MAP_PATH}' 파일에 성공적으로 저장했습니다.")
-
-def apply_kalman_filter(df):
-    kf_lat = KalmanFilter(dim_x=2, dim_z=1)
-    kf_lat.F = np.array([[1., 1.], [0., 1.]]); kf_lat.H = np.array([[1., 0.]])
-    kf_lat.R = KALMAN_R_VAL; kf_lat.Q = Q_discrete_white_noise(dim=2, dt=1., var=KALMAN_Q_VAL)
-    kf_lat.x = np.array([[df['lat'].iloc[0]], [0.]])
-    kf_lon = KalmanFilter(dim_x=2, dim_z=1)
-    kf_lon.F = np.array([[1., 1.], [0., 1.]]); kf_lon.H = np.array([[1., 0.]])
-    kf_lon.R = KALMAN_R_VAL; kf_lon.Q = Q_discrete_white_noise(dim=2, dt=1., var=KALMAN_Q_VAL)
-    kf_lon.x = np.array([[df['lon'].iloc[0]], [0.]])
-    lat_filtered, lon_filtered = [], []
-    for _, row in df.iterrows():
-        kf_lat.predict(); kf_lat.update(row['lat']); lat_filtered.append(kf_lat.x[0, 0])
-        kf_lon.predict(); kf_lon.update(row['lon']); lon_filtered.append(kf_lon.x[0, 0])
-    df['lat_filtered'] = lat_filtered; df['lon_filtered'] = lon_filtered
-    print("칼만 필터 적용 완료. GPS 경로가 보정되었습니다.")
-    return df
-
-def analyze_log_file(filepath):
+@stage_profiler.stage(rows=lambda result: result[1])
+def analyze_log_file(filepath, t0=None, t1=None):
     print(f"'{filepath}' 파일을 분석합니다...")
     try:
-        df = pd.read_csv(filepath)
+        with stage_profiler.span('load_sensor_log') as span:
+            df = load_sensor_log(filepath, columns=FRAME_COLUMNS, t0=t0, t1=t1)
+            span.rows = len(df)
         original_rows = len(df)
-        df.dropna(subset=['lat', 'lon'], inplace=True)
-        df = df[(df['lat'] != 0) & (df['lon'] != 0)]
-        df = df[(df['lat'] >= KOREA_BOUNDS['lat_min']) & (df['lat'] <= KOREA_BOUNDS['lat_max']) &
-                (df['lon'] >= KOREA_BOUNDS['lon_min']) & (df['lon'] <= KOREA_BOUNDS['lon_max'])].reset_index(drop=True)
+        df = valid_gps_rows(df)
         removed_count = original_rows - len(df)
         if removed_count > 0: print(f"비정상 GPS 좌표 데이터 {removed_count}개를 제거했습니다.")
         if df.empty: print("오류: 유효한 GPS 데이터가 없습니다."); return None, None
     except FileNotFoundError: print(f"오류: 파일을 찾을 수 없습니다. -> {filepath}"); return None, None
     df_kalman = apply_kalman_filter(df.copy())
-    features_list = []
-    for i in range(0, len(df_kalman) - WINDOW_SIZE, STEP_SIZE):
-        window = df_kalman.iloc[i:i + WINDOW_SIZE].copy()
-        for col in ['ax', 'ay', 'az']: window[f'{col}_smooth'] = window[col].rolling(window=2).mean()
-        window.dropna(inplace=True)
-        if window.empty: continue
-        z_acc_var = window['az_smooth'].var()
-        pitch_y_rad = np.mean(np.arctan2(window['ax_smooth'], np.sqrt(window['ay_smooth']**2 + window['az_smooth']**2)))
-        mean_pitch_absolute = np.abs(pitch_y_rad)
-        features_list.append({'z_variance': z_acc_var, 'mean_pitch': mean_pitch_absolute,
-                              'lat': window['lat_filtered'].median(), 'lon': window['lon_filtered'].median()})
-    return pd.DataFrame(features_list), df_kalman
+    with stage_profiler.span('window_features', rows=len(df_kalman)):
+        features = window_features(df_kalman, WINDOW_SIZE, STEP_SIZE, 'lat_filtered', 'lon_filtered')
+    return features, df_kalman
 
-def process_and_cluster_zones(feature_df):
-    if feature_df is None: return None
+@stage_profiler.stage()
+def analyze_log_file_chunked(filepath, t0=None, t1=None):
+    """
+    analyze_log_file + process_and_cluster_zones 를 CHUNK_ROWS 행씩 읽으며 수행합니다. (메모리보다 큰 로그용, chunked_pipeline.py)
+    구역은 확정되는 대로 출력하고, 반환값은 (구역 DataFrame 또는 None, GPS fix 마다의 경로 DataFrame) 입니다.
+    """
+    print(f"'{filepath}' 파일을 {CHUNK_ROWS}행씩 나눠 분석합니다...")
+    if KALMAN_SMOOTH: print("참고: 나눠 읽기 모드에서는 RTS 스무딩 없이 칼만 필터만 적용합니다.")
+    row_filter = RowFilter(valid_gps_rows)
+    kalman = KalmanStage(KALMAN_R_VAL, KALMAN_Q_VAL, POSITION_JOIN)
+    zone_stage = ZoneStage(cluster_zones, {'z_variance': VAR_THRESHOLD, 'mean_pitch': PITCH_THRESHOLD})
+    pipeline = ZoneAnalysisPipeline([row_filter, kalman], WindowFeatureStage(WINDOW_SIZE, STEP_SIZE, 'lat_filtered', 'lon_filtered'), zone_stage)
+    try:
+        for _, zones in pipeline.run(iter_sensor_log(filepath, CHUNK_ROWS, columns=FRAME_COLUMNS, t0=t0, t1=t1)):
+            for zone in zones:
+                print(f" - {zone['type']} 발견: ({zone['lat']:.6f}, {zone['lon']:.6f}), 윈도우 {zone['points_count']}개")
+    except FileNotFoundError: print(f"오류: 파일을 찾을 수 없습니다. -> {filepath}"); return None, None
+    stage_profiler.set_rows(row_filter.rows_in)
+    removed_count = row_filter.rows_in - row_filter.rows_out
+    if removed_count > 0: print(f"비정상 GPS 좌표 데이터 {removed_count}개를 제거했습니다.")
+    if row_filter.rows_out == 0: print("오류: 유효한 GPS 데이터가 없습니다."); return None, None
+    print(f"칼만 필터 적용 완료. (GPS fix {kalman.fix_count}개 / {row_filter.rows_out}행), 특징 윈도우 {zone_stage.feature_count}개")
+    if kalman.ffill_rows: print(f"GPS fix 가 오래 바뀌지 않아 {kalman.ffill_rows}행은 보간 대신 직전 fix 값을 붙였습니다.")
+    return report_zones(zone_stage.zones()), kalman.path()
+
+def cluster_zones(feature_df):
+    """특징 DataFrame 에서 계단/경사로 구역을 찾아 dict 목록으로 반환합니다. (출력/저장 없음)"""
     feature_df['is_stair'] = feature_df['z_variance'] > VAR_THRESHOLD
     feature_df['is_ramp'] = feature_df['mean_pitch'] > PITCH_THRESHOLD
     feature_df['stair_cluster_id'] = (feature_df['is_stair'].diff() != 0).cumsum()
@@ -287,15 +164,32 @@ def process_and_cluster_zones(feature_df):
             if not is_already_processed_as_stair:
                  zone_summary_list.append({'type': 'Ramp Zone', 'lat': cluster_df['lat'].mean(), 'lon': cluster_df['lon'].mean(),
                                             'points_count': len(cluster_df), 'max_variance': cluster_df['z_variance'].max(), 'avg_pitch': cluster_df['mean_pitch'].mean()})
-    if not zone_summary_list: print("분석 결과, 기준을 만족하는 특이 구역(Zone)이 발견되지 않았습니다."); return None
-    zones_df = pd.DataFrame(zone_summary_list)
+    return zone_summary_list
+
+@stage_profiler.stage()
+def process_and_cluster_zones(feature_df):
+    if feature_df is None: return None
+    return report_zones(pd.DataFrame(cluster_zones(feature_df)))
+
+def report_zones(zones_df):
+    if zones_df.empty: print("분석 결과, 기준을 만족하는 특이 구역(Zone)이 발견되지 않았습니다."); return None
     zones_df.to_csv(OUTPUT_ZONES_CSV_PATH, index=False)
     print(f"\n총 {len(zones_df)}개의 특이 구역(Zone)을 발견했습니다.\n{zones_df}")
     return zones_df
 
+def merge_zones_into_map_db(zones_df, filepath):
+    """이번 세션의 구역을 ZONE_DB_PATH 구역 지도에 합칩니다. (반경 안의 같은 종류 구역과 병합, zone_store.py)"""
+    if ZONE_DB_PATH is None or zones_df is None: return
+    session = os.path.splitext(os.path.basename(filepath))[0]
+    with ZoneStore(ZONE_DB_PATH) as store:
+        if store.has_session(session): print(f"'{session}' 세션은 이미 구역 지도에 있습니다."); return
+        merged, inserted = store.ingest(session, zones_df)
+    print(f"구역 지도 '{ZONE_DB_PATH}' 에 합쳤습니다. (기존 구역과 병합 {merged}개, 새 구역 {inserted}개)")
+
 # ---------------------------
 # 3. Folium으로 지도 시각화 (수정된 버전)
 # ---------------------------
+@stage_profiler.stage()
 def create_map_with_zones(zones_df, original_df):
     if zones_df is None or zones_df.empty: 
         print("지도에 표시할 구역이 없어 시각화를 건너뜁니다.")
@@ -310,11 +204,12 @@ def create_map_with_zones(zones_df, original_df):
     m = folium.Map(location=map_center, zoom_start=18)
 
     # 경로 표시 기능 (원본 GPS + 칼만 필터)
+    # 모든 행을 그대로 넣으면 HTML 이 수 MB 가 되므로, 줌 단계별로 단순화한 선을 넣습니다. (track_simplify.py)
     if original_df is not None and not original_df.empty:
-        points_raw = original_df[['lat', 'lon']].values.tolist()
-        folium.PolyLine(points_raw, color='gray', weight=2.5, opacity=0.8, popup='Raw GPS Path').add_to(m)
-        points_filtered = original_df[['lat_filtered', 'lon_filtered']].values.tolist()
-        folium.PolyLine(points_filtered, color='blue', weight=5, opacity=0.8, popup='Kalman Filtered Path').add_to(m)
+        counts = add_tracks_with_lod(m, [
+            (original_df['lat'], original_df['lon'], dict(color='gray', weight=2.5, opacity=0.8, popup='Raw GPS Path')),
+            (original_df['lat_filtered'], original_df['lon_filtered'], dict(color='blue', weight=5, opacity=0.8, popup='Kalman Filtered Path'))])
+        print(f"경로 {len(original_df)}행을 줌 단계별로 단순화했습니다. (점 수 {counts})")
 
     # ▼▼▼ 여기가 핵심 수정 부분 ▼▼▼
     # 특이 지점(Zone) 시각화 로직
@@ -357,69 +252,71 @@ def detect_steps_and_gait_features(df):
     """
     print("\n--- 보행 안정성 분석 시작 ---")
     
-    # 자이로 데이터 스무딩
-    df_gait = df.copy()
-    for col in ['gx', 'gy', 'gz']:
-        df_gait[col] = df_gait[col].rolling(window=5, center=True).mean()
-    df_gait.dropna(inplace=True)
+    # 그래프 창이 닫힐 때까지 기다리는 시간(plt.show)은 단계 시간에 넣지 않습니다.
+    with stage_profiler.span('detect_steps_and_gait_features', rows=df):
+        # 자이로 데이터 스무딩
+        df_gait = df.copy()
+        for col in ['gx', 'gy', 'gz']:
+            df_gait[col] = df_gait[col].rolling(window=5, center=True).mean()
+        df_gait.dropna(inplace=True)
+
+        gyro_norm = np.sqrt(df_gait['gx']**2 + df_gait['gy']**2 + df_gait['gz']**2)
+
+        is_zupt = gyro_norm < ZUPT_GYRO_THRESHOLD
+
+        step_events = is_zupt.astype(int).diff()
+        step_starts = step_events[step_events == 1].index
+        step_ends = step_events[step_events == -1].index
+
+        # ▼▼▼ 여기가 핵심 수정 부분 ▼▼▼
+        # 시작과 끝 이벤트의 짝을 맞추는 로직
+        if len(step_starts) == 0 or len(step_ends) == 0:
+            print("걸음을 감지할 수 없습니다. (시작 또는 끝 이벤트 없음)")
+            return
 
-    gyro_norm = np.sqrt(df_gait['gx']**2 + df_gait['gy']**2 + df_gait['gz']**2)
-    
-    is_zupt = gyro_norm < ZUPT_GYRO_THRESHOLD
-    
-    step_events = is_zupt.astype(int).diff()
-    step_starts = step_events[step_events == 1].index
-    step_ends = step_events[step_events == -1].index
+        # 첫 번째 끝이 첫 번째 시작보다 빠르면, 그 끝은 버림
+        if step_ends[0] < step_starts[0]:
+            step_ends = step_ends[1:]
 
-    # ▼▼▼ 여기가 핵심 수정 부분 ▼▼▼
-    # 시작과 끝 이벤트의 짝을 맞추는 로직
-    if len(step_starts) == 0 or len(step_ends) == 0:
-        print("걸음을 감지할 수 없습니다. (시작 또는 끝 이벤트 없음)")
-        return
-
-    # 첫 번째 끝이 첫 번째 시작보다 빠르면, 그 끝은 버림
-    if step_ends[0] < step_starts[0]:
-        step_ends = step_ends[1:]
-
-    # 마지막 시작이 마지막 끝보다 늦으면, 그 시작은 버림
-    if step_starts[-1] > step_ends[-1]:
-        step_starts = step_starts[:-1]
-    
-    # 이제 시작과 끝의 개수를 다시 맞춰줌
-    min_len = min(len(step_starts), len(step_ends))
-    if min_len < 1:
-        print("걸음의 짝을 맞출 수 없습니다.")
-        return
-        
-    step_starts = step_starts[:min_len]
-    step_ends = step_ends[:min_len]
-    # ▲▲▲ 수정 완료 ▲▲▲
+        # 마지막 시작이 마지막 끝보다 늦으면, 그 시작은 버림
+        if step_starts[-1] > step_ends[-1]:
+            step_starts = step_starts[:-1]
 
-    gct_list = []
-    for start, end in zip(step_starts, step_ends):
-        # 이제 end > start 조건은 항상 만족해야 함
-        gct = (end - start) * SAMPLING_PERIOD
-        gct_list.append(gct)
+        # 이제 시작과 끝의 개수를 다시 맞춰줌
+        min_len = min(len(step_starts), len(step_ends))
+        if min_len < 1:
+            print("걸음의 짝을 맞출 수 없습니다.")
+            return
 
-    if not gct_list:
-        print("GCT를 계산할 수 없습니다. (리스트 비어있음)")
-        return
+        step_starts = step_starts[:min_len]
+        step_ends = step_ends[:min_len]
+        # ▲▲▲ 수정 완료 ▲▲▲
 
-    total_steps = len(gct_list) * 2
-    total_time_seconds = (step_ends[-1] - step_starts[0]) * SAMPLING_PERIOD
-    
-    if total_time_seconds <= 0:
-        print("분석에 필요한 총 시간이 부족합니다.")
-        return
+        gct_list = []
+        for start, end in zip(step_starts, step_ends):
+            # 이제 end > start 조건은 항상 만족해야 함
+            gct = (end - start) * SAMPLING_PERIOD
+            gct_list.append(gct)
+
+        if not gct_list:
+            print("GCT를 계산할 수 없습니다. (리스트 비어있음)")
+            return
+
+        total_steps = len(gct_list) * 2
+        total_time_seconds = (step_ends[-1] - step_starts[0]) * SAMPLING_PERIOD
 
-    cadence = (total_steps / total_time_seconds) * 60
-    avg_gct = np.mean(gct_list)
+        if total_time_seconds <= 0:
+            print("분석에 필요한 총 시간이 부족합니다.")
+            return
 
-    print("--- 보행 분석 결과 ---")
-    print(f"총 걸음 시간: {total_time_seconds} 초")
-    print(f"총 감지된 걸음 수: {total_steps} 걸음")
-    print(f"평균 케이던스 (분당 걸음 수): {cadence:.2f} steps/min")
-    print(f"평균 지면 접촉 시간 (GCT): {avg_gct:.4f} 초")
+        cadence = (total_steps / total_time_seconds) * 60
+        avg_gct = np.mean(gct_list)
+
+        print("--- 보행 분석 결과 ---")
+        print(f"총 걸음 시간: {total_time_seconds} 초")
+        print(f"총 감지된 걸음 수: {total_steps} 걸음")
+        print(f"평균 케이던스 (분당 걸음 수): {cadence:.2f} steps/min")
+        print(f"평균 지면 접촉 시간 (GCT): {avg_gct:.4f} 초")
 
     # 디버깅용 그래프 (필요시 주석 해제)
     import matplotlib.pyplot as plt
@@ -439,39 +336,40 @@ def detect_steps_with_accel_peaks(df):
     """
     print("\n--- 보행 분석 시작 (가속도 피크 방식) ---")
 
-    # 1. Z축 가속도 데이터 스무딩 (노이즈 제거)
-    # g 단위를 m/s^2 단위로 변환하려면 9.8을 곱하고, 아니면 그냥 사용합니다.
-    # 여기서는 센서의 raw g 단위를 그대로 사용한다고 가정합니다.
-    az_smooth = df['az'].rolling(window=5, center=True).mean().dropna()
-    # az_smooth = df['az']
+    with stage_profiler.span('detect_steps_with_accel_peaks', rows=df):
+        # 1. Z축 가속도 데이터 스무딩 (노이즈 제거)
+        # g 단위를 m/s^2 단위로 변환하려면 9.8을 곱하고, 아니면 그냥 사용합니다.
+        # 여기서는 센서의 raw g 단위를 그대로 사용한다고 가정합니다.
+        az_smooth = df['az'].rolling(window=5, center=True).mean().dropna()
+        # az_smooth = df['az']
 
-    # 2. 피크 감지 (가장 핵심적인 부분)
-    # height: 피크의 최소 높이. 1.0g(중력) 이상의 충격만 감지하도록 설정. (튜닝 필요)
-    # distance: 피크 사이의 최소 간격 (샘플 수). 0.3초 이내에 연속된 피크는 무시. (튜닝 필요)
-    # SAMPLING_PERIOD는 0.02 (50Hz)로 가정
-    min_peak_height = 1.2  # 1.2g 이상만 걸음으로 인정
-    min_step_interval = int(0.3 / SAMPLING_PERIOD) # 최소 0.3초 간격
+        # 2. 피크 감지 (가장 핵심적인 부분)
+        # height: 피크의 최소 높이. 1.0g(중력) 이상의 충격만 감지하도록 설정. (튜닝 필요)
+        # distance: 피크 사이의 최소 간격 (샘플 수). 0.3초 이내에 연속된 피크는 무시. (튜닝 필요)
+        # SAMPLING_PERIOD는 0.02 (50Hz)로 가정
+        min_peak_height = 1.2  # 1.2g 이상만 걸음으로 인정
+        min_step_interval = int(0.3 / SAMPLING_PERIOD) # 최소 0.3초 간격
 
-    peaks, _ = find_peaks(az_smooth, height=min_peak_height, distance=min_step_interval)
+        peaks, _ = find_peaks(az_smooth, height=min_peak_height, distance=min_step_interval)
 
-    if len(peaks) < 2:
-        print("걸음을 충분히 감지할 수 없습니다.")
-        return
+        if len(peaks) < 2:
+            print("걸음을 충분히 감지할 수 없습니다.")
+            return
 
-    # 3. 결과 계산
-    total_steps = len(peaks) * 2
-    
-    # 총 분석 시간 계산 (첫 걸음 ~ 마지막 걸음)
-    total_time_seconds = (az_smooth.index[peaks[-1]] - az_smooth.index[peaks[0]]) * SAMPLING_PERIOD
-    
-    cadence = 0
-    if total_time_seconds > 0:
-        cadence = (total_steps / total_time_seconds) * 60  # 분당 걸음 수
+        # 3. 결과 계산
+        total_steps = len(peaks) * 2
 
-    print("--- 보행 분석 결과 ---")
-    print(f"총 감지된 걸음 수: {total_steps} 걸음")
-    if cadence > 0:
-        print(f"평균 케이던스 (분당 걸음 수): {cadence:.2f} steps/min")
+        # 총 분석 시간 계산 (첫 걸음 ~ 마지막 걸음)
+        total_time_seconds = (az_smooth.index[peaks[-1]] - az_smooth.index[peaks[0]]) * SAMPLING_PERIOD
+
+        cadence = 0
+        if total_time_seconds > 0:
+            cadence = (total_steps / total_time_seconds) * 60  # 분당 걸음 수
+
+        print("--- 보행 분석 결과 ---")
+        print(f"총 감지된 걸음 수: {total_steps} 걸음")
+        if cadence > 0:
+            print(f"평균 케이던스 (분당 걸음 수): {cadence:.2f} steps/min")
 
     # 4. 디버깅용 그래프 출력
     import matplotlib.pyplot as plt
@@ -491,15 +389,27 @@ def detect_steps_with_accel_peaks(df):
 # 메인 코드 실행 (수정됨)
 # ---------------------------
 if __name__ == "__main__":
-    # 1, 2, 3단계: 지형 분석 및 지도 생성
-    features, original_data_with_filter = analyze_log_file(INPUT_CSV_PATH)
-    
-    if features is not None and original_data_with_filter is not None:
-        zones = process_and_cluster_zones(features)
-        create_map_with_zones(zones, original_data_with_filter)
+    if PROFILE_TRACE_PATH or PROFILE_CPROFILE_PATH:
+        stage_profiler.enable(PROFILE_TRACE_PATH, PROFILE_CHROME_TRACE, PROFILE_CPROFILE_PATH)
+    if CHUNKED_MODE:
+        # 1, 2, 3단계를 조각 단위로 수행 (구역은 확정되는 대로 출력)
+        zones, path = analyze_log_file_chunked(INPUT_CSV_PATH, ANALYSIS_START, ANALYSIS_END)
+        if path is not None:
+            merge_zones_into_map_db(zones, INPUT_CSV_PATH)
+            create_map_with_zones(zones, path)
+        print("나눠 읽기 모드에서는 보행 안정성 분석(4단계)을 건너뜁니다.")
+    else:
+        # 1, 2, 3단계: 지형 분석 및 지도 생성
+        features, original_data_with_filter = analyze_log_file(INPUT_CSV_PATH, ANALYSIS_START, ANALYSIS_END)
         
-        # 4단계: 보행 안정성 분석 (kalman filter가 적용된 데이터로 수행)
-        detect_steps_and_gait_features(original_data_with_filter)
+        if features is not None and original_data_with_filter is not None:
+            zones = process_and_cluster_zones(features)
+            merge_zones_into_map_db(zones, INPUT_CSV_PATH)
+            create_map_with_zones(zones, original_data_with_filter)
+            
+            # 4단계: 보행 안정성 분석 (kalman filter가 적용된 데이터로 수행)
+            detect_steps_and_gait_features(original_data_with_filter)
+    stage_profiler.finish()
 
 # ---------------------------
 # 메인 코드 실행 (수정됨)
@@ -0,0 +1,226 @@
+# batch_analysis.py
+# 여러 세션 로그를 한 번에 분석하는 일괄 처리 도구
+# 폴더(또는 glob 패턴) 안의 sensor_log_* 로그마다 analyze_log_file -> 구역 클러스터링을 ProcessPoolExecutor 로
+# 코어마다 하나씩 병렬 실행하고, 세션별 구역 표와 처리 시간을 요약 파일 하나로 모읍니다.
+# 이미 분석한 세션(결과 파일이 로그보다 새로운 경우)은 건너뛰므로, 새 로그가 쌓일 때마다 다시 돌려도 됩니다.
+#
+# 사용법: python batch_analysis.py logs/ [logs2/ 'walks/sensor_log_2025-09-*.csv' ...] [--mode special|indoor|outdoor]
+#         [--out batch_results/special] [--workers N] [--force] [--db zone_map.db]
+# --db 를 주면 분석한 세션의 구역을 구역 지도 데이터베이스(zone_store.py)에도 합칩니다.
+
+import argparse
+import contextlib
+import glob
+import importlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from log_writer import GPS_LOG_SUFFIX
+from zone_store import ZoneStore
+
+# ---------------------------
+# 설정
+# ---------------------------
+# 분석 방식: (모듈 이름, analyze_log_file 의 is_indoor 인자. None 이면 그 인자가 없는 스크립트)
+MODES = {
+    'special': ('anal_special_point_and_plot_map', None),   # GPS + 칼만 필터, 계단/경사로 (가장 최근 스크립트)
+    'outdoor': ('anal_indoor', False),                      # anal_indoor 실외 모드 (가슴 부착 임계값)
+    'indoor': ('anal_indoor', True),                        # anal_indoor 실내 모드 (PDR 좌표)
+}
+DEFAULT_MODE = 'special'
+# 결과 폴더. 분석 방식마다 하위 폴더를 따로 씁니다. (batch_results/special/...)
+DEFAULT_OUTPUT_DIR = 'batch_results'
+# 폴더를 주었을 때 찾는 로그 파일 (GPS fix 로그 *_gps.* 는 짝이 되는 IMU 로그와 함께 읽히므로 제외)
+LOG_PATTERN = 'sensor_log_*'
+# 같은 세션이 여러 형식으로 있으면 (예: parquet 로그 옆의 to_csv 내보내기) 앞쪽 형식 하나만 씁니다.
+LOG_EXTENSIONS = ('.parquet', '.pq', '.bin', '.csv')
+
+SUMMARY_FILE = 'batch_summary.csv'
+ALL_ZONES_FILE = 'batch_zones.csv'
+
+
+def find_logs(inputs):
+    """폴더 / glob 패턴 / 파일 경로 목록에서 분석할 로그 파일을 찾습니다. (세션당 하나, 정렬)
+
+    결과 파일 이름이 세션 이름으로 정해지므로, 같은 세션 이름의 로그는 LOG_EXTENSIONS 순서로 하나만 고릅니다.
+    우선순위가 같은 파일이 여럿이면 (다른 폴더의 같은 이름 로그) 어느 쪽인지 알 수 없으므로 ValueError 를 냅니다.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths += glob.glob(os.path.join(item, LOG_PATTERN))
+        else:
+            paths += glob.glob(item)
+    logs = []
+    for path in paths:
+        stem, ext = os.path.splitext(path)
+        if ext.lower() in LOG_EXTENSIONS and not stem.endswith(GPS_LOG_SUFFIX) and os.path.isfile(path):
+            logs.append(os.path.abspath(path))
+
+    def rank(path):
+        return LOG_EXTENSIONS.index(os.path.splitext(path)[1].lower())
+
+    by_session = {}
+    for path in sorted(set(logs)):
+        by_session.setdefault(session_name(path), []).append(path)
+    chosen = []
+    for session, candidates in by_session.items():
+        candidates.sort(key=rank)
+        best = [p for p in candidates if rank(p) == rank(candidates[0])]
+        if len(best) > 1:
+            raise ValueError(f"세션 '{session}' 의 로그가 여러 개입니다: {', '.join(best)}")
+        for skipped in candidates[1:]:
+            print(f"ℹ️ {session}: {os.path.basename(candidates[0])} 를 쓰고 {skipped} 는 건너뜁니다")
+        chosen.append(candidates[0])
+    return sorted(chosen)
+
+
+def session_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def zones_path(out_dir, path):
+    return os.path.join(out_dir, session_name(path) + '_zones.csv')
+
+
+def is_processed(out_dir, path):
+    """결과 구역 파일이 있고, 로그(와 GPS fix 로그)보다 나중에 만들어졌으면 True."""
+    out = zones_path(out_dir, path)
+    if not os.path.exists(out):
+        return False
+    stem, ext = os.path.splitext(path)
+    sources = [path, stem + GPS_LOG_SUFFIX + ext]
+    newest = max(os.path.getmtime(src) for src in sources if os.path.exists(src))
+    return os.path.getmtime(out) >= newest
+
+
+def analyze_session(path, mode, out_dir):
+    """
+    (작업 프로세스에서 실행) 세션 하나를 분석해 구역 표를 <세션>_zones.csv 로 저장하고 요약 dict 를 반환합니다.
+    스크립트의 출력은 다른 세션과 섞이지 않도록 <세션>.log 파일로 보냅니다.
+    """
+    module_name, is_indoor = MODES[mode]
+    started, cpu_started = time.perf_counter(), time.process_time()
+    result = {'session': session_name(path), 'path': path, 'status': 'ok', 'rows': 0, 'windows': 0,
+              'zones': 0, 'stair_zones': 0, 'ramp_zones': 0, 'seconds': 0.0, 'cpu_seconds': 0.0, 'error': ''}
+    with open(os.path.join(out_dir, session_name(path) + '.log'), 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log):
+        try:
+            module = importlib.import_module(module_name)
+            if is_indoor is None:
+                features, processed = module.analyze_log_file(path)
+            else:
+                features, processed = module.analyze_log_file(path, is_indoor=is_indoor)
+            # process_and_cluster_zones 와 같은 클러스터링. (그 함수는 모든 세션이 같은 OUTPUT_ZONES_CSV_PATH 에 저장하므로 직접 저장)
+            zone_list = module.cluster_zones(features) if features is not None and len(features) else []
+            zones = pd.DataFrame(zone_list, columns=None if zone_list else ['type', 'lat', 'lon'])
+            if is_indoor:
+                zones = zones.rename(columns={'lat': 'pos_x', 'lon': 'pos_y'})
+            zones.to_csv(zones_path(out_dir, path), index=False)
+            print(f"구역 {len(zones)}개를 '{zones_path(out_dir, path)}' 파일에 저장했습니다.")
+
+            if processed is None:
+                result['status'] = 'no_data'   # 유효한 데이터가 없는 세션 (스크립트가 이유를 .log 에 출력)
+            result['rows'] = 0 if processed is None else len(processed)
+            result['windows'] = 0 if features is None else len(features)
+            result['zones'] = len(zones)
+            result['stair_zones'] = int(zones['type'].str.contains('Stair').sum())
+            result['ramp_zones'] = int(zones['type'].str.contains('Ramp').sum())
+        except Exception as e:
+            result['status'] = 'error'
+            result['error'] = f"{type(e).__name__}: {e}"
+            print(f"오류: {result['error']}")
+    result['seconds'] = time.perf_counter() - started
+    result['cpu_seconds'] = time.process_time() - cpu_started
+    return result
+
+
+def run_batch(inputs, mode=DEFAULT_MODE, out_dir=None, workers=None, force=False, db_path=None):
+    """
+    로그들을 병렬로 분석하고 요약 DataFrame 을 반환합니다.
+    세션별 결과, 요약, 전체 구역 표는 out_dir (기본: DEFAULT_OUTPUT_DIR/<mode>) 에 저장됩니다.
+    db_path 를 주면 구역을 그 구역 지도 데이터베이스에도 합칩니다. (SQLite 는 쓰는 쪽이 하나여야 하므로 이 프로세스에서)
+    """
+    if mode not in MODES:
+        raise ValueError(f"알 수 없는 분석 방식입니다: {mode} (가능: {', '.join(MODES)})")
+    if db_path and MODES[mode][1]:
+        raise ValueError("실내 모드의 구역은 PDR 좌표(m)라 위경도 구역 지도에 넣을 수 없습니다.")
+    out_dir = out_dir or os.path.join(DEFAULT_OUTPUT_DIR, mode)
+    os.makedirs(out_dir, exist_ok=True)
+    logs = find_logs(inputs)
+    todo = [path for path in logs if force or not is_processed(out_dir, path)]
+    todo_set = set(todo)
+    skipped = [path for path in logs if path not in todo_set]
+    workers = workers or os.cpu_count() or 1
+    print(f"로그 {len(logs)}개 중 {len(todo)}개를 분석합니다. (이미 분석됨 {len(skipped)}개, 작업 프로세스 {min(workers, max(len(todo), 1))}개)")
+
+    results = [{'session': session_name(path), 'path': path, 'status': 'skipped'} for path in skipped]
+    store = ZoneStore(db_path) if db_path else None
+    started = time.perf_counter()
+    if todo:
+        # 큰 파일부터 넣어야 마지막에 큰 파일 하나만 남아 코어가 노는 일이 줄어듭니다.
+        todo.sort(key=os.path.getsize, reverse=True)
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            futures = [pool.submit(analyze_session, path, mode, out_dir) for path in todo]
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                results.append(result)
+                if store is not None and result['status'] == 'ok':
+                    store.ingest(result['session'], pd.read_csv(zones_path(out_dir, result['path'])))
+                if result['status'] == 'ok':
+                    print(f"[{done}/{len(todo)}] {result['session']}: 구역 {result['zones']}개 ({result['seconds']:.1f}초)")
+                elif result['status'] == 'no_data':
+                    print(f"[{done}/{len(todo)}] {result['session']}: 유효한 데이터 없음 ({result['seconds']:.1f}초)")
+                else:
+                    print(f"[{done}/{len(todo)}] {result['session']}: ❌ {result['error']}")
+    elapsed = time.perf_counter() - started
+    if store is not None:
+        # 이전 실행에서 분석만 하고 지도에 넣지 않은 세션도 넣습니다. (이미 넣은 세션은 ZoneStore 가 건너뜀)
+        for path in skipped:
+            if os.path.exists(zones_path(out_dir, path)):
+                store.ingest(session_name(path), pd.read_csv(zones_path(out_dir, path)))
+        store.close()
+
+    summary = pd.DataFrame(results, columns=['session', 'path', 'status', 'rows', 'windows', 'zones',
+                                             'stair_zones', 'ramp_zones', 'seconds', 'cpu_seconds', 'error'])
+    summary = summary.sort_values('session').reset_index(drop=True)
+    summary.to_csv(os.path.join(out_dir, SUMMARY_FILE), index=False)
+
+    # 건너뛴 세션을 포함해 모든 세션의 구역 표를 세션 컬럼과 함께 하나로 모읍니다.
+    tables = []
+    for path in logs:
+        out = zones_path(out_dir, path)
+        if os.path.exists(out):
+            zones = pd.read_csv(out)
+            if len(zones):
+                zones.insert(0, 'session', session_name(path))
+                tables.append(zones)
+    all_zones = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=['session', 'type'])
+    all_zones.to_csv(os.path.join(out_dir, ALL_ZONES_FILE), index=False)
+
+    analyzed = summary[summary['status'] == 'ok']
+    busy = analyzed['cpu_seconds'].sum()
+    print(f"\n✅ 분석 {len(analyzed)}개, 건너뜀 {len(skipped)}개, 오류 {(summary['status'] == 'error').sum()}개 "
+          f"/ 전체 구역 {len(all_zones)}개")
+    if len(analyzed):
+        # 세션 CPU 시간 합 / 걸린 시간 = 실제로 동시에 일한 코어 수 (코어 수에 가까울수록 잘 나뉜 것)
+        print(f"걸린 시간 {elapsed:.1f}초 (세션 CPU 시간 합 {busy:.1f}초, 평균 {busy / elapsed:.1f}개 코어 사용)")
+    print(f"요약: '{os.path.join(out_dir, SUMMARY_FILE)}', 구역: '{os.path.join(out_dir, ALL_ZONES_FILE)}'")
+    if db_path:
+        print(f"구역 지도 데이터베이스: '{db_path}'")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="여러 세션 로그의 구역 분석을 코어 수만큼 병렬로 실행합니다.")
+    parser.add_argument('inputs', nargs='+', help="로그 폴더, glob 패턴(예: 'logs/sensor_log_*.csv') 또는 파일 경로")
+    parser.add_argument('--mode', choices=list(MODES), default=DEFAULT_MODE, help="분석 방식 (기본: %(default)s)")
+    parser.add_argument('--out', default=None, help=f"결과 폴더 (기본: {DEFAULT_OUTPUT_DIR}/<mode>)")
+    parser.add_argument('--workers', type=int, default=None, help="작업 프로세스 수 (기본: CPU 코어 수)")
+    parser.add_argument('--force', action='store_true', help="이미 분석한 세션도 다시 분석합니다")
+    parser.add_argument('--db', default=None, help="구역을 합쳐 넣을 구역 지도 데이터베이스 (예: zone_map.db)")
+    args = parser.parse_args()
+    run_batch(args.inputs, args.mode, args.out, args.workers, args.force, args.db)
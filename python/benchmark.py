@@ -0,0 +1,253 @@
+# benchmark.py
+# 분석 파이프라인의 단계별 성능 측정 (합성 로그 10k / 100k / 1M / 10M 행)
+# 단계마다 걸린 시간, CPU 시간, 최대 메모리(RSS), 초당 처리 행 수를 재서 JSON 으로 저장하고,
+# 저장해 둔 기준 결과(baseline)보다 느려진 단계를 표시합니다. 최적화가 실제로 효과가 있는지 커밋마다 비교하는 용도입니다.
+#
+# - 측정은 (단계, 행 수)마다 새 프로세스(spawn)에서 합니다. 앞 측정이 남긴 메모리/캐시가 다음 측정에 섞이지 않고,
+#   메모리가 모자라 프로세스가 죽어도 그 측정만 실패로 기록됩니다.
+# - 단계의 입력(앞 단계 결과)은 그 프로세스에서 미리 만들어 두고, 시간과 메모리는 단계 함수 호출만 잽니다.
+# - 합성 로그는 BENCH_DATA_DIR 에 한 번 만들어 두고 다시 씁니다.
+#
+# 사용법: python benchmark.py [--sizes 10k 100k 1M 10M] [--stages analyze_log_file ...] [--format parquet|csv|session]
+#         python benchmark.py --save-baseline        (이번 결과를 기준 결과로 저장)
+#         기준 결과보다 느려진 단계가 있으면 종료 코드 1 로 끝납니다.
+
+import argparse
+import contextlib
+import gc
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+
+from stage_profiler import current_rss_mb, peak_rss_mb, reset_peak_rss
+from synthetic_log import FORMAT_EXTENSIONS, SAMPLE_HZ, ChunkLogWriter, SyntheticDevice
+
+# 단계 함수 안의 plt.show() 가 창을 띄우지 않도록 (측정 프로세스는 이 모듈을 다시 import 하므로 여기서 설정)
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+# ---------------------------
+# 설정
+# ---------------------------
+SIZES = (10_000, 100_000, 1_000_000, 10_000_000)
+# 측정하는 단계: 이름 -> (모듈, 함수). 입력은 prepare_stage 에서 만듭니다.
+STAGES = {
+    'analyze_log_file': ('anal_special_point_and_plot_map', 'analyze_log_file'),
+    'apply_kalman_filter': ('anal_special_point_and_plot_map', 'apply_kalman_filter'),
+    'process_and_cluster_zones': ('anal_special_point_and_plot_map', 'process_and_cluster_zones'),
+    'create_map_with_zones': ('anal_special_point_and_plot_map', 'create_map_with_zones'),
+    'detect_steps_and_gait_features': ('anal_special_point_and_plot_map', 'detect_steps_and_gait_features'),
+    'calculate_pdr_path': ('anal_indoor', 'calculate_pdr_path'),
+}
+# 작은 로그는 잡음이 크므로 여러 번 재서 가장 빠른 값을 씁니다. (REPEAT_MAX_ROWS 보다 큰 로그는 한 번)
+REPEAT = 3
+REPEAT_MAX_ROWS = 100_000
+
+BENCH_DATA_DIR = 'benchmark_data'
+BENCH_RESULT_DIR = 'benchmark_results'
+BASELINE_FILE = 'baseline.json'
+# 기준 결과보다 이 비율 이상, 그리고 이 시간(초) 이상 느려지면 성능 저하로 표시합니다.
+REGRESSION_TOLERANCE = 0.2
+REGRESSION_MIN_SECONDS = 0.05
+
+# 합성 로그 시작 시각 (결과 파일이 실행할 때마다 같도록 고정)
+BENCH_START_NS = 1_700_000_000_000_000_000
+
+
+# ---------------------------
+# 합성 로그
+# ---------------------------
+def synthetic_log_path(rows, fmt='parquet', data_dir=BENCH_DATA_DIR):
+    """
+    rows 행 합성 로그 파일 경로. 없으면 synthetic_log 의 장치 한 대로 만듭니다.
+    행 수가 정확히 rows 가 되도록 패킷 손실/지연 흔들림은 끄고, GPS 는 나누지 않습니다.
+    """
+    stem = os.path.join(data_dir, f"sensor_log_bench_{rows}")
+    path = stem + FORMAT_EXTENSIONS[fmt]
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"합성 로그 {rows}행을 '{path}' 에 만듭니다...")
+        device = SyntheticDevice(0, rows / SAMPLE_HZ, start_ns=BENCH_START_NS, packet_loss=0, jitter_ms=0)
+        writer = ChunkLogWriter(stem + '.tmp', fmt, split_gps=False)
+        for chunk in device.chunks():
+            writer.write(chunk)
+        writer.close()
+        # 세션 인덱스 같은 딸린 파일을 먼저 옮기고, 있는지 확인하는 로그 파일은 마지막에 옮깁니다.
+        for tmp in sorted(glob.glob(glob.escape(stem + '.tmp') + '*'), key=lambda p: p == writer.path):
+            os.replace(tmp, stem + tmp[len(stem + '.tmp'):])
+    return path
+
+
+# ---------------------------
+# 측정 (측정 프로세스에서 실행)
+# ---------------------------
+def prepare_stage(stage, path, work_dir):
+    """단계 함수의 인자를 만듭니다. (앞 단계는 여기서 미리 실행하고 측정하지 않음)"""
+    import anal_special_point_and_plot_map as special
+    from sensor_features import FRAME_COLUMNS
+    from sensor_log import load_sensor_log
+
+    # 결과 파일은 작업 폴더 대신 임시 폴더에 씁니다.
+    special.OUTPUT_ZONES_CSV_PATH = os.path.join(work_dir, 'zones.csv')
+    special.OUTPUT_MAP_PATH = os.path.join(work_dir, 'map.html')
+
+    if stage == 'analyze_log_file':
+        return (path,)
+    if stage == 'apply_kalman_filter':
+        return (special.valid_gps_rows(load_sensor_log(path, columns=FRAME_COLUMNS)),)
+    if stage == 'calculate_pdr_path':
+        return (load_sensor_log(path, columns=FRAME_COLUMNS),)
+    features, df_kalman = special.analyze_log_file(path)
+    if stage == 'process_and_cluster_zones':
+        return (features,)
+    if stage == 'create_map_with_zones':
+        return (special.process_and_cluster_zones(features), df_kalman)
+    return (df_kalman,)
+
+
+def measure_stage(stage, path, rows, repeat=1):
+    """
+    (측정 프로세스) 단계를 repeat 번 실행해 가장 빠른 실행의 측정값 dict 를 반환합니다. 단계의 출력은 버립니다.
+    단계 함수가 인자를 고치기도 하므로 입력은 실행마다 새로 만듭니다.
+    """
+    import importlib
+    module_name, func_name = STAGES[stage]
+    func = getattr(importlib.import_module(module_name), func_name)
+    warnings.filterwarnings('ignore')   # Agg 백엔드의 plt.show() 경고 등
+    runs = []
+    with tempfile.TemporaryDirectory() as work_dir, open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            args = prepare_stage(stage, path, work_dir)
+            gc.collect()
+            rss_before = current_rss_mb()
+            reset_peak_rss()
+            started, cpu_started = time.perf_counter(), time.process_time()
+            func(*args)
+            seconds = time.perf_counter() - started
+            cpu_seconds = time.process_time() - cpu_started
+            peak = peak_rss_mb()
+            runs.append({'seconds': seconds, 'cpu_seconds': cpu_seconds, 'rss_before_mb': rss_before, 'peak_rss_mb': peak,
+                         'peak_rss_delta_mb': max(peak - rss_before, 0.0),
+                         'rows_per_sec': rows / seconds if seconds > 0 else None})
+            del args
+            if 'matplotlib.pyplot' in sys.modules:
+                sys.modules['matplotlib.pyplot'].close('all')
+    return dict(min(runs, key=lambda run: run['seconds']), runs=len(runs))
+
+
+def run_measurement(stage, path, rows, repeat=1):
+    """새 프로세스에서 단계를 측정합니다. 프로세스가 죽으면(메모리 부족 등) status 'crashed'."""
+    context = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            return dict(pool.submit(measure_stage, stage, path, rows, repeat).result(), status='ok')
+    except BrokenProcessPool:
+        return {'status': 'crashed', 'error': "측정 프로세스가 비정상 종료했습니다 (메모리 부족일 수 있음)"}
+    except Exception as e:
+        return {'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+
+
+# ---------------------------
+# 실행 / 기준 결과와 비교
+# ---------------------------
+def git_revision():
+    """현재 커밋 (짧은 해시, 커밋하지 않은 변경이 있으면 '-dirty'). git 이 없으면 None."""
+    try:
+        here = os.path.dirname(os.path.abspath(__file__))
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=here, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=here, capture_output=True,
+                               text=True, check=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes=SIZES, stages=tuple(STAGES), fmt='parquet', repeat=REPEAT, data_dir=BENCH_DATA_DIR):
+    """모든 (단계, 행 수)를 측정해 결과 dict 를 반환합니다."""
+    results = []
+    for rows in sizes:
+        path = os.path.abspath(synthetic_log_path(rows, fmt, data_dir))
+        for stage in stages:
+            result = dict(run_measurement(stage, path, rows, repeat if rows <= REPEAT_MAX_ROWS else 1), stage=stage, rows=rows)
+            results.append(result)
+            if result['status'] == 'ok':
+                print(f"{stage:32s} {rows:>10,}행  {result['seconds']:8.3f}초  CPU {result['cpu_seconds']:8.3f}초  "
+                      f"최대 RSS {result['peak_rss_mb']:8.1f}MB (+{result['peak_rss_delta_mb']:.1f})  "
+                      f"{result['rows_per_sec']:>12,.0f}행/초")
+            else:
+                print(f"{stage:32s} {rows:>10,}행  ❌ {result['error']}")
+    return {'commit': git_revision(), 'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'format': fmt,
+            'python': platform.python_version(), 'machine': platform.platform(), 'cpu_count': os.cpu_count(),
+            'results': results}
+
+
+def compare_with_baseline(report, baseline, tolerance=REGRESSION_TOLERANCE, min_seconds=REGRESSION_MIN_SECONDS):
+    """기준 결과보다 느려진 (단계, 행 수) 목록을 반환하고, 단계마다 변화율을 출력합니다."""
+    base = {(r['stage'], r['rows']): r for r in baseline['results'] if r['status'] == 'ok'}
+    regressions = []
+    print(f"\n기준 결과 (커밋 {baseline.get('commit')}, {baseline.get('created')}) 와 비교:")
+    for result in report['results']:
+        old = base.get((result['stage'], result['rows']))
+        if old is None or result['status'] != 'ok':
+            continue
+        change = result['seconds'] / old['seconds'] - 1 if old['seconds'] > 0 else 0.0
+        slower = change > tolerance and result['seconds'] - old['seconds'] > min_seconds
+        mark = '⚠️ 느려짐' if slower else ''
+        print(f"{result['stage']:32s} {result['rows']:>10,}행  {old['seconds']:8.3f}초 -> {result['seconds']:8.3f}초 "
+              f"({change:+.0%})  RSS {old['peak_rss_mb']:.0f} -> {result['peak_rss_mb']:.0f}MB {mark}")
+        if slower:
+            regressions.append({'stage': result['stage'], 'rows': result['rows'], 'baseline_seconds': old['seconds'],
+                                'seconds': result['seconds'], 'change': change})
+    return regressions
+
+
+def parse_size(text):
+    """'10k', '1M', '2500' 같은 행 수 문자열."""
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1].lower(), 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="분석 파이프라인 단계별 성능을 합성 로그로 측정합니다.")
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=list(SIZES), help="로그 행 수 (예: 10k 1M)")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--format', choices=sorted(FORMAT_EXTENSIONS), default='parquet', help="합성 로그 형식 (기본: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help=f"{REPEAT_MAX_ROWS}행 이하 로그의 반복 측정 횟수")
+    parser.add_argument('--data-dir', default=BENCH_DATA_DIR, help="합성 로그 폴더 (기본: %(default)s)")
+    parser.add_argument('--out', default=None, help=f"결과 JSON (기본: {BENCH_RESULT_DIR}/bench_<커밋>.json)")
+    parser.add_argument('--baseline', default=os.path.join(BENCH_RESULT_DIR, BASELINE_FILE), help="기준 결과 JSON")
+    parser.add_argument('--save-baseline', action='store_true', help="이번 결과를 기준 결과로 저장합니다")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, args.stages, args.format, args.repeat, args.data_dir)
+    out = args.out or os.path.join(BENCH_RESULT_DIR, f"bench_{report['commit'] or time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"\n결과를 '{out}' 에 저장했습니다.")
+
+    regressions = []
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"기준 결과로 '{args.baseline}' 에 저장했습니다.")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_with_baseline(report, json.load(f))
+        report['regressions'] = regressions
+        with open(out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"\n⚠️ 기준보다 느려진 측정 {len(regressions)}개" if regressions else "\n✅ 기준보다 느려진 단계가 없습니다.")
+    else:
+        print(f"기준 결과 '{args.baseline}' 가 없습니다. --save-baseline 으로 만들 수 있습니다.")
+    sys.exit(1 if regressions else 0)
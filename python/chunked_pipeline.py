@@ -0,0 +1,428 @@
+# chunked_pipeline.py
+# 메모리보다 큰 로그를 위한 조각 단위(out-of-core) 구역 분석 파이프라인
+# 로그를 CHUNK_ROWS 행씩 읽으면서 칼만 필터 상태, PDR 방향/위치, 윈도우 겹침, 진행 중인 구역(연속 구간)을
+# 조각 사이에 넘겨주므로, 행 데이터가 차지하는 메모리는 파일 길이와 상관없이 조각 크기 + MAX_PENDING_ROWS 정도로 유지되고
+# 결과(특징, 구역)는 파일을 통째로 읽는 기존 분석 경로와 같습니다.
+# 파일 길이에 비례해 자라는 것은 지도 표시용 경로(KalmanStage: GPS fix 마다 한 행, PdrStage: 걸음마다 한 행 - IMU 행의 1/50 이하)와
+# 확정된 구역 목록뿐입니다. 임계값을 넘는 윈도우가 끊기지 않고 이어지면 ZoneStage 는 그 구간의 특징(행의 1/STEP_SIZE)을 들고 있습니다.
+#
+# 각 단계는 push(df) 로 조각을 받아 '확정된' 행만 돌려주고, 아직 다음 조각을 봐야 값이 정해지는 행은 들고 있다가
+# finish() 에서 내보냅니다. (예: 선형 보간은 다음 fix/걸음이 와야 값이 정해짐)
+#
+# 사용 예 (anal_special_point_and_plot_map.py):
+#     kalman = KalmanStage(KALMAN_R_VAL, KALMAN_Q_VAL, POSITION_JOIN)
+#     pipeline = ZoneAnalysisPipeline([RowFilter(valid_gps_rows), kalman],
+#                                     WindowFeatureStage(WINDOW_SIZE, STEP_SIZE, 'lat_filtered', 'lon_filtered'),
+#                                     ZoneStage(cluster_zones, {'z_variance': VAR_THRESHOLD, 'mean_pitch': PITCH_THRESHOLD}))
+#     for features, zones in pipeline.run(iter_sensor_log(path, CHUNK_ROWS, FRAME_COLUMNS)):
+#         ...
+
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+
+from gps_fixes import fix_change_mask, join_positions
+from kalman import KalmanStream
+from pdr import STEP_SMOOTH_WINDOW, smooth_az
+from sensor_features import window_features
+
+# ---------------------------
+# 설정
+# ---------------------------
+# 한 번에 읽는 로그 행 수 (50Hz 기준 200,000행 = 약 67분)
+CHUNK_ROWS = 200_000
+
+# 걸음 피크를 확정할 때 앞뒤로 더 보는 여유 (걸음 최소 간격의 배수).
+# find_peaks 의 distance 조건은 더 높은 이웃 피크에 따라 연쇄적으로 정해지므로, 이 여유만큼 뒤의 신호를 본 뒤에 확정합니다.
+PEAK_DISTANCE_MARGIN = 10
+
+# 다음 GPS fix / 다음 걸음을 기다리며 들고 있는 행의 최대 수. (GPS 가 끊기면 펌웨어가 마지막 fix 를 반복하고, 제자리에 서 있으면 걸음이 없음)
+# 넘치면 기다리던 행은 마지막 fix / 마지막 걸음 위치로 채워(ffill) 내보냅니다. 그 구간만 보간 대신 직전 값이 되므로 기존 분석과 달라집니다.
+MAX_PENDING_ROWS = CHUNK_ROWS
+
+
+def _concat(frames):
+    frames = [frame for frame in frames if frame is not None and len(frame)]
+    if not frames:
+        return None
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+# ---------------------------
+# 행 단위 단계
+# ---------------------------
+class RowFilter:
+    """행마다 독립적으로 적용되는 필터/변환 (예: 비정상 GPS 좌표 제거, 컬럼 선택). fn(df) 는 남길 행만 반환해야 합니다."""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.rows_in = 0
+        self.rows_out = 0
+
+    def push(self, df):
+        out = self.fn(df)
+        self.rows_in += len(df)
+        self.rows_out += len(out)
+        return out.reset_index(drop=True)
+
+    def finish(self):
+        return None
+
+
+class KalmanStage:
+    """
+    lat/lon 에 kalman.kalman_track_fixes 와 같은 보정을 적용해 lat_filtered/lon_filtered 컬럼을 붙입니다.
+    fix 판정(직전 좌표), 칼만 필터 상태, 마지막 보정 fix 를 조각 사이에 유지합니다.
+    (RTS 스무딩은 기록 끝에서 거꾸로 오는 단계라 조각 단위로는 할 수 없습니다)
+    'interp' 는 다음 fix 를 기다리는 행을 max_pending 행까지만 들고 있고, 넘치면 마지막 fix 값으로 내보냅니다. (ffill_rows 에 셈)
+    """
+
+    def __init__(self, r, q, join='asof', max_pending=MAX_PENDING_ROWS):
+        if join not in ('asof', 'interp'):
+            raise ValueError(f"알 수 없는 위치 결합 방식입니다: {join}")
+        self.stream = KalmanStream(r, q)
+        self.join = join
+        self.max_pending = max_pending
+        self.fix_count = 0
+        self.ffill_rows = 0
+        self._rows = 0            # 지금까지 받은 행 수 (전체 행 번호)
+        self._last_fix = None     # 직전 행의 (lat, lon)
+        self._anchor = None       # (행 번호, 보정된 (lat, lon)) 마지막 fix
+        self._pending = None      # 'interp': 마지막 fix 이후, 다음 fix 를 기다리는 행
+        self._pending_start = 0
+        self._path = []
+
+    def push(self, df):
+        if len(df) == 0:
+            return None
+        z = df[['lat', 'lon']].to_numpy(dtype=np.float64)
+        fix_pos = np.flatnonzero(fix_change_mask(z[:, 0], z[:, 1], self._last_fix))
+        self._last_fix = z[-1]
+        fix_rows = self._rows + fix_pos
+        filtered = self.stream.update(z[fix_pos])[:, 0, :]
+        self.fix_count += len(fix_pos)
+        start = self._rows
+        self._rows += len(df)
+
+        # 경로 표시는 fix 행만 모아 둡니다. (행 전체를 들고 있지 않도록)
+        if len(fix_pos):
+            self._path.append(pd.DataFrame({'lat': z[fix_pos, 0], 'lon': z[fix_pos, 1],
+                                            'lat_filtered': filtered[:, 0], 'lon_filtered': filtered[:, 1]}))
+
+        anchor_rows, anchor_values = fix_rows, filtered
+        if self._anchor is not None:
+            anchor_rows = np.concatenate(([self._anchor[0]], fix_rows))
+            anchor_values = np.vstack((self._anchor[1], filtered))
+        if len(fix_rows):
+            self._anchor = (fix_rows[-1], filtered[-1])
+
+        if self.join == 'asof':
+            return self._attach(df, join_positions(start + np.arange(len(df)), anchor_rows, anchor_values, 'asof'))
+
+        # 'interp': 마지막 fix 까지의 행만 값이 정해집니다.
+        rows = _concat([self._pending, df])
+        rows_start = self._pending_start if self._pending is not None else start
+        ready = 0 if self._anchor is None else self._anchor[0] - rows_start + 1
+        out = None
+        if ready > 0:
+            out = self._attach(rows.iloc[:ready].reset_index(drop=True),
+                               join_positions(rows_start + np.arange(ready), anchor_rows, anchor_values, 'interp'))
+        self._pending = rows.iloc[max(ready, 0):].reset_index(drop=True)
+        self._pending_start = rows_start + max(ready, 0)
+        if len(self._pending) > self.max_pending:
+            # fix 가 오래 바뀌지 않으면 기다리던 행을 마지막 fix 값으로 내보냅니다. (fix 가 아직 없으면 'asof' 처럼 NaN)
+            self.ffill_rows += len(self._pending)
+            out = _concat([out, self._flush_pending()])
+        return out
+
+    def finish(self):
+        if self._pending is None or len(self._pending) == 0 or self._anchor is None:
+            return None
+        # 마지막 fix 이후의 행은 마지막 fix 값 (np.interp 의 오른쪽 끝 처리와 같음)
+        return self._flush_pending()
+
+    def _flush_pending(self):
+        value = self._anchor[1] if self._anchor is not None else np.full(2, np.nan)
+        out = self._attach(self._pending, np.tile(value, (len(self._pending), 1)))
+        self._pending_start += len(self._pending)
+        self._pending = None
+        return out
+
+    @staticmethod
+    def _attach(df, coords):
+        df = df.copy()
+        df['lat_filtered'] = coords[:, 0]
+        df['lon_filtered'] = coords[:, 1]
+        return df
+
+    def path(self):
+        """GPS fix 마다의 원본/보정 좌표 (지도 경로 표시용). fix 는 약 1초에 하나라 IMU 행보다 훨씬 작지만, 기록 길이에 비례합니다."""
+        return _concat(self._path) if self._path else pd.DataFrame(columns=['lat', 'lon', 'lat_filtered', 'lon_filtered'])
+
+
+class PdrStage:
+    """
+    anal_indoor.calculate_pdr_path 와 같은 PDR 경로(pos_x, pos_y)를 조각 단위로 계산합니다.
+    걸음 피크는 앞뒤 여유 구간을 본 뒤에 확정하고, 자이로 누적 적분/마지막 걸음 위치를 조각 사이에 유지합니다.
+    걸음 사이의 샘플은 다음 걸음이 확정될 때까지 기다렸다가 보간해서 내보냅니다.
+    걸음 없이 max_pending 샘플이 지나면(제자리에 오래 서 있음) 그때까지의 행은 마지막 걸음 위치로 내보내고,
+    다음 걸음의 보폭은 마지막 max_pending 샘플 구간만으로 계산합니다.
+    """
+
+    def __init__(self, prominence, min_interval, wlen, step_model, sampling_period, max_pending=MAX_PENDING_ROWS):
+        if wlen is None:
+            raise ValueError("조각 단위 PDR 에는 피크 prominence 구간 길이(wlen)가 필요합니다")
+        self.prominence = prominence
+        self.min_interval = min_interval
+        self.wlen = wlen
+        self.step_model = step_model
+        self.sampling_period = sampling_period
+        self.margin = wlen + PEAK_DISTANCE_MARGIN * min_interval
+        self.max_pending = max_pending
+
+        self.total = 0                       # 지금까지 받은 샘플 수
+        self._half = STEP_SMOOTH_WINDOW // 2
+        self._start = 0                      # 버퍼 첫 샘플의 전체 번호
+        self._az = np.zeros(0)               # 원본 az (버퍼 구간)
+        self._smooth = np.zeros(0)           # 평활된 az (확정된 부분만, 버퍼 구간)
+        self._gyro = np.zeros(0)             # 자이로 z축 누적 적분 G[k] (k 번째 샘플 직전까지의 합, 버퍼 구간)
+        self._gyro_total = 0.0
+        self._frontier = 0                   # 이 번호 이전의 피크는 확정됨
+        self._rows = None                    # 위치가 아직 정해지지 않은 행 (전체 번호 self._rows_start 부터)
+        self._rows_start = 0
+
+        self.step_count = 0                  # 확정된 걸음 수
+        self.step_positions = [np.zeros((0, 2))]   # 걸음마다의 위치 - 경로 표시용
+        self._first_step_gyro = None
+        self._last_step = None               # (전체 번호, 위치)
+
+    def push(self, df):
+        if len(df) == 0:
+            return None
+        az = df['az'].to_numpy(dtype=np.float64)
+        gz_rad = np.deg2rad(df['gz'].to_numpy(dtype=np.float64))
+        self._append_signal(az, gz_rad, final=False)
+        self._rows = _concat([self._rows, df])
+        return self._advance(final=False)
+
+    def finish(self):
+        self._append_signal(np.zeros(0), np.zeros(0), final=True)
+        out = self._advance(final=True)
+        if self.step_count < 2:
+            print("경로를 추정하기에 걸음 수가 부족합니다. PDR_PEAK_PROMINENCE 값을 조절해보세요.")
+        return out
+
+    def _append_signal(self, az, gz_rad, final):
+        # 누적 적분은 전체를 한 번에 np.nancumsum 한 것과 같은 순서로 더합니다.
+        gyro = np.nancumsum(np.concatenate(([self._gyro_total], gz_rad)))
+        self._gyro = np.concatenate((self._gyro, gyro[:-1]))
+        self._gyro_total = gyro[-1]
+        self._az = np.concatenate((self._az, az))
+        self.total += len(az)
+
+        # 평활값: 오른쪽 이웃이 다 들어온 샘플까지만 확정합니다. (마지막 조각이면 끝까지, 끝부분은 0)
+        known = self._start + len(self._smooth)
+        upto = self.total if final else max(self.total - (STEP_SMOOTH_WINDOW - 1 - self._half), known)
+        lo = max(known - self._half, 0)
+        segment = smooth_az(self._az[lo - self._start:])
+        # segment 왼쪽 끝의 0 은 버리고 (전체 신호의 시작이면 그 0 이 맞는 값) 새로 확정된 부분만 붙입니다.
+        self._smooth = np.concatenate((self._smooth, segment[known - lo:upto - lo]))
+
+    def _advance(self, final):
+        smooth_end = self._start + len(self._smooth)
+        # 피크 확정 구간: [frontier, accept_end)
+        accept_end = smooth_end if final else smooth_end - self.margin
+        new_steps = np.zeros(0, dtype=np.int64)
+        if accept_end > self._frontier:
+            lo = max(self._frontier - self.margin, self._start)
+            peaks, _ = find_peaks(self._smooth[lo - self._start:], prominence=self.prominence,
+                                  distance=self.min_interval, wlen=self.wlen)
+            peaks = peaks + lo
+            new_steps = peaks[(peaks >= self._frontier) & (peaks < accept_end)]
+            self._frontier = accept_end
+
+        out = self._place_steps(new_steps, final)
+        self._trim()
+        return out
+
+    def _place_steps(self, new_steps, final):
+        anchors = []
+        if len(new_steps):
+            if self._first_step_gyro is None:
+                self._first_step_gyro = self._gyro[new_steps[0] - self._start]
+                self._last_step = (int(new_steps[0]), np.zeros(2))
+                self.step_positions.append(np.zeros((1, 2)))
+                self.step_count += 1
+                new_steps = new_steps[1:]
+            if len(new_steps):
+                prev, prev_pos = self._last_step
+                all_steps = np.concatenate(([prev], new_steps))
+                headings = (self._gyro[new_steps - self._start] - self._first_step_gyro) * self.sampling_period
+                lengths = self.step_model(self._smooth[prev - self._start:], all_steps - prev)
+                x = np.cumsum(np.concatenate(([prev_pos[0]], lengths * np.cos(headings))))[1:]
+                y = np.cumsum(np.concatenate(([prev_pos[1]], lengths * np.sin(headings))))[1:]
+                positions = np.column_stack([x, y])
+                self.step_positions.append(positions)
+                self.step_count += len(new_steps)
+                anchors.append((all_steps, np.vstack((prev_pos, positions))))
+                self._last_step = (int(new_steps[-1]), positions[-1])
+            else:
+                anchors.append((np.array([self._last_step[0]]), self._last_step[1][None, :]))
+
+        if self._rows is None or len(self._rows) == 0:
+            return None
+        # 마지막 확정 걸음까지의 행은 위치가 정해집니다. 아직 걸음이 없으면 확정 구간 앞의 행은 첫 걸음 이전이므로 원점.
+        # (마지막 조각이면 전부)
+        if final:
+            ready = len(self._rows)
+        elif self._last_step is not None:
+            ready = max(self._last_step[0] - self._rows_start + 1, 0)
+        else:
+            ready = max(min(self._frontier, self.total) - self._rows_start, 0)
+        if ready == 0:
+            return None
+
+        samples = self._rows_start + np.arange(ready)
+        if self._last_step is None:
+            positions = np.zeros((ready, 2))
+        else:
+            if anchors:
+                steps, values = anchors[0]
+            else:
+                steps, values = np.array([self._last_step[0]]), self._last_step[1][None, :]
+            positions = np.column_stack([np.interp(samples, steps, values[:, 0]),
+                                         np.interp(samples, steps, values[:, 1])])
+        out = self._rows.iloc[:ready].copy()
+        out['pos_x'] = positions[:, 0]
+        out['pos_y'] = positions[:, 1]
+        self._rows = self._rows.iloc[ready:].reset_index(drop=True)
+        self._rows_start += ready
+        return out.reset_index(drop=True)
+
+    def _trim(self):
+        # 다음 피크 판정에 필요한 여유 구간과 마지막 걸음 이후만 남깁니다.
+        keep = self._frontier - self.margin - self._half
+        if self._last_step is not None:
+            if keep - self._last_step[0] > self.max_pending:
+                # 걸음이 오래 없으면 마지막 걸음을 같은 위치 그대로 앞으로 옮깁니다. (그 사이 행은 제자리, 버퍼는 max_pending 샘플까지)
+                self._last_step = (keep - self.max_pending, self._last_step[1])
+            keep = min(keep, self._last_step[0])
+        cut = keep - self._start
+        if cut > 0:
+            self._az = self._az[cut:]
+            self._smooth = self._smooth[cut:]
+            self._gyro = self._gyro[cut:]
+            self._start = keep
+
+    def path(self):
+        """확정된 걸음마다의 위치 (경로 표시용). 걸음 수에 비례합니다."""
+        positions = np.vstack(self.step_positions)
+        return pd.DataFrame({'pos_x': positions[:, 0], 'pos_y': positions[:, 1]})
+
+
+# ---------------------------
+# 윈도우 특징 / 구역 단계
+# ---------------------------
+class WindowFeatureStage:
+    """
+    sensor_features.window_features 를 조각 단위로 적용합니다.
+    다음 윈도우 시작점 이후의 행(최대 WINDOW_SIZE 행 남짓)을 다음 조각으로 넘겨, 윈도우 경계가 전체 로그 기준과 같게 유지됩니다.
+    """
+
+    def __init__(self, window_size, step_size, lat_col='lat', lon_col='lon'):
+        self.window_size = window_size
+        self.step_size = step_size
+        self.lat_col = lat_col
+        self.lon_col = lon_col
+        self._buffer = None
+
+    def push(self, df):
+        buffer = _concat([self._buffer, df])
+        if buffer is None:
+            return None
+        features = window_features(buffer, self.window_size, self.step_size, self.lat_col, self.lon_col)
+        # window_features 의 윈도우 시작점은 range(0, len - window_size, step_size) 이므로, 그 다음 시작점부터 남깁니다.
+        window_count = len(range(0, len(buffer) - self.window_size, self.step_size))
+        self._buffer = buffer.iloc[window_count * self.step_size:].reset_index(drop=True)
+        return features
+
+    def finish(self):
+        # 남은 행으로는 완전한 윈도우가 나오지 않습니다. (전체 로그 기준으로도 마지막 윈도우 이후)
+        return None
+
+
+class ZoneStage:
+    """
+    윈도우 특징을 받아 구역(연속 구간)이 끝나는 대로 cluster_fn 으로 확정합니다.
+    thresholds 의 어느 조건이든 True 인 연속 구간이 조각 끝까지 이어지면, 그 구간은 다음 조각과 합쳐서 판단합니다.
+    cluster_fn(feature_df) 는 구역 dict 목록을 반환해야 합니다. (분석 스크립트의 cluster_zones)
+    """
+
+    def __init__(self, cluster_fn, thresholds, zone_types=('Stair/Bump Zone', 'Ramp Zone')):
+        self.cluster_fn = cluster_fn
+        self.thresholds = thresholds
+        self.zone_types = list(zone_types)
+        self.feature_count = 0
+        self._buffer = None
+        self._zones = []
+
+    def push(self, features):
+        if features is not None:
+            self.feature_count += len(features)
+        buffer = _concat([self._buffer, features])
+        if buffer is None or len(buffer) < 2:
+            self._buffer = buffer
+            return []
+        flags = np.column_stack([buffer[col].to_numpy() > threshold for col, threshold in self.thresholds.items()])
+        # 자를 수 있는 위치: 바로 앞 행과 함께 True 인 조건이 하나도 없는 행
+        cuttable = np.flatnonzero(~(flags[:-1] & flags[1:]).any(axis=1)) + 1
+        if len(cuttable) == 0:
+            self._buffer = buffer
+            return []
+        cut = cuttable[-1]
+        self._buffer = buffer.iloc[cut:].reset_index(drop=True)
+        return self._cluster(buffer.iloc[:cut].reset_index(drop=True))
+
+    def finish(self):
+        buffer, self._buffer = self._buffer, None
+        return self._cluster(buffer) if buffer is not None and len(buffer) else []
+
+    def _cluster(self, features):
+        zones = self.cluster_fn(features)
+        self._zones.extend(zones)
+        return zones
+
+    def zones(self):
+        """지금까지 확정된 구역 전체. 기존 분석과 같게 종류 순서(계단 -> 경사로), 종류 안에서는 시간 순서입니다."""
+        order = {zone_type: i for i, zone_type in enumerate(self.zone_types)}
+        return pd.DataFrame(sorted(self._zones, key=lambda zone: order.get(zone['type'], len(order))))
+
+
+class ZoneAnalysisPipeline:
+    """행 단계들 -> 윈도우 특징 -> 구역 순서로 조각을 흘려보냅니다."""
+
+    def __init__(self, row_stages, feature_stage, zone_stage):
+        self.row_stages = list(row_stages)
+        self.feature_stage = feature_stage
+        self.zone_stage = zone_stage
+
+    def run(self, chunks):
+        """조각마다 (이번에 확정된 특징 DataFrame 또는 None, 이번에 확정된 구역 목록) 을 내보냅니다."""
+        for chunk in chunks:
+            yield self._step(chunk, final=False)
+        yield self._step(None, final=True)
+
+    def _step(self, df, final):
+        for stage in self.row_stages:
+            if final:
+                # 앞 단계가 마지막에 내보낸 행을 넣은 뒤 이 단계도 마무리합니다.
+                df = _concat([stage.push(df) if df is not None and len(df) else None, stage.finish()])
+            elif df is not None and len(df):
+                df = stage.push(df)
+        features = self.feature_stage.push(df) if df is not None and len(df) else None
+        if final:
+            features = _concat([features, self.feature_stage.finish()])
+        zones = self.zone_stage.push(features)
+        if final:
+            zones = zones + self.zone_stage.finish()
+        return features, zones
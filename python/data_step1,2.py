@@ -3,6 +3,9 @@ import numpy as np
 from scipy.signal import find_peaks
 import os
 
+from sensor_features import FRAME_COLUMNS
+from sensor_log import load_sensor_log
+
     # 2단계에서 생성된 feature_df를 사용합니다.
 import matplotlib.pyplot as plt
 
@@ -51,7 +54,7 @@ def create_dummy_data(filename):
         'gx': gx, 'gy': gy, 'gz': gz, 
         'mx': mx, 'my': my, 'mz': mz
     })
-    dummy_df.to_csv(filename, index=False, header=False)
+    dummy_df.to_csv(filename, index=False)
 
 # --------------------------------------------------------------------
 # 🚀 1단계: 데이터 로딩 및 전처리 (수정됨)
@@ -62,9 +65,9 @@ def load_and_preprocess_data(filepath):
     """
     print("\n--- 1단계: 데이터 로딩 및 전처리 시작 ---")
     
-    # CSV 파일 읽기 (컬럼 순서 변경)
-    col_names = ['lat', 'lon', 'ax', 'ay', 'az', 'gx', 'gy', 'gz', 'mx', 'my', 'mz', 'timestamp']
-    df = pd.read_csv(filepath, names=col_names, skiprows=1)
+    # 로그(CSV/Parquet)에서 센서 값 컬럼만 읽습니다.
+    # (seq, device_ms 처럼 비어 있을 수 있는 컬럼은 읽지 않으므로 아래 dropna 에 영향을 주지 않습니다)
+    df = load_sensor_log(filepath, columns=FRAME_COLUMNS)
     
     # 결측치가 있는 행 제거
     df.dropna(inplace=True)
@@ -0,0 +1,66 @@
+# gps_fixes.py
+# GPS 고정점(fix) 스트림 처리
+# 펌웨어는 GPS 값(lastLat/lastLon)을 약 1초에 한 번 갱신하지만 50Hz IMU 프레임마다 같은 값을 실어 보냅니다.
+# 그래서 기록할 때는 값이 바뀐 행만 GPS 스트림으로 따로 저장하고, 분석할 때는 고유한 fix 만 필터링한 뒤
+# IMU 행에 as-of(직전 fix) 또는 선형 보간으로 다시 붙입니다.
+
+import numpy as np
+
+
+def fix_change_mask(lat, lon, last_fix=None):
+    """
+    새 GPS fix 인 행(직전 행과 lat/lon 이 다른 행)을 True 로 표시합니다.
+    last_fix 는 직전 블록의 마지막 (lat, lon) 으로, 블록을 나눠 넣어도 한 번에 넣은 것과 결과가 같습니다.
+    NaN 끼리는 같은 값으로 봅니다. (fix 가 없는 동안 NaN 이 반복되면 처음 한 번만 기록)
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if len(lat) == 0:
+        return np.zeros(0, dtype=bool)
+    if last_fix is None:
+        prev_lat = np.concatenate(([np.nan], lat[:-1]))
+        prev_lon = np.concatenate(([np.nan], lon[:-1]))
+    else:
+        prev_lat = np.concatenate(([last_fix[0]], lat[:-1]))
+        prev_lon = np.concatenate(([last_fix[1]], lon[:-1]))
+
+    def changed(curr, prev):
+        return ~((curr == prev) | (np.isnan(curr) & np.isnan(prev)))
+
+    mask = changed(lat, prev_lat) | changed(lon, prev_lon)
+    if last_fix is None:
+        mask[0] = True
+    return mask
+
+
+def unique_fixes(lat, lon):
+    """lat/lon 이 반복 기록된 로그에서 새 fix 가 시작되는 행 번호 배열을 반환합니다."""
+    return np.flatnonzero(fix_change_mask(lat, lon))
+
+
+def join_positions(times, fix_times, fix_values, method='asof'):
+    """
+    fix 값(fix 수, 열 수)을 IMU 행 시각 times 에 맞춰 붙입니다. fix_times, times 는 오름차순이어야 합니다.
+    - 'asof'  : 각 행에 그 시각 이전(같은 시각 포함)의 마지막 fix. 첫 fix 보다 이른 행은 NaN.
+    - 'interp': 앞뒤 fix 사이를 시각 기준으로 선형 보간. 첫 fix 이전/마지막 fix 이후는 끝 값으로 고정.
+    """
+    times = np.asarray(times)
+    fix_times = np.asarray(fix_times)
+    fix_values = np.asarray(fix_values, dtype=np.float64).reshape(len(fix_times), -1)
+    out = np.full((len(times), fix_values.shape[1]), np.nan)
+    if len(fix_times) == 0 or len(times) == 0:
+        return out
+
+    if method == 'asof':
+        pos = np.searchsorted(fix_times, times, side='right') - 1
+        known = pos >= 0
+        out[known] = fix_values[pos[known]]
+    elif method == 'interp':
+        # 나노초 정수는 float64 로 바꾸면 정밀도가 떨어지므로 첫 fix 기준의 상대 시각으로 보간합니다.
+        x = (times - fix_times[0]).astype(np.float64)
+        xp = (fix_times - fix_times[0]).astype(np.float64)
+        for col in range(fix_values.shape[1]):
+            out[:, col] = np.interp(x, xp, fix_values[:, col])
+    else:
+        raise ValueError(f"알 수 없는 위치 결합 방식입니다: {method}")
+    return out
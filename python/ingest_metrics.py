@@ -0,0 +1,165 @@
+# ingest_metrics.py
+# 수신 서버(ingest_server.py, rt_z_acc_variance.py, rt_z_acc_variance_serial.py)의 Prometheus 지표
+# 장치별 패킷/바이트/샘플 수, 손실 샘플 수, 파싱 실패, 특징 계산 시간, 큐 깊이, 로그 기록 대기를 로컬 /metrics 포트로 내보냅니다.
+# 데이터를 실제로 잃기 전에 포화가 쌓이는 것(기록 대기 증가, 커널 UDP 수신 큐 증가)을 그래프로 보기 위한 용도입니다.
+#
+# - 카운터는 Prometheus 에서 rate() 로 초당 값(packets/s, bytes/s)을 봅니다. 예: rate(ingest_bytes_total[1m])
+# - 큐 깊이 / 기록 대기처럼 지금 값을 읽기만 하면 되는 것은 수집(scrape)할 때 함수를 불러 읽으므로 수신 루프에는 비용이 없습니다.
+# - 수신 루프에서 패킷마다 부르는 것은 DeviceMetrics 의 메서드뿐입니다. (장치별 레이블 조회는 장치마다 한 번만)
+# - UDP 소켓은 커널의 수신 큐(바이트)와 버린 데이터그램 수(/proc/net/udp, 리눅스만)도 함께 내보냅니다.
+#
+# 확인: curl http://127.0.0.1:9101/metrics
+# 수신 프로그램마다 기본 포트가 다릅니다: ingest_server.py 9101, rt_z_acc_variance.py 9102, rt_z_acc_variance_serial.py 9103
+
+import os
+import socket
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# ---------------------------
+# 설정
+# ---------------------------
+# ingest_server.py 의 기본 포트 (다른 수신 프로그램은 각자의 METRICS_PORT 설정을 씁니다)
+METRICS_PORT = 9101
+# 같은 컴퓨터에서만 수집하도록 루프백에만 엽니다. (다른 컴퓨터의 Prometheus 가 수집하려면 '0.0.0.0')
+METRICS_ADDR = '127.0.0.1'
+# 특징 계산 시간 히스토그램 구간 (초). 패킷 하나(샘플 1~수십 개)의 push_block 시간입니다.
+FEATURE_SECONDS_BUCKETS = (25e-6, 50e-6, 100e-6, 250e-6, 500e-6, 1e-3, 2.5e-3, 5e-3, 10e-3, 25e-3, 50e-3, 0.1)
+
+
+class DeviceMetrics:
+    """장치 하나의 지표 (레이블을 붙인 지표를 미리 만들어 둡니다). 수신 루프에서 패킷마다 부릅니다."""
+
+    __slots__ = ('_packets', '_bytes', '_samples', '_lost', '_feature_seconds')
+
+    def __init__(self, metrics, device_key):
+        self._packets = metrics.packets.labels(device_key)
+        self._bytes = metrics.bytes.labels(device_key)
+        self._samples = metrics.samples.labels(device_key)
+        self._lost = metrics.lost_samples.labels(device_key)
+        self._feature_seconds = metrics.feature_seconds.labels(device_key)
+
+    def packet(self, nbytes, samples):
+        self._packets.inc()
+        self._bytes.inc(nbytes)
+        self._samples.inc(samples)
+
+    def lost(self, samples):
+        if samples > 0:
+            self._lost.inc(samples)
+
+    def feature_time(self, seconds):
+        self._feature_seconds.observe(seconds)
+
+
+def udp_socket_stats(sock):
+    """
+    UDP 소켓의 (커널 수신 큐에 쌓인 바이트, 수신 버퍼가 가득 차서 버린 데이터그램 수). 리눅스가 아니면 None.
+    /proc/net/udp 에서 소켓의 inode 로 찾습니다.
+    """
+    inode = str(os.fstat(sock.fileno()).st_ino)
+    path = '/proc/net/udp6' if sock.family == socket.AF_INET6 else '/proc/net/udp'
+    try:
+        with open(path) as f:
+            next(f)
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 13 and fields[9] == inode:
+                    return int(fields[4].split(':')[1], 16), int(fields[12])
+    except OSError:
+        pass
+    return None
+
+
+class UdpSocketCollector:
+    """UDP 수신 소켓의 커널 수신 큐 / 버린 데이터그램 수를 수집할 때마다 읽어 내보냅니다."""
+
+    def __init__(self, sock, port):
+        self.sock = sock
+        self.port = str(port)
+
+    def collect(self):
+        stats = None if self.sock.fileno() < 0 else udp_socket_stats(self.sock)
+        queue = GaugeMetricFamily('ingest_udp_receive_queue_bytes', "커널 UDP 수신 큐에 쌓인 바이트 (계속 늘면 수신 루프가 못 따라감)",
+                                  labels=['port'])
+        drops = CounterMetricFamily('ingest_udp_drops', "수신 버퍼가 가득 차 커널이 버린 UDP 데이터그램 수", labels=['port'])
+        if stats is not None:
+            queue.add_metric([self.port], stats[0])
+            drops.add_metric([self.port], stats[1])
+        yield queue
+        yield drops
+
+
+def start_metrics(port, addr=METRICS_ADDR):
+    """port 에서 지표를 내보내는 IngestMetrics. port 가 None 이거나 포트를 열지 못하면 None (지표 없이 수신만 계속)."""
+    if port is None:
+        return None
+    metrics = IngestMetrics()
+    return metrics if metrics.start(port, addr) else None
+
+
+class IngestMetrics:
+    """
+    수신 서버 하나의 지표 모음. 레지스트리를 따로 써서 한 프로세스에서 여러 번 만들어도 이름이 겹치지 않습니다.
+    start() 를 부르면 METRICS_PORT 에서 /metrics 를 내보내기 시작합니다. (백그라운드 스레드)
+    """
+
+    def __init__(self, registry=None):
+        self.registry = CollectorRegistry() if registry is None else registry
+        self.packets = Counter('ingest_packets', "받은 패킷(데이터그램 / 스트림 프레임 묶음) 수", ['device'], registry=self.registry)
+        self.bytes = Counter('ingest_bytes', "받은 바이트 수", ['device'], registry=self.registry)
+        self.samples = Counter('ingest_samples', "받은 센서 샘플(행) 수", ['device'], registry=self.registry)
+        self.lost_samples = Counter('ingest_lost_samples', "seq / 수신 간격으로 추정한 손실 샘플 수", ['device'],
+                                    registry=self.registry)
+        self.parse_errors = Counter('ingest_parse_errors', "해석하지 못한 패킷 / 줄 수", ['transport'], registry=self.registry)
+        self.feature_seconds = Histogram('ingest_feature_seconds', "패킷 하나의 특징 계산 시간 (초)", ['device'],
+                                         buckets=FEATURE_SECONDS_BUCKETS, registry=self.registry)
+        self.queue_depth = Gauge('ingest_queue_depth', "내부 큐에 쌓인 항목 수", ['queue'], registry=self.registry)
+        self.writer_backlog = Gauge('ingest_writer_backlog_blocks', "장치 로그 중 아직 기록 스레드가 꺼내지 않은 블록 수",
+                                    ['device'], registry=self.registry)
+        self.devices = Gauge('ingest_devices', "지금 연결된(세션이 열린) 장치 수", registry=self.registry)
+        self._device_metrics = {}
+
+    def start(self, port=METRICS_PORT, addr=METRICS_ADDR):
+        """/metrics 를 내보내기 시작합니다. 포트를 열지 못하면(다른 프로그램이 사용 중 등) 경고만 출력하고 False."""
+        try:
+            start_http_server(port, addr, registry=self.registry)
+        except OSError as e:
+            print(f"⚠️ 지표 포트 {addr}:{port} 를 열지 못해 지표 없이 계속합니다: {e}")
+            return False
+        print(f"📈 Prometheus 지표를 http://{addr}:{port}/metrics 에서 내보냅니다.")
+        return True
+
+    def device(self, device_key):
+        """장치의 DeviceMetrics (처음 보는 장치면 만듭니다)."""
+        metrics = self._device_metrics.get(device_key)
+        if metrics is None:
+            metrics = self._device_metrics[device_key] = DeviceMetrics(self, device_key)
+        return metrics
+
+    def forget_device(self, device_key):
+        """세션이 닫힌 장치의 레이블을 지웁니다. (장치가 바뀌며 시계열이 끝없이 늘지 않도록)"""
+        if self._device_metrics.pop(device_key, None) is None:
+            return
+        for metric in (self.packets, self.bytes, self.samples, self.lost_samples, self.feature_seconds, self.writer_backlog):
+            try:
+                metric.remove(device_key)
+            except KeyError:
+                pass
+
+    def parse_error(self, transport):
+        self.parse_errors.labels(transport).inc()
+
+    def track_queue(self, name, depth):
+        """큐 깊이를 수집할 때마다 depth() 로 읽습니다. (예: log_writer.backlog, feature_queue.qsize)"""
+        self.queue_depth.labels(name).set_function(depth)
+
+    def track_writer_backlog(self, device_key, depth):
+        self.writer_backlog.labels(device_key).set_function(depth)
+
+    def track_devices(self, count):
+        self.devices.set_function(count)
+
+    def track_udp_socket(self, sock):
+        self.registry.register(UdpSocketCollector(sock, sock.getsockname()[1]))
@@ -0,0 +1,334 @@
+# ingest_server.py
+# 여러 대의 보드가 보내는 UDP 패킷과 TCP 스트림을 asyncio로 받아 장치별 세션(버퍼, 로그 파일, 특징 상태)으로 나눠 처리합니다.
+# rt_z_acc_variance.py 의 단일 소켓 루프를 플릿(여러 대) 환경용으로 대체하는 헤드리스 서버입니다.
+
+import asyncio
+import datetime
+import os
+import re
+import socket
+import time
+
+import numpy as np
+
+from ingest_metrics import start_metrics
+from sensor_features import StreamingFeatures
+from log_writer import LogWriter, timestamp_ns
+from loss_tracker import LossTracker
+from wire_protocol import decode_packet, merge_packets, split_stream
+
+# ---------------------------
+# 설정
+# ---------------------------
+UDP_PORT = 65001
+# UDP 손실이 큰 현장에서 쓰는 TCP 수신 포트 (None 이면 TCP 수신을 끕니다)
+TCP_PORT = 65000
+HOST = '0.0.0.0'
+
+WINDOW_SIZE = 20
+STEP_SIZE = 10
+
+# 로그 파일을 저장할 폴더와 형식 ('session', 'parquet' 또는 'csv')
+# 'session' 은 고정 길이 레코드(.bin) + 시각 인덱스(.idx)로, 긴 기록에서도 시간 구간만 바로 꺼내 볼 수 있습니다.
+LOG_DIR = '.'
+LOG_FORMAT = 'session'
+
+# 커널 UDP 수신 버퍼 크기 (바이트). 수백 대 x 50Hz 버스트를 흡수할 수 있도록 크게 잡습니다.
+RECV_BUFFER_BYTES = 8 * 1024 * 1024
+
+# 이 시간(초) 동안 패킷이 없으면 세션을 닫고 로그 파일을 정리합니다.
+SESSION_IDLE_TIMEOUT = 30
+
+# 상태 출력 주기 (초)
+STATUS_INTERVAL = 10
+
+# Prometheus 지표(/metrics)를 내보낼 포트 (ingest_metrics.py). None 이면 내보내지 않습니다.
+METRICS_PORT = 9101
+
+
+# ---------------------------
+# 세션 키
+# ---------------------------
+def make_device_key(device_id, addr):
+    """장치 ID가 있으면 그대로, 없으면 송신 주소(IP_포트)로 세션 키를 만듭니다."""
+    key = str(device_id) if device_id not in (None, '') else f"{addr[0]}_{addr[1]}"
+    # 파일 이름에 쓸 수 없는 문자는 '-'로 바꿉니다.
+    return re.sub(r'[^0-9A-Za-z_\-]', '-', key)
+
+
+# ---------------------------
+# 장치별 세션
+# ---------------------------
+class DeviceSession:
+    """보드 한 대의 데이터 버퍼, 로그 파일, 특징 상태를 관리합니다."""
+
+    def __init__(self, device_key, log_writer, log_dir=LOG_DIR, log_format=LOG_FORMAT, metrics=None):
+        self.device_key = device_key
+        timestamp_start = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        # 파일 쓰기는 LogWriter 스레드가 모아서 처리합니다.
+        self.log_sink = log_writer.open_log(os.path.join(log_dir, f"sensor_log_{device_key}_{timestamp_start}"), log_format)
+        self.filename = self.log_sink.path
+
+        # 슬라이딩 윈도우 특징은 샘플마다 상수 시간에 갱신합니다.
+        self.features = StreamingFeatures(WINDOW_SIZE, STEP_SIZE)
+        self.frame_count = 0
+        self.last_seen = time.monotonic()
+        # 장치 seq / 수신 시각 기준 손실 집계 (기록 중 언제든 loss.summary() 로 조회 가능)
+        self.loss = LossTracker()
+
+        # 가장 최근에 계산된 특징 값
+        self.z_variance = None
+        self.mean_pitch = None
+        # 이 장치의 Prometheus 지표 (ingest_metrics.DeviceMetrics, 지표를 끄면 None)
+        self.metrics = metrics.device(device_key) if metrics is not None else None
+
+    def handle_packet(self, packet, nbytes=0):
+        """디코딩된 패킷(샘플 1개 이상)을 한 블록으로 로그와 특징 버퍼에 반영합니다. nbytes 는 지표용 수신 바이트 수입니다."""
+        self.last_seen = time.monotonic()
+        timestamp = timestamp_ns()
+        self.log_sink.write(packet.values, timestamp, packet.seq, packet.millis)
+        lost = self.loss.lost
+        self.loss.update(timestamp if packet.seq is not None else np.full(len(packet.values), timestamp),
+                         packet.seq, packet.millis)
+
+        self.frame_count += len(packet.values)
+        if self.metrics is None:
+            self.handle_block(packet.values)
+            return
+        started = time.perf_counter()
+        self.handle_block(packet.values)
+        self.metrics.feature_time(time.perf_counter() - started)
+        self.metrics.packet(nbytes, len(packet.values))
+        self.metrics.lost(self.loss.lost - lost)
+
+    def handle_block(self, values):
+        """
+        (샘플 수, 11) 블록을 특징 엔진에 넣습니다.
+        블록 안에서 특징 추출 시점(STEP_SIZE 마다)이 여러 번 오면 그때마다 특징이 계산되므로,
+        한 샘플씩 넣을 때와 결과가 같습니다.
+        """
+        features = self.features.push_block(values)
+        if features:
+            self.z_variance, self.mean_pitch = features[-1]
+
+    def close(self):
+        self.log_sink.close()
+
+
+# ---------------------------
+# asyncio UDP / TCP 서버
+# ---------------------------
+class IngestProtocol(asyncio.DatagramProtocol):
+    """수신한 데이터그램을 IngestServer로 넘겨주기만 합니다 (이벤트 루프를 막지 않도록 가볍게 유지)."""
+
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, addr):
+        self.server.handle_datagram(data, addr)
+
+    def error_received(self, exc):
+        print(f"UDP 수신 오류: {exc}")
+
+
+class StreamIngestProtocol(asyncio.Protocol):
+    """
+    TCP 연결 하나의 재조립 버퍼를 관리합니다.
+    TCP는 프레임 경계를 보존하지 않으므로, 받은 바이트를 이어 붙인 뒤 줄바꿈/바이너리 헤더 기준으로 프레임을 잘라냅니다.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.buffer = bytearray()
+        self.transport = None
+        self.addr = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.addr = transport.get_extra_info('peername')
+        self.server.connections.add(self)
+        print(f"🔗 TCP 연결: {self.addr}")
+
+    def data_received(self, data):
+        self.buffer += data
+        frames, consumed = split_stream(self.buffer)
+        del self.buffer[:consumed]
+        if frames:
+            self.server.handle_frames(frames, self.addr)
+
+    def connection_lost(self, exc):
+        self.server.connections.discard(self)
+        print(f"🔌 TCP 연결 종료: {self.addr}")
+
+
+class IngestServer:
+    """장치별 세션을 관리하고 패킷을 해당 세션으로 라우팅합니다."""
+
+    def __init__(self, log_dir=LOG_DIR, log_format=LOG_FORMAT, metrics=None):
+        self.log_dir = log_dir
+        self.log_format = log_format
+        self.sessions = {}
+        self.parse_errors = 0
+        self.log_writer = LogWriter()
+        self.log_writer.start()
+        self.transports = []
+        self.connections = set()
+        self._tasks = []
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.track_queue('log_writer', self.log_writer.backlog)
+            metrics.track_devices(lambda: len(self.sessions))
+
+    def get_session(self, device_key):
+        session = self.sessions.get(device_key)
+        if session is None:
+            session = DeviceSession(device_key, self.log_writer, self.log_dir, self.log_format, self.metrics)
+            self.sessions[device_key] = session
+            if self.metrics is not None:
+                self.metrics.track_writer_backlog(device_key, lambda: LogWriter.sink_backlog(session.log_sink))
+            print(f"🆕 새 장치 연결: {device_key} -> '{session.filename}'")
+        return session
+
+    def handle_datagram(self, data, addr):
+        try:
+            packet = decode_packet(data)
+        except (ValueError, UnicodeDecodeError):
+            self.parse_error('udp')
+            return
+        self.deliver(make_device_key(packet.device_id, addr), [packet], len(data), 'udp')
+
+    def deliver(self, device_key, packets, nbytes, transport):
+        """
+        디코딩된 패킷들을 한 블록으로 묶어 장치 세션에 넘깁니다.
+        헤더는 맞지만 내용이 잘못된 프레임 하나 때문에 수신 루프나 TCP 연결이 끊기지 않도록,
+        처리 중 오류는 파싱 오류로 세고 그 블록만 버립니다.
+        """
+        try:
+            self.get_session(device_key).handle_packet(merge_packets(packets), nbytes)
+        except Exception as e:
+            self.parse_error(transport)
+            print(f"⚠️ {device_key} 패킷 처리 오류 (버림): {e!r}")
+
+    def parse_error(self, transport):
+        self.parse_errors += 1
+        if self.metrics is not None:
+            self.metrics.parse_error(transport)
+
+    def handle_frames(self, frames, addr):
+        """
+        스트림에서 잘라낸 프레임 여러 개를 디코딩한 뒤, 같은 장치의 연속된 패킷은 한 블록으로 묶어 세션에 넘깁니다.
+        UDP 경로와 같은 로그/특징 파이프라인을 사용합니다.
+        """
+        group_key, group, group_bytes = None, [], 0
+        for frame in frames:
+            try:
+                packet = decode_packet(frame)
+            except (ValueError, UnicodeDecodeError):
+                self.parse_error('tcp')
+                continue
+            key = (make_device_key(packet.device_id, addr), packet.seq is None)
+            if key != group_key and group:
+                self.deliver(group_key[0], group, group_bytes, 'tcp')
+                group, group_bytes = [], 0
+            group_key = key
+            group.append(packet)
+            group_bytes += len(frame)
+        if group:
+            self.deliver(group_key[0], group, group_bytes, 'tcp')
+
+    def loss_report(self):
+        """현재 연결된 장치별 손실 집계. {장치 키: LossTracker.summary()}"""
+        return {device_key: session.loss.summary() for device_key, session in self.sessions.items()}
+
+    def _start_housekeeping(self):
+        if not self._tasks:
+            self._tasks.append(asyncio.create_task(self._housekeeping()))
+
+    async def start_udp(self, host=HOST, port=UDP_PORT):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER_BYTES)
+        sock.bind((host, port))
+        sock.setblocking(False)
+
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(lambda: IngestProtocol(self), sock=sock)
+        self.transports.append(transport)
+        if self.metrics is not None:
+            self.metrics.track_udp_socket(sock)
+        self._start_housekeeping()
+        print(f"✅ UDP 서버가 {port} 포트에서 수신 대기 중입니다...")
+
+    async def start_tcp(self, host=HOST, port=TCP_PORT):
+        loop = asyncio.get_running_loop()
+        tcp_server = await loop.create_server(lambda: StreamIngestProtocol(self), host, port)
+        self.transports.append(tcp_server)
+        self._start_housekeeping()
+        print(f"✅ TCP 서버가 {port} 포트에서 연결 대기 중입니다...")
+
+    async def _housekeeping(self):
+        """유휴 세션을 정리하고 주기적으로 수신 현황을 출력합니다."""
+        last_counts = {}
+        while True:
+            await asyncio.sleep(STATUS_INTERVAL)
+            now = time.monotonic()
+            for device_key, session in list(self.sessions.items()):
+                if now - session.last_seen > SESSION_IDLE_TIMEOUT:
+                    session.close()
+                    del self.sessions[device_key]
+                    last_counts.pop(device_key, None)
+                    if self.metrics is not None:
+                        self.metrics.forget_device(device_key)
+                    print(f"💤 {device_key} 장치가 {SESSION_IDLE_TIMEOUT}초 동안 응답이 없어 세션을 닫았습니다.")
+
+            total_rate = 0.0
+            received = lost = 0
+            for device_key, session in self.sessions.items():
+                total_rate += (session.frame_count - last_counts.get(device_key, 0)) / STATUS_INTERVAL
+                last_counts[device_key] = session.frame_count
+                received += session.loss.received
+                lost += session.loss.lost
+            loss_rate = lost / (received + lost) * 100 if received + lost else 0.0
+            print(f"📡 장치 {len(self.sessions)}대 (TCP 연결 {len(self.connections)}개), 전체 {total_rate:.1f} frames/s, "
+                  f"손실률 {loss_rate:.2f}%, 파싱 오류 누적 {self.parse_errors}건, 기록 대기 {self.log_writer.backlog()}블록")
+            if not self.log_writer.healthy():
+                print("   ❌ 로그 기록 스레드가 멈춰 더 이상 기록되지 않습니다.")
+            else:
+                for device_key, session in self.sessions.items():
+                    if not self.log_writer.healthy(session.log_sink):
+                        print(f"   ❌ {device_key}: 로그 기록 오류로 이 장치의 로그가 기록되지 않고 있습니다.")
+            for device_key, summary in self.loss_report().items():
+                if summary['gap_count']:
+                    print(f"   ⚠️ {device_key}: 손실 {summary['lost']}개 ({summary['loss_rate'] * 100:.2f}%), "
+                          f"누락 구간 {summary['gap_count']}개, 최대 {summary['max_gap_seconds']:.2f}초")
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        for transport in self.transports:
+            transport.close()
+        for connection in list(self.connections):
+            connection.transport.close()
+        for session in self.sessions.values():
+            session.close()
+        self.sessions.clear()
+        self.log_writer.stop()
+        print("소켓과 로그 파일이 닫혔습니다.")
+
+
+async def main():
+    metrics = start_metrics(METRICS_PORT)
+    server = IngestServer(LOG_DIR, LOG_FORMAT, metrics)
+    await server.start_udp(HOST, UDP_PORT)
+    if TCP_PORT is not None:
+        await server.start_tcp(HOST, TCP_PORT)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n🛑 서버를 종료합니다.")
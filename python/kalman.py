@@ -0,0 +1,205 @@
+# kalman.py
+# GPS 경로 보정용 등속(constant-velocity) 칼만 필터 / RTS 스무더 (NumPy + scipy.signal)
+# 기존 filterpy 코드(행마다 predict/update)와 같은 모델, 같은 초기값을 쓰며 결과도 수치적으로 같습니다.
+#
+# - 상태: [위치, 속도], 측정: 위치. lat, lon 처럼 여러 좌표열을 한 번에(열 방향으로 쌓아서) 처리합니다.
+# - R, Q 가 고정이면 공분산과 칼만 이득은 측정값과 무관하게 정상 상태(steady-state)로 수렴하므로,
+#   수렴할 때까지의 짧은 구간만 반복문으로 계산하고 나머지는 선형 시불변 필터로 보고 scipy.signal.lfilter 로 한 번에 처리합니다.
+# - 로그의 lat/lon 은 IMU 샘플마다 같은 fix 가 반복되므로, kalman_track_fixes 는 새 fix 만 필터링한 뒤 모든 행에 다시 붙입니다.
+
+import numpy as np
+from scipy.signal import lfilter, ss2tf
+
+from gps_fixes import join_positions, unique_fixes
+
+# ---------------------------
+# 모델 정의 (dt = 1 샘플)
+# ---------------------------
+F = np.array([[1., 1.], [0., 1.]])   # 상태 전이 행렬
+H = np.array([[1., 0.]])             # 측정 함수
+# filterpy.common.Q_discrete_white_noise(dim=2, dt=1., var=1.) 와 같은 프로세스 노이즈 모양
+Q_UNIT = np.array([[0.25, 0.5], [0.5, 1.]])
+
+# 칼만 이득이 이 상대 오차 안으로 들어오면 정상 상태로 보고 반복을 멈춥니다.
+STEADY_STATE_TOL = 1e-13
+
+
+def gain_schedule(n, r, q):
+    """
+    처음 n 스텝 동안의 칼만 이득 K, 갱신 후 공분산 P 를 계산합니다. (초기 P = 단위행렬, filterpy 기본값)
+    이득이 정상 상태에 수렴하면 거기서 멈추므로, 반환되는 배열의 길이 m 은 보통 n 보다 훨씬 짧습니다.
+    반환값: (K (m, 2), P (m, 2, 2), 정상 상태에 도달했는지 여부)
+    """
+    Q = Q_UNIT * q
+    P = np.eye(2)
+    gains, covariances = [], []
+    I = np.eye(2)
+    for _ in range(n):
+        P = F @ P @ F.T + Q
+        S = P[0, 0] + r
+        K = P[:, 0] / S
+        IKH = I - np.outer(K, H[0])
+        P = IKH @ P @ IKH.T + r * np.outer(K, K)   # Joseph 형태 (filterpy 와 같음)
+        if gains and np.all(np.abs(K - gains[-1]) <= STEADY_STATE_TOL * np.abs(K)):
+            gains.append(K)
+            covariances.append(P)
+            return np.array(gains), np.array(covariances), True
+        gains.append(K)
+        covariances.append(P)
+    return np.array(gains).reshape(-1, 2), np.array(covariances).reshape(-1, 2, 2), False
+
+
+def _lti_run(A, B, C, D, inputs, state):
+    """
+    선형 시불변 시스템 s[j+1] = A s[j] + B u[j], y[j] = C s[j] + D u[j] 을 lfilter 로 한 번에 계산합니다.
+    inputs: (L, 입력 수, 열 수), state: (상태 수, 열 수) -> 출력 (L, 출력 수, 열 수)
+    """
+    length = len(inputs)
+    outputs = np.zeros((length, C.shape[0], inputs.shape[2]))
+    den = None
+    for i in range(B.shape[1]):
+        num, den = ss2tf(A, B, C, D, input=i)
+        for o in range(C.shape[0]):
+            outputs[:, o, :] += lfilter(num[o], den, inputs[:, i, :], axis=0)
+
+    # 초기 상태에 의한 응답 C A^j s0 도 같은 분모(A 의 특성다항식)를 따르므로, 첫 두 값을 맞춘 임펄스 응답으로 구합니다.
+    impulse = np.zeros(length)
+    impulse[0] = 1.0
+    f0 = C @ state
+    f1 = C @ A @ state
+    for o in range(C.shape[0]):
+        for col in range(state.shape[1]):
+            b = [f0[o, col], f1[o, col] + den[1] * f0[o, col]]
+            outputs[:, o, col] += lfilter(b, den, impulse)
+    return outputs
+
+
+class KalmanStream:
+    """
+    등속 칼만 필터를 측정값 블록 단위로 이어서 적용합니다. (필터 상태와 이득 스케줄 위치를 블록 사이에 유지)
+    블록을 어떻게 나눠 넣어도 kalman_filter 로 한 번에 처리한 결과와 같습니다. (부동소수점 반올림 차이 제외)
+    """
+
+    def __init__(self, r, q):
+        self.r = r
+        self.q = q
+        self.steps = 0
+        self.origin = None
+        self.state = None
+        self.K = np.zeros((0, 2))
+        self.P = np.zeros((0, 2, 2))
+        self.steady = False
+
+    def update(self, z):
+        """측정값 블록 z ((n,) 또는 (n, 열 수))를 반영하고, 각 측정 시점의 상태 x (n, 2, 열 수)를 반환합니다."""
+        z = np.asarray(z, dtype=np.float64)
+        if z.ndim == 1:
+            z = z[:, None]
+        n = len(z)
+        if n == 0:
+            return np.zeros((0, 2, z.shape[1]))
+        if self.origin is None:
+            # 좌표 값이 커도(예: 위도 37.5) 정밀도를 잃지 않도록 첫 측정값 기준의 상대 좌표로 계산합니다.
+            self.origin = z[0].copy()
+            self.state = np.zeros((2, z.shape[1]))   # 초기 상태 [첫 측정값, 0] (상대 좌표로는 0)
+        dz = z - self.origin
+
+        end = self.steps + n
+        if not self.steady and len(self.K) < end:
+            self.K, self.P, self.steady = gain_schedule(end, self.r, self.q)
+
+        x = np.zeros((n, 2, z.shape[1]))
+        state = self.state
+        # 이득이 변하는 초기 구간
+        transient = min(max(len(self.K) - self.steps, 0), n)
+        for i in range(transient):
+            state = F @ state
+            state = state + np.outer(self.K[self.steps + i], dz[i] - state[0])
+            x[i] = state
+
+        # 정상 상태 구간: x[k] = (I - K H) F x[k-1] + K z[k]
+        if transient < n:
+            k_ss = self.K[-1]
+            A = (np.eye(2) - np.outer(k_ss, H[0])) @ F
+            B = k_ss.reshape(2, 1)
+            x[transient:] = _lti_run(A, B, A, B, dz[transient:, None, :], state)
+            state = x[-1].copy()
+
+        self.state = state
+        self.steps = end
+        x[:, 0, :] += self.origin
+        return x
+
+
+def kalman_filter(z, r, q):
+    """
+    측정값 z ((n,) 또는 (n, 열 수))에 등속 칼만 필터를 적용합니다.
+    반환값: (상태 x (n, 2, 열 수), 이득 스케줄 K, 공분산 스케줄 P)
+    """
+    stream = KalmanStream(r, q)
+    x = stream.update(z)
+    return x, stream.K, stream.P
+
+
+def rts_smooth(x, K, P, q):
+    """
+    kalman_filter 결과에 Rauch–Tung–Striebel 역방향 스무딩을 적용합니다. (filterpy 의 rts_smoother 와 같은 식)
+    정상 상태 구간은 스무더 이득도 일정하므로 lfilter 로, 초기 구간만 반복문으로 계산합니다.
+    """
+    n = len(x)
+    if n < 2:
+        return x.copy()
+    Q = Q_UNIT * q
+    m = len(P)
+
+    def smoother_gain(Pk):
+        Pp = F @ Pk @ F.T + Q
+        return Pk @ F.T @ np.linalg.inv(Pp)
+
+    xs = x.copy()
+    # 정상 상태 구간 (k = n-2 ... m-1 을 역순으로): xs[k] = (I - G F) x[k] + G xs[k+1]
+    start = max(m - 1, 0)
+    if n - 1 > start:
+        G = smoother_gain(P[-1])
+        IGF = np.eye(2) - G @ F
+        # 위치 원점을 빼서 정밀도를 유지합니다.
+        origin = x[-1, 0, :].copy()
+        rel = x.copy()
+        rel[:, 0, :] -= origin
+        inputs = rel[start:n - 1][::-1]
+        smoothed = _lti_run(G, IGF, G, IGF, inputs, rel[n - 1])
+        xs[start:n - 1] = smoothed[::-1]
+        xs[start:n - 1, 0, :] += origin
+
+    # 이득이 변하는 초기 구간
+    for k in range(min(start, n - 1) - 1, -1, -1):
+        G = smoother_gain(P[k])
+        xs[k] = x[k] + G @ (xs[k + 1] - F @ x[k])
+    return xs
+
+
+def kalman_track(z, r, q, smooth=False):
+    """
+    좌표열(예: lat, lon 을 열로 쌓은 (n, 2) 배열)을 칼만 필터(smooth=True 면 RTS 스무딩까지)로 보정해 같은 모양으로 반환합니다.
+    """
+    z = np.asarray(z, dtype=np.float64)
+    if len(z) == 0:
+        return z.copy()
+    x, K, P = kalman_filter(z, r, q)
+    if smooth:
+        x = rts_smooth(x, K, P, q)
+    return x[:, 0, :].reshape(z.shape)
+
+
+def kalman_track_fixes(z, r, q, smooth=False, join='asof'):
+    """
+    lat/lon 이 IMU 행마다 반복 기록된 (n, 2) 좌표열에서 새 fix 만 골라 필터링하고, 결과를 다시 모든 행에 붙입니다.
+    (필터의 한 스텝 = GPS fix 하나) join 은 'asof'(다음 fix 전까지 같은 값) 또는 'interp'(fix 사이를 선형 보간).
+    반환값: (행마다의 보정 좌표 (n, 2), fix 수)
+    """
+    z = np.asarray(z, dtype=np.float64)
+    if len(z) == 0:
+        return z.copy(), 0
+    fixes = unique_fixes(z[:, 0], z[:, 1])
+    filtered = kalman_track(z[fixes], r, q, smooth)
+    return join_positions(np.arange(len(z)), fixes, filtered, join), len(fixes)
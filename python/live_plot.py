@@ -0,0 +1,115 @@
+# live_plot.py
+# 수신 루프와 분리된, 고정 프레임레이트 블리팅(blitting) 특징 그래프
+# 수신 스레드는 특징 값을 큐에 넣기만 하고, 메인 스레드가 정해진 주기로 큐를 비우며 그래프를 갱신합니다.
+
+import queue
+import time
+from collections import deque
+
+import matplotlib.pyplot as plt
+
+
+def put_latest(feature_queue, item):
+    """크기가 제한된 큐에 값을 넣습니다. 큐가 가득 차 있으면 가장 오래된 값을 버리고 넣습니다 (수신 스레드는 절대 막히지 않음)."""
+    while True:
+        try:
+            feature_queue.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                feature_queue.get_nowait()
+            except queue.Empty:
+                pass
+
+
+class FeaturePlot:
+    """Z축 분산과 평균 pitch를 블리팅으로 그리는 2단 그래프."""
+
+    def __init__(self, title, graph_width=100):
+        self.graph_width = graph_width
+        # ★ 그래프 시각화용 버퍼 (maxlen을 설정하여 오래된 데이터 자동 삭제)
+        self.z_variances = deque(maxlen=graph_width)
+        self.mean_pitches = deque(maxlen=graph_width)
+
+        self.fig, (self.ax1, self.ax2) = plt.subplots(2, 1, figsize=(12, 8))
+
+        # animated=True: 전체 다시 그리기에서는 제외하고, 블리팅으로만 그립니다.
+        self.line1, = self.ax1.plot([], [], 'o-', markersize=4, label='Z-axis Variance', animated=True)
+        self.ax1.set_title(title)
+        self.ax1.set_ylabel("Z-axis Variance")
+        self.ax1.grid(True)
+        self.ax1.legend(loc='upper right')
+        # ★ X축을 고정합니다 (0 ~ GRAPH_WIDTH)
+        self.ax1.set_xlim(0, graph_width - 1)
+        self.ax1.set_ylim(0, 0.1)
+
+        self.line2, = self.ax2.plot([], [], 'o-', color='red', markersize=4, label='Mean Pitch (Absolute)', animated=True)
+        self.ax2.set_xlabel("Time Step (Recent data)")
+        self.ax2.set_ylabel("Mean Pitch (Radians)")
+        self.ax2.grid(True)
+        self.ax2.legend(loc='upper right')
+        self.ax2.set_xlim(0, graph_width - 1)
+        self.ax2.set_ylim(0, 0.5)
+
+        self.fig.tight_layout()
+
+        # 축, 격자 등 변하지 않는 배경. 창 크기가 바뀌어 전체 다시 그리기가 일어날 때마다 새로 저장합니다.
+        self.background = None
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        self.ax1.draw_artist(self.line1)
+        self.ax2.draw_artist(self.line2)
+
+    def show(self):
+        plt.show(block=False)
+        # 첫 전체 그리기 -> draw_event에서 배경 저장
+        self.fig.canvas.draw()
+
+    def is_open(self):
+        return plt.fignum_exists(self.fig.number)
+
+    def drain(self, feature_queue):
+        """큐에 쌓인 특징 값을 모두 꺼내 그래프 버퍼에 옮기고, 꺼낸 개수를 반환합니다."""
+        count = 0
+        while True:
+            try:
+                z_var, pitch = feature_queue.get_nowait()
+            except queue.Empty:
+                return count
+            self.z_variances.append(z_var)
+            self.mean_pitches.append(pitch)
+            count += 1
+
+    def render(self):
+        # x축 데이터는 항상 0, 1, ..., len-1 형태로 생성하여 '흐르는' 효과를 줌
+        self.line1.set_data(range(len(self.z_variances)), self.z_variances)
+        self.line2.set_data(range(len(self.mean_pitches)), self.mean_pitches)
+
+        canvas = self.fig.canvas
+        if self.background is None:
+            canvas.draw()
+            return
+        canvas.restore_region(self.background)
+        self._draw_lines()
+        canvas.blit(self.fig.bbox)
+
+
+def run_render_loop(plot, feature_queue, fps, is_running):
+    """
+    fps 주기로 큐를 비우고 그래프를 갱신합니다.
+    is_running()이 False를 반환하거나 그래프 창이 닫히면 반환합니다.
+    """
+    frame_interval = 1.0 / fps
+    plot.show()
+    while is_running() and plot.is_open():
+        frame_start = time.monotonic()
+        if plot.drain(feature_queue):
+            plot.render()
+        # 남은 시간 동안 GUI 이벤트(창 이동, 닫기 등)만 처리합니다.
+        remaining = frame_interval - (time.monotonic() - frame_start)
+        plot.fig.canvas.start_event_loop(max(remaining, 0.001))
@@ -0,0 +1,451 @@
+# log_writer.py
+# 수신 루프와 디스크 I/O 를 분리하는 백그라운드 로그 기록기
+# 수신 쪽은 (샘플 수, 값 개수) 블록을 큐에 넣기만 하고, 전용 스레드가 문자열 변환과 파일 쓰기를 큰 덩어리로 처리합니다.
+# flush 와 fsync 는 정해진 주기 또는 쌓인 바이트 수를 기준으로만 실행합니다.
+# 로그 형식은 CSV(기존 도구 호환), Parquet(열 단위, 긴 기록용), 세션 파일(고정 길이 레코드, 시간 구간 조회용) 중에서 고를 수 있습니다.
+# GPS 는 약 1초에 한 번만 바뀌므로, 기본적으로 IMU 스트림(매 샘플)과 GPS fix 스트림(값이 바뀔 때만)을 별도 파일로 나눠 기록합니다.
+
+import datetime
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import session_store
+from gps_fixes import fix_change_mask
+from sensor_features import FRAME_COLUMNS, GPS_COLUMNS
+
+# ---------------------------
+# 설정
+# ---------------------------
+# 버퍼를 파일로 내보내는 주기 (초)
+FLUSH_INTERVAL = 1.0
+# 주기와 상관없이, 한 파일에 이만큼(바이트) 쌓이면 바로 내보냅니다.
+FLUSH_BYTES = 1024 * 1024
+# 디스크에 실제로 기록(fsync)하는 주기 (초). None 이면 fsync 하지 않습니다.
+FSYNC_INTERVAL = 5.0
+
+# 기본 로그 형식: 'parquet', 'csv' 또는 'session'
+LOG_FORMAT = 'parquet'
+# Parquet 로그는 이 주기(초)마다 하나의 row group 으로 끊어 기록합니다.
+ROW_GROUP_INTERVAL = 10.0
+
+# True 면 lat/lon 을 IMU 로그에서 빼고, 새 GPS fix 만 '<로그 이름>_gps.<확장자>' 파일에 따로 기록합니다.
+SPLIT_GPS = True
+GPS_LOG_SUFFIX = '_gps'
+
+# 로그 컬럼: 센서 값 11개 + 수신 시각(정수 ns) + 장치 일련번호/시각 (바이너리 프레임일 때만 값이 있음)
+LOG_COLUMNS = FRAME_COLUMNS + ['timestamp_ns', 'seq', 'device_ms']
+
+# time.time_ns() 는 시계 보정으로 뒤로 갈 수 있으므로, 시작 시점에 한 번만 벽시계와 맞춘 뒤 monotonic 시계로 증가시킵니다.
+_CLOCK_ANCHOR_NS = time.time_ns() - time.monotonic_ns()
+
+_STOP = object()
+
+
+def timestamp_ns():
+    """수신 시각을 int64 나노초(에포크 기준, 단조 증가)로 반환합니다. 문자열 변환은 내보낼 때만 합니다."""
+    return _CLOCK_ANCHOR_NS + time.monotonic_ns()
+
+
+def ns_to_datetime(timestamp_ns_series):
+    """timestamp_ns 컬럼을 (기존 로그의 isoformat 과 같은) 로컬 시각 datetime 으로 변환합니다."""
+    local_tz = datetime.datetime.now().astimezone().tzinfo
+    return (pd.to_datetime(timestamp_ns_series, unit='ns', utc=True)
+            .dt.tz_convert(local_tz).dt.tz_localize(None))
+
+
+# ---------------------------
+# 파일 형식별 싱크
+# ---------------------------
+class CsvLogSink:
+    """
+    CSV 로그 파일 하나. write() 는 큐에 넣기만 하므로 어느 스레드에서 불러도 되고,
+    나머지(_로 시작하는) 메서드는 LogWriter 스레드에서만 호출됩니다.
+    """
+
+    def __init__(self, log_writer, path, value_columns=FRAME_COLUMNS):
+        self.log_writer = log_writer
+        self.path = path
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.file.write(','.join(list(value_columns) + LOG_COLUMNS[len(FRAME_COLUMNS):]) + '\n')
+        self._row_format = ','.join(['%.10g'] * len(value_columns)) + ',%d,%s,%s\n'
+        self._pending = []
+        self.pending_bytes = 0
+        # 기록 대기 블록 수 = 넣은 블록 - 기록 스레드가 꺼낸 블록 (각각 한 스레드에서만 증가시키므로 잠금 없이 셉니다)
+        self.blocks_submitted = 0
+        self.blocks_written = 0
+        # 기록 중 오류가 나면 그 예외 (이후 이 싱크로 오는 블록은 버립니다)
+        self.error = None
+
+    def write(self, values, timestamp, seq=None, device_ms=None):
+        """
+        (샘플 수, 값 개수) 블록을 기록 대기열에 넣습니다.
+        timestamp 는 블록 전체의 수신 시각(ns), seq/device_ms 는 샘플마다의 배열 또는 None 입니다.
+        """
+        self.log_writer.submit(self, (values, timestamp, seq, device_ms))
+
+    def close(self):
+        self.log_writer.submit(self, _STOP)
+
+    def _append(self, item):
+        values, timestamp, seq, device_ms = item
+        rows = values.tolist() if hasattr(values, 'tolist') else values
+        n = len(rows)
+        seq = seq.tolist() if seq is not None else [''] * n
+        device_ms = device_ms.tolist() if device_ms is not None else [''] * n
+        row_format = self._row_format
+        text = ''.join(row_format % (*row, timestamp, s, m) for row, s, m in zip(rows, seq, device_ms))
+        self._pending.append(text)
+        self.pending_bytes += len(text)
+
+    def _flush(self):
+        if self._pending:
+            self.file.write(''.join(self._pending))
+            self._pending.clear()
+            self.pending_bytes = 0
+        self.file.flush()
+
+    def _fsync(self):
+        os.fsync(self.file.fileno())
+
+    def _close(self):
+        self._flush()
+        self.file.close()
+
+
+class ParquetLogSink:
+    """
+    Parquet 로그 파일 하나. ROW_GROUP_INTERVAL 초마다 모인 블록을 row group 하나로 기록합니다.
+    lat/lon 은 float64, IMU 값은 float32, 시각은 int64 나노초로 저장합니다.
+    (Parquet 은 파일을 닫을 때 footer 가 기록되므로, 비정상 종료 시에는 마지막 파일을 읽지 못할 수 있습니다.)
+    """
+
+    def __init__(self, log_writer, path, value_columns=FRAME_COLUMNS, row_group_interval=ROW_GROUP_INTERVAL):
+        self.log_writer = log_writer
+        self.path = path
+        self.value_columns = list(value_columns)
+        self.row_group_interval = row_group_interval
+        fields = [pa.field(col, pa.float64() if col in GPS_COLUMNS else pa.float32()) for col in self.value_columns]
+        fields += [pa.field('timestamp_ns', pa.int64()), pa.field('seq', pa.int64()), pa.field('device_ms', pa.int64())]
+        self.schema = pa.schema(fields)
+        self.file = open(path, 'wb')
+        self.parquet_writer = pq.ParquetWriter(self.file, self.schema)
+        self._blocks = []
+        self._last_row_group = time.monotonic()
+        self.pending_bytes = 0
+        # 기록 대기 블록 수 = 넣은 블록 - 기록 스레드가 꺼낸 블록 (각각 한 스레드에서만 증가시키므로 잠금 없이 셉니다)
+        self.blocks_submitted = 0
+        self.blocks_written = 0
+        # 기록 중 오류가 나면 그 예외 (이후 이 싱크로 오는 블록은 버립니다)
+        self.error = None
+
+    def write(self, values, timestamp, seq=None, device_ms=None):
+        self.log_writer.submit(self, (values, timestamp, seq, device_ms))
+
+    def close(self):
+        self.log_writer.submit(self, _STOP)
+
+    def _append(self, item):
+        values, timestamp, seq, device_ms = item
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        self._blocks.append((values,
+                             np.full(n, timestamp, dtype=np.int64),
+                             pa.array(seq, type=pa.int64()) if seq is not None else pa.nulls(n, type=pa.int64()),
+                             pa.array(device_ms, type=pa.int64()) if device_ms is not None else pa.nulls(n, type=pa.int64())))
+        self.pending_bytes += values.nbytes
+
+    def _write_row_group(self):
+        if not self._blocks:
+            return
+        values = np.concatenate([block[0] for block in self._blocks])
+        columns = [pa.array(values[:, i], type=self.schema.field(i).type) for i in range(len(self.value_columns))]
+        columns.append(pa.array(np.concatenate([block[1] for block in self._blocks])))
+        columns.append(pa.concat_arrays([block[2] for block in self._blocks]))
+        columns.append(pa.concat_arrays([block[3] for block in self._blocks]))
+        self.parquet_writer.write_table(pa.Table.from_arrays(columns, schema=self.schema))
+        self._blocks.clear()
+        self.pending_bytes = 0
+        self._last_row_group = time.monotonic()
+
+    def _flush(self):
+        # 짧은 주기로 호출되더라도 row group 은 ROW_GROUP_INTERVAL 마다(또는 FLUSH_BYTES 초과 시)만 끊습니다.
+        if (time.monotonic() - self._last_row_group >= self.row_group_interval
+                or self.pending_bytes >= self.log_writer.flush_bytes):
+            self._write_row_group()
+            self.file.flush()
+
+    def _fsync(self):
+        os.fsync(self.file.fileno())
+
+    def _close(self):
+        self._write_row_group()
+        self.parquet_writer.close()
+        self.file.close()
+
+
+class SessionLogSink:
+    """
+    세션 파일(.bin) 하나. 샘플마다 session_store.record_dtype(value_columns) 레코드 하나를 이어 붙이고,
+    수신 시각이 INDEX_INTERVAL_NS 이상 지날 때마다 사이드카 인덱스(.idx)에 (시각, 레코드 번호)를 추가합니다.
+    """
+
+    def __init__(self, log_writer, path, value_columns=FRAME_COLUMNS):
+        self.log_writer = log_writer
+        self.path = path
+        self.value_columns = list(value_columns)
+        self.file = open(path, 'wb')
+        self.file.write(session_store.make_header(self.value_columns).tobytes())
+        self.index_file = open(session_store.index_path(path), 'wb')
+        self._pending = []
+        self._pending_index = []
+        self._record_count = 0
+        self._last_indexed_ns = None
+        self.pending_bytes = 0
+        # 기록 대기 블록 수 = 넣은 블록 - 기록 스레드가 꺼낸 블록 (각각 한 스레드에서만 증가시키므로 잠금 없이 셉니다)
+        self.blocks_submitted = 0
+        self.blocks_written = 0
+        # 기록 중 오류가 나면 그 예외 (이후 이 싱크로 오는 블록은 버립니다)
+        self.error = None
+
+    def write(self, values, timestamp, seq=None, device_ms=None):
+        self.log_writer.submit(self, (values, timestamp, seq, device_ms))
+
+    def close(self):
+        self.log_writer.submit(self, _STOP)
+
+    def _append(self, item):
+        values, timestamp, seq, device_ms = item
+        records = session_store.make_records(values, timestamp, seq, device_ms, self.value_columns)
+        if self._last_indexed_ns is None or timestamp - self._last_indexed_ns >= session_store.INDEX_INTERVAL_NS:
+            self._pending_index.append((timestamp, self._record_count))
+            self._last_indexed_ns = timestamp
+        self._pending.append(records.tobytes())
+        self._record_count += len(records)
+        self.pending_bytes += records.nbytes
+
+    def _flush(self):
+        if self._pending:
+            self.file.write(b''.join(self._pending))
+            self._pending.clear()
+            self.pending_bytes = 0
+        # 인덱스는 레코드가 파일에 쓰인 뒤에만 기록해서, 인덱스가 가리키는 레코드가 항상 존재하도록 합니다.
+        self.file.flush()
+        if self._pending_index:
+            self.index_file.write(np.array(self._pending_index, dtype=session_store.INDEX_DTYPE).tobytes())
+            self._pending_index.clear()
+        self.index_file.flush()
+
+    def _fsync(self):
+        os.fsync(self.file.fileno())
+        os.fsync(self.index_file.fileno())
+
+    def _close(self):
+        self._flush()
+        self.file.close()
+        self.index_file.close()
+
+
+class GpsSplitLogSink:
+    """
+    프레임 블록을 IMU 스트림과 GPS fix 스트림 두 싱크로 나눠 기록합니다.
+    IMU 싱크에는 lat/lon 을 뺀 값을 매 샘플 기록하고, GPS 싱크에는 직전 샘플과 좌표가 다른 행만 기록합니다.
+    (두 파일의 수신 시각/seq 가 같으므로, 분석할 때 as-of 결합으로 다시 붙일 수 있습니다)
+    write() 는 한 스레드(수신 루프)에서만 호출해야 합니다.
+    """
+
+    def __init__(self, imu_sink, gps_sink, value_columns=FRAME_COLUMNS):
+        self.imu_sink = imu_sink
+        self.gps_sink = gps_sink
+        self.path = imu_sink.path
+        self.gps_path = gps_sink.path
+        value_columns = list(value_columns)
+        self._gps_index = [value_columns.index(col) for col in GPS_COLUMNS]
+        self._imu_index = [i for i, col in enumerate(value_columns) if col not in GPS_COLUMNS]
+        self._last_fix = None
+
+    def write(self, values, timestamp, seq=None, device_ms=None):
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        if values.size == 0:
+            return
+        self.imu_sink.write(values[:, self._imu_index], timestamp, seq, device_ms)
+
+        fixes = values[:, self._gps_index]
+        new_fix = fix_change_mask(fixes[:, 0], fixes[:, 1], self._last_fix)
+        self._last_fix = fixes[-1]
+        if new_fix.any():
+            self.gps_sink.write(fixes[new_fix], timestamp,
+                                np.asarray(seq)[new_fix] if seq is not None else None,
+                                np.asarray(device_ms)[new_fix] if device_ms is not None else None)
+
+    def close(self):
+        self.imu_sink.close()
+        self.gps_sink.close()
+
+
+# ---------------------------
+# 백그라운드 기록 스레드
+# ---------------------------
+class LogWriter(threading.Thread):
+    """여러 로그 싱크를 하나의 스레드에서 모아서 기록합니다. (장치 수백 대여도 스레드는 하나)"""
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, flush_bytes=FLUSH_BYTES, fsync_interval=FSYNC_INTERVAL):
+        super().__init__(name='LogWriter', daemon=True)
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.fsync_interval = fsync_interval
+        self._queue = queue.SimpleQueue()
+        self._sinks = set()
+        # 기록 스레드가 예상치 못한 오류로 멈췄으면 그 예외
+        self.error = None
+
+    def open_csv(self, path, value_columns=FRAME_COLUMNS):
+        sink = CsvLogSink(self, path, value_columns)
+        self._queue.put((sink, None))
+        return sink
+
+    def open_parquet(self, path, value_columns=FRAME_COLUMNS):
+        sink = ParquetLogSink(self, path, value_columns)
+        self._queue.put((sink, None))
+        return sink
+
+    def open_session(self, path, value_columns=FRAME_COLUMNS):
+        sink = SessionLogSink(self, path, value_columns)
+        self._queue.put((sink, None))
+        return sink
+
+    def open_log(self, path_stem, log_format=LOG_FORMAT, value_columns=FRAME_COLUMNS, split_gps=SPLIT_GPS):
+        """
+        확장자 없는 경로를 받아 log_format 에 맞는 싱크를 엽니다. (path_stem + '.csv' / '.parquet' / '.bin')
+        split_gps 이면 IMU 로그(path_stem + 확장자)와 GPS fix 로그(path_stem + GPS_LOG_SUFFIX + 확장자)를 함께 엽니다.
+        """
+        if split_gps and all(col in value_columns for col in GPS_COLUMNS):
+            imu_columns = [col for col in value_columns if col not in GPS_COLUMNS]
+            return GpsSplitLogSink(self._open_format(path_stem, log_format, imu_columns),
+                                   self._open_format(path_stem + GPS_LOG_SUFFIX, log_format, GPS_COLUMNS),
+                                   value_columns)
+        return self._open_format(path_stem, log_format, value_columns)
+
+    def _open_format(self, path_stem, log_format, value_columns):
+        if log_format == 'session':
+            return self.open_session(path_stem + '.bin', value_columns)
+        if log_format == 'parquet':
+            return self.open_parquet(path_stem + '.parquet', value_columns)
+        if log_format == 'csv':
+            return self.open_csv(path_stem + '.csv', value_columns)
+        raise ValueError(f"알 수 없는 로그 형식입니다: {log_format}")
+
+    def submit(self, sink, item):
+        # 기록 스레드가 멈췄거나 이 싱크가 오류로 닫혔으면, 큐에 쌓아 봐야 기록되지 않으므로 버립니다.
+        if self.error is not None or sink.error is not None:
+            return
+        if item is not _STOP:
+            sink.blocks_submitted += 1
+        self._queue.put((sink, item))
+
+    def healthy(self, sink=None):
+        """기록 스레드가 살아 있고, (sink 를 주면) 그 싱크도 오류 없이 기록 중이면 True."""
+        if self.error is not None or (self.ident is not None and not self.is_alive()):
+            return False
+        if sink is None:
+            return True
+        if isinstance(sink, GpsSplitLogSink):
+            return sink.imu_sink.error is None and sink.gps_sink.error is None
+        return sink.error is None
+
+    def backlog(self):
+        """아직 기록 스레드가 꺼내지 않은 블록 수."""
+        return self._queue.qsize()
+
+    @staticmethod
+    def sink_backlog(sink):
+        """싱크 하나(GPS 분리 싱크면 두 파일 합)의 아직 기록 스레드가 꺼내지 않은 블록 수. (장치별 기록 지연 확인용)"""
+        if isinstance(sink, GpsSplitLogSink):
+            return LogWriter.sink_backlog(sink.imu_sink) + LogWriter.sink_backlog(sink.gps_sink)
+        return sink.blocks_submitted - sink.blocks_written
+
+    def stop(self):
+        """남은 데이터를 모두 기록하고 파일을 닫을 때까지 기다립니다."""
+        self._queue.put(_STOP)
+        self.join()
+
+    def run(self):
+        try:
+            self._run()
+        except Exception as e:
+            self.error = e
+            print(f"❌ 로그 기록 스레드가 멈췄습니다: {e!r}")
+            for sink in self._sinks:
+                self._close_failed(sink)
+            raise
+
+    def _guard(self, sink, method, *args):
+        """싱크 메서드를 부르고, 실패하면 그 싱크만 오류로 닫습니다. (다른 싱크와 기록 스레드는 계속 기록)"""
+        try:
+            method(*args)
+        except Exception as e:
+            sink.error = e
+            print(f"❌ '{sink.path}' 기록 중 오류가 나서 이 파일 기록을 멈춥니다: {e!r}")
+            self._sinks.discard(sink)
+            if method == sink._close:
+                sink.file.close()
+            else:
+                self._close_failed(sink)
+
+    @staticmethod
+    def _close_failed(sink):
+        # 이미 실패한 싱크라 닫다가 다시 실패할 수 있습니다. 파일 핸들만이라도 정리합니다.
+        try:
+            sink._close()
+        except Exception:
+            sink.file.close()
+
+    def _run(self):
+        now = time.monotonic()
+        next_flush = now + self.flush_interval
+        next_fsync = now + self.fsync_interval if self.fsync_interval else None
+
+        while True:
+            try:
+                entry = self._queue.get(timeout=max(next_flush - time.monotonic(), 0))
+            except queue.Empty:
+                entry = None
+
+            if entry is _STOP:
+                break
+            if entry is not None:
+                sink, item = entry
+                if item is None:
+                    self._sinks.add(sink)
+                elif sink.error is not None:
+                    # 오류로 닫힌 싱크에 이미 큐에 들어와 있던 블록은 버립니다.
+                    if item is not _STOP:
+                        sink.blocks_written += 1
+                elif item is _STOP:
+                    self._sinks.discard(sink)
+                    self._guard(sink, sink._close)
+                else:
+                    self._guard(sink, sink._append, item)
+                    sink.blocks_written += 1
+                    if sink.error is None and sink.pending_bytes >= self.flush_bytes:
+                        self._guard(sink, sink._flush)
+
+            now = time.monotonic()
+            if now >= next_flush:
+                for sink in list(self._sinks):
+                    self._guard(sink, sink._flush)
+                next_flush = now + self.flush_interval
+                if next_fsync is not None and now >= next_fsync:
+                    for sink in list(self._sinks):
+                        self._guard(sink, sink._fsync)
+                    next_fsync = now + self.fsync_interval
+
+        for sink in list(self._sinks):
+            self._guard(sink, sink._close)
+        self._sinks.clear()
@@ -0,0 +1,200 @@
+# loss_tracker.py
+# 장치 하나의 패킷 손실을 스트리밍으로 집계하는 엔진
+# 수신 서버(ingest_server.py)는 기록 중에 실시간으로, where_is_my_data.py 는 로그 파일을 조각씩 읽으며 같은 엔진을 씁니다.
+# 메모리 사용량은 기록 길이와 상관없이 일정합니다. (카운터 + 히스토그램 + 상위 K개 누락 구간)
+#
+# - 바이너리 프레임(seq 있음): 장치 일련번호가 건너뛴 만큼을 손실로 세고, 누락 시간은 장치 시각(device_ms) 차이로 계산
+# - 텍스트 프레임(seq 없음): 수신 시각 간격을 EXPECTED_HZ 기준으로 비교해 손실을 추정 (기존 where_is_my_data 방식)
+
+import heapq
+
+import numpy as np
+
+# ---------------------------
+# 설정
+# ---------------------------
+# 아두이노에서 설정한 데이터 전송 주파수 (Hz). seq 가 없는 텍스트 프레임의 손실을 추정할 때만 씁니다.
+EXPECTED_HZ = 50.0
+
+# 예상 간격의 이 배수를 넘는 수신 간격을 '누락'으로 간주합니다. (텍스트 프레임)
+GAP_FACTOR = 2
+
+# 누락 구간 길이(초) 히스토그램의 구간 경계. 마지막 칸은 그 이상 전부.
+GAP_HISTOGRAM_EDGES = np.array([0.0, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0])
+
+# 가장 긴 누락 구간을 몇 개까지 기억할지
+TOP_K_GAPS = 5
+
+# seq 가 이 값보다 더 많이 되돌아가면 순서 뒤바뀜이 아니라 장치 재시작으로 봅니다.
+REORDER_WINDOW = 256
+
+
+class LossTracker:
+    """
+    장치 하나의 수신/손실 카운터. update() 에 샘플 블록을 순서대로 넘기면 누적 집계가 갱신됩니다.
+    summary() / top_gaps() 는 기록 중 언제든 호출할 수 있습니다.
+    """
+
+    def __init__(self, expected_hz=EXPECTED_HZ, top_k=TOP_K_GAPS):
+        self.period_ns = 1e9 / expected_hz
+        self.top_k = top_k
+
+        self.received = 0
+        self.lost = 0
+        self.gap_count = 0
+        self.gap_seconds = 0.0
+        self.max_gap_seconds = 0.0
+        self.gap_histogram = np.zeros(len(GAP_HISTOGRAM_EDGES), dtype=np.int64)
+        # 순서가 뒤바뀌었거나 중복된 프레임, 장치 재시작(seq 가 처음부터 다시 시작) 횟수
+        self.out_of_order = 0
+        self.resets = 0
+
+        self.first_ns = None
+        self.last_ns = None
+        self._last_seq = None
+        self._last_device_ms = None
+        # 마지막 수신 시각과, 그 시각에 함께 받은 샘플 수 (배치 프레임은 한 블록이 같은 수신 시각을 가짐)
+        self._last_group_ns = None
+        self._last_group_size = 0
+
+        # (누락 시간(초), 누락 직전 샘플의 수신 시각(ns), 누락 샘플 수) 의 최소 힙
+        self._top_gaps = []
+
+    # ---------------------------
+    # 갱신
+    # ---------------------------
+    def update(self, timestamp_ns, seq=None, device_ms=None):
+        """
+        샘플 블록 하나를 반영합니다.
+        timestamp_ns 는 수신 시각(정수 하나 또는 샘플마다의 배열), seq/device_ms 는 샘플마다의 배열 또는 None 입니다.
+        """
+        if seq is not None:
+            n = len(seq)
+        else:
+            n = np.size(timestamp_ns)
+        if n == 0:
+            return
+        timestamps = np.broadcast_to(np.asarray(timestamp_ns, dtype=np.int64), (n,))
+
+        if seq is not None:
+            self._update_seq(np.asarray(seq, dtype=np.int64), device_ms, timestamps)
+            self._last_group_ns = None
+        else:
+            self._update_time(timestamps)
+            self._last_seq = None
+            self._last_device_ms = None
+
+        self.received += n
+        if self.first_ns is None:
+            self.first_ns = int(timestamps[0])
+        self.last_ns = int(timestamps[-1])
+
+    def _update_seq(self, seq, device_ms, timestamps):
+        if device_ms is not None:
+            device_ms = np.asarray(device_ms, dtype=np.int64)
+
+        # 지금까지 받은 가장 큰 seq 를 기준으로 비교합니다. (늦게 도착한 프레임이 기준을 끌어내리지 않도록)
+        base = self._last_seq if self._last_seq is not None else seq[0] - 1
+        running = np.maximum.accumulate(np.concatenate(([base], seq)))
+        step = seq - running[:-1]
+
+        # seq 가 크게 되돌아가면 장치가 재시작한 것으로 보고, 그 지점부터 새로 셉니다.
+        resets = np.flatnonzero(step < -REORDER_WINDOW)
+        if len(resets):
+            i = resets[0]
+            if i > 0:
+                self._update_seq(seq[:i], None if device_ms is None else device_ms[:i], timestamps[:i])
+                self.last_ns = int(timestamps[i - 1])
+            self.resets += 1
+            self._last_seq = None
+            self._last_device_ms = None
+            self._update_seq(seq[i:], None if device_ms is None else device_ms[i:], timestamps[i:])
+            return
+
+        # 늦게 도착한 프레임은 이미 손실로 세어졌으므로 손실 수에서 빼지 않고 순서 뒤바뀜으로만 셉니다.
+        self.out_of_order += int((step <= 0).sum())
+        gaps = np.flatnonzero(step > 1)
+        if len(gaps):
+            missing = step[gaps] - 1
+            if device_ms is not None:
+                base_ms = self._last_device_ms if self._last_device_ms is not None else device_ms[0]
+                prev_ms = np.maximum.accumulate(np.concatenate(([base_ms], device_ms)))[:-1]
+                durations = (device_ms[gaps] - prev_ms[gaps]) / 1000.0
+            else:
+                durations = step[gaps] * self.period_ns / 1e9
+            prev_ns = np.concatenate(([self.last_ns if self.last_ns is not None else timestamps[0]], timestamps[:-1]))
+            self._add_gaps(durations, prev_ns[gaps], missing)
+
+        self._last_seq = int(running[-1])
+        if device_ms is not None:
+            self._last_device_ms = max(int(device_ms.max()), self._last_device_ms or 0)
+
+    def _update_time(self, timestamps):
+        # 같은 수신 시각을 가진 샘플끼리 묶습니다.
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(timestamps)) + 1))
+        group_ns = timestamps[starts]
+        group_size = np.diff(np.append(starts, len(timestamps)))
+
+        if self._last_group_ns is not None:
+            if group_ns[0] == self._last_group_ns:
+                group_size[0] += self._last_group_size
+            else:
+                group_ns = np.concatenate(([self._last_group_ns], group_ns))
+                group_size = np.concatenate(([self._last_group_size], group_size))
+
+        dt = np.diff(group_ns)
+        # 직전 묶음의 샘플 수만큼은 예상된 간격이므로, 그보다 (GAP_FACTOR - 1) 주기 이상 늦으면 누락으로 봅니다.
+        gaps = np.flatnonzero(dt > (group_size[:-1] + GAP_FACTOR - 1) * self.period_ns)
+        if len(gaps):
+            missing = np.maximum(np.rint(dt[gaps] / self.period_ns).astype(np.int64) - group_size[gaps], 1)
+            self._add_gaps(dt[gaps] / 1e9, group_ns[gaps], missing)
+
+        self._last_group_ns = int(group_ns[-1])
+        self._last_group_size = int(group_size[-1])
+
+    def _add_gaps(self, durations, start_ns, missing):
+        self.lost += int(missing.sum())
+        self.gap_count += len(durations)
+        self.gap_seconds += float(durations.sum())
+        self.max_gap_seconds = max(self.max_gap_seconds, float(durations.max()))
+        bins = np.searchsorted(GAP_HISTOGRAM_EDGES, durations, side='right') - 1
+        np.add.at(self.gap_histogram, np.clip(bins, 0, len(GAP_HISTOGRAM_EDGES) - 1), 1)
+
+        # 블록 안의 누락 구간이 많으면 상위 K개만 힙에 넣습니다.
+        if len(durations) > self.top_k:
+            keep = np.argpartition(durations, -self.top_k)[-self.top_k:]
+            durations, start_ns, missing = durations[keep], start_ns[keep], missing[keep]
+        for item in zip(durations.tolist(), start_ns.tolist(), missing.tolist()):
+            if len(self._top_gaps) < self.top_k:
+                heapq.heappush(self._top_gaps, item)
+            elif item > self._top_gaps[0]:
+                heapq.heapreplace(self._top_gaps, item)
+
+    # ---------------------------
+    # 조회
+    # ---------------------------
+    @property
+    def loss_rate(self):
+        total = self.received + self.lost
+        return self.lost / total if total else 0.0
+
+    def top_gaps(self):
+        """가장 긴 누락 구간들을 (누락 시간(초), 누락 직전 수신 시각(ns), 누락 샘플 수) 목록으로, 긴 순서대로 반환합니다."""
+        return sorted(self._top_gaps, reverse=True)
+
+    def histogram(self):
+        """(구간 하한(초), 누락 구간 수) 목록."""
+        return list(zip(GAP_HISTOGRAM_EDGES.tolist(), self.gap_histogram.tolist()))
+
+    def summary(self):
+        return {
+            'received': self.received,
+            'lost': self.lost,
+            'loss_rate': self.loss_rate,
+            'gap_count': self.gap_count,
+            'mean_gap_seconds': self.gap_seconds / self.gap_count if self.gap_count else 0.0,
+            'max_gap_seconds': self.max_gap_seconds,
+            'out_of_order': self.out_of_order,
+            'resets': self.resets,
+            'duration_seconds': (self.last_ns - self.first_ns) / 1e9 if self.first_ns is not None else 0.0,
+        }
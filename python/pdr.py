@@ -0,0 +1,96 @@
+# pdr.py
+# 보행자 추측 항법(PDR, Pedestrian Dead Reckoning) 엔진
+# 걸음 검출 -> 걸음마다 방향(자이로 z축 적분)과 보폭 -> 걸음 위치(누적 합) -> 샘플마다 위치(np.interp) 를
+# 모두 배열 연산으로 처리하므로, 몇 시간짜리 실내 기록도 수 밀리초 안에 경로를 복원합니다.
+#
+# 보폭 모델은 교체할 수 있습니다. 모델은 (az, steps) 를 받아 걸음 구간마다의 보폭(m) 배열을 돌려주는 함수입니다.
+# - constant_step_length(0.65): 모든 걸음을 같은 보폭으로 (기존 방식)
+# - weinberg_step_length(k):    걸음 구간의 수직 가속도 최대-최소 차이의 4제곱근에 비례 (Weinberg 모델)
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import find_peaks
+
+# ---------------------------
+# 설정
+# ---------------------------
+# 걸음 검출 전에 az 에 적용하는 중앙 이동평균 길이 (샘플)
+STEP_SMOOTH_WINDOW = 5
+# Weinberg 모델 계수. 보폭(m) = WEINBERG_K * (az 최대 - az 최소) ** 0.25
+# 센서 단위(g)와 부착 위치에 따라 다르므로, 알고 있는 거리를 걸어 보고 맞추세요.
+WEINBERG_K = 0.5
+
+
+def smooth_az(az):
+    """
+    걸음 검출용 az 평활 (STEP_SMOOTH_WINDOW 중앙 이동평균, 양 끝처럼 값이 모자라거나 빈 값이 섞인 곳은 0).
+    pandas rolling 과 같은 값이지만 샘플마다 자기 윈도우만으로 계산하므로, 로그를 나눠 계산해도 결과가 비트 단위로 같습니다.
+    """
+    az = np.asarray(az, dtype=np.float64)
+    smoothed = np.zeros(len(az))
+    if len(az) >= STEP_SMOOTH_WINDOW:
+        half = STEP_SMOOTH_WINDOW // 2
+        smoothed[half:len(az) - (STEP_SMOOTH_WINDOW - 1 - half)] = sliding_window_view(az, STEP_SMOOTH_WINDOW).mean(axis=1)
+    return np.nan_to_num(smoothed, nan=0.0)
+
+
+def detect_steps(az, prominence, min_interval, wlen=None):
+    """
+    수직 가속도 az 에서 걸음(피크) 위치를 찾습니다.
+    wlen(샘플)을 주면 피크의 prominence 를 피크 앞뒤 wlen/2 안에서만 계산합니다. (로그를 나눠 처리해도 결과가 같도록)
+    반환값: (걸음 위치 배열, 평활된 az 배열)
+    """
+    az_smooth = smooth_az(az)
+    steps, _ = find_peaks(az_smooth, prominence=prominence, distance=min_interval, wlen=wlen)
+    return steps, az_smooth
+
+
+# ---------------------------
+# 보폭 모델
+# ---------------------------
+def constant_step_length(length):
+    """모든 걸음을 같은 보폭(m)으로 봅니다."""
+    def model(az, steps):
+        return np.full(max(len(steps) - 1, 0), float(length))
+    return model
+
+
+def weinberg_step_length(k=WEINBERG_K):
+    """Weinberg 모델: 걸음 구간 [steps[i-1], steps[i]) 의 az 최대-최소 차이로 보폭을 추정합니다."""
+    def model(az, steps):
+        if len(steps) < 2:
+            return np.zeros(0)
+        az = np.asarray(az, dtype=np.float64)[:steps[-1]]
+        a_max = np.maximum.reduceat(az, steps[:-1])
+        a_min = np.minimum.reduceat(az, steps[:-1])
+        return k * np.sqrt(np.sqrt(a_max - a_min))
+    return model
+
+
+# ---------------------------
+# 경로 복원
+# ---------------------------
+def pdr_path(gz_deg, steps, step_lengths, sampling_period):
+    """
+    걸음 위치와 보폭으로 샘플마다의 (x, y) 위치를 계산합니다.
+    - 걸음 i 의 방향: 첫 걸음부터 걸음 i 까지 자이로 z축(deg/s)을 적분한 값 (누적 합의 차이)
+    - 걸음 위치: 보폭 * (cos, sin) 의 누적 합, 첫 걸음 위치가 원점
+    - 샘플 위치: 앞뒤 걸음 위치 사이를 샘플 번호 기준으로 선형 보간. 첫 걸음 이전은 원점, 마지막 걸음 이후는 마지막 위치.
+    반환값: (샘플 위치 (샘플 수, 2), 걸음 위치 (걸음 수, 2), 걸음 방향 (걸음 수 - 1,) rad)
+    """
+    gz_rad = np.deg2rad(np.asarray(gz_deg, dtype=np.float64))
+    steps = np.asarray(steps)
+    step_lengths = np.asarray(step_lengths, dtype=np.float64)
+
+    # 빈 값(NaN)은 회전 0 으로 봅니다. (기존 pandas sum 과 같음)
+    gyro_integral = np.concatenate(([0.0], np.nancumsum(gz_rad)))
+    headings = (gyro_integral[steps[1:]] - gyro_integral[steps[0]]) * sampling_period
+
+    step_positions = np.zeros((len(steps), 2))
+    step_positions[1:, 0] = np.cumsum(step_lengths * np.cos(headings))
+    step_positions[1:, 1] = np.cumsum(step_lengths * np.sin(headings))
+
+    samples = np.arange(len(gz_rad))
+    positions = np.column_stack([np.interp(samples, steps, step_positions[:, 0]),
+                                 np.interp(samples, steps, step_positions[:, 1])])
+    return positions, step_positions, headings
@@ -0,0 +1,444 @@
+# replay_load.py
+# 수신 서버 부하 테스트: 기록된 로그(또는 합성 로그)를 여러 대의 장치가 보내는 것처럼 UDP / TCP 로 다시 보냅니다.
+# 실시간(1배), 10배, 또는 속도 제한 없이 보낼 수 있고, 실제로 보낸 속도(패킷/샘플/바이트 per 초)를 주기적으로 출력합니다.
+# 같은 컴퓨터에서 ingest_server.py (또는 rt_z_acc_variance.py) 를 띄워 두고 장치 수를 늘려 가며 돌리면,
+# 서버가 출력하는 손실률 / 기록 대기와 함께 서버가 버티는 최대 장치 수를 잴 수 있습니다.
+#
+# - 장치마다 소켓을 따로 열어 보내는 포트(UDP)나 연결(TCP)이 다르고, 장치 ID도 FIRST_DEVICE_ID 부터 다르게 붙입니다.
+# - 원본 로그는 장치 여러 대가 나눠 쓰므로(패킷 틀은 원본마다 한 번만 만듦) 수천 대도 메모리가 크게 늘지 않습니다.
+#   장치마다 원본의 다른 위치에서 시작하고 보내는 시각도 조금씩 어긋나게 해서, 모든 장치가 같은 순간에 몰아 보내지 않습니다.
+# - seq / millis 는 장치마다 0부터 끊김 없이 다시 매기므로, 서버가 보고하는 손실은 이번 전송에서 생긴 손실뿐입니다.
+# - 로그를 주지 않으면 synthetic_log.py 의 합성 장치(손실 없는 원래 신호)를 원본으로 씁니다.
+#
+# 사용법: python replay_load.py [로그 폴더 / 'sensor_log_*.csv' ...] [--devices 100] [--speed 1|10|max]
+#         [--protocol udp|tcp] [--host 127.0.0.1] [--port 65001] [--framing batch|sample|text]
+#         [--duration 60] [--loop] [--ramp 50 30] [--workers N]
+#         --ramp 50 30 : 30초마다 50대씩 늘립니다 (서버가 못 버티기 시작하는 장치 수를 찾을 때)
+
+import argparse
+import heapq
+import multiprocessing
+import os
+import socket
+import struct
+import time
+
+try:
+    import resource
+except ImportError:   # 윈도우에는 resource 모듈이 없습니다. (열 수 있는 소켓 수 제한도 따로 없음)
+    resource = None
+
+import numpy as np
+
+from batch_analysis import find_logs
+from ingest_server import TCP_PORT, UDP_PORT
+from sensor_features import FRAME_COLUMNS
+from sensor_log import load_sensor_log, timestamps_ns
+from synthetic_log import SAMPLE_HZ, SyntheticDevice
+from wire_protocol import BATCH_HEADER_DTYPE, encode_batch, encode_frames
+
+# ---------------------------
+# 설정
+# ---------------------------
+HOST = '127.0.0.1'
+PROTOCOL = 'udp'
+DEVICES = 10
+FIRST_DEVICE_ID = 1000
+# 재생 속도 (1 = 실시간, 10 = 10배, 0 = 제한 없이 최대한 빠르게)
+SPEED = 1.0
+
+# 패킷 형식: 'batch' (바이너리 배치 프레임, BATCH_SAMPLES 샘플씩), 'sample' (바이너리, 샘플 1개씩), 'text' (CSV 한 줄씩)
+FRAMING = 'batch'
+BATCH_SAMPLES = 10   # Hackathon.ino 의 FRAME_BATCH_SIZE
+TEXT_FORMAT = ','.join(['%.10g'] * len(FRAME_COLUMNS)) + '\n'
+
+# 로그를 주지 않았을 때 만드는 합성 원본 수 / 길이 (장치는 원본을 돌아가며 나눠 씁니다)
+SYNTHETIC_SOURCES = 8
+SYNTHETIC_MINUTES = 10
+
+# 진행 상황 출력 주기 (초)
+STATUS_INTERVAL = 5
+# 이 시간(초)보다 일정에 뒤처지면 송신기 자체가 못 따라가는 것이므로 경고합니다. (--workers 를 늘리세요)
+LAG_WARNING_SECONDS = 1.0
+# 송신 버퍼 크기 (바이트)
+SEND_BUFFER_BYTES = 1024 * 1024
+
+# 바이너리 헤더 안에서 장치마다 바꿔 쓰는 필드 (device_id u2, seq u4, millis u4 가 이어져 있음, 샘플/배치 프레임 공통)
+HEADER_PATCH = struct.Struct('<HII')
+HEADER_PATCH_OFFSET = BATCH_HEADER_DTYPE.fields['device_id'][1]
+
+# 송신 프로세스가 공유 카운터에 쓰는 값 (프로세스마다 한 줄)
+COUNTER_FIELDS = ('packets', 'samples', 'bytes', 'errors', 'lag', 'max_lag', 'active', 'ready', 'done')
+
+
+# ---------------------------
+# 원본 (패킷 틀)
+# ---------------------------
+class ReplaySource:
+    """
+    원본 하나((샘플 수, 11) 값과 샘플 시각)를 패킷 틀로 미리 나눠 둡니다.
+    바이너리 틀은 장치 ID / seq / millis 가 0 이고, 보낼 때 장치마다 그 자리만 바꿔 씁니다. (텍스트 틀은 ID 없이 값만)
+    """
+
+    def __init__(self, name, values, t_s, framing=FRAMING, batch_samples=BATCH_SAMPLES):
+        values = np.nan_to_num(np.asarray(values, dtype=np.float64))   # GPS fix 가 없는 행은 보드처럼 0 으로
+        t_s = np.maximum.accumulate(np.asarray(t_s, dtype=np.float64) - t_s[0])
+        n = len(values)
+        if n == 0:
+            raise ValueError(f"보낼 샘플이 없습니다: {name}")
+        self.name = name
+        self.framing = framing
+        self.samples = n
+        # 원본을 다 보내고 처음부터 다시 보낼 때 (--loop) 이어지는 시각: 마지막 샘플 + 샘플 간격 한 번
+        interval = np.median(np.diff(t_s)) if n > 1 else 1 / SAMPLE_HZ
+        self.period_s = t_s[-1] + (interval if interval > 0 else 1 / SAMPLE_HZ)
+        self.period_ms = int(round(self.period_s * 1000))
+
+        size = batch_samples if framing == 'batch' else 1
+        first = np.arange(0, n, size)
+        last = np.minimum(first + size, n) - 1
+        t_ms = np.round(t_s * 1000).astype(np.int64)
+        # 패킷은 마지막 샘플을 측정한 시각에 보냅니다.
+        self.send_s = t_s[last].tolist()
+        self.seq = first.tolist()
+        self.millis = t_ms[first].tolist()
+        if framing == 'batch':
+            self.frames = [encode_batch(0, 0, 0, values[a:b + 1], np.clip(t_ms[a:b + 1] - t_ms[a], 0, 0xFFFF))
+                           for a, b in zip(first, last)]
+        elif framing == 'sample':
+            blob = encode_frames(0, 0, 0, values)
+            size = len(blob) // n
+            self.frames = [blob[i:i + size] for i in range(0, len(blob), size)]
+        elif framing == 'text':
+            self.frames = [(TEXT_FORMAT % tuple(row)).encode() for row in values.tolist()]
+        else:
+            raise ValueError(f"알 수 없는 패킷 형식입니다: {framing}")
+
+    def __len__(self):
+        return len(self.frames)
+
+
+def load_source(path, framing=FRAMING, batch_samples=BATCH_SAMPLES):
+    """기록된 로그 하나를 원본으로 읽습니다. 샘플 시각은 장치 시계(device_ms)가 있으면 그것을, 없으면 수신 시각을 씁니다."""
+    df = load_sensor_log(path, columns=FRAME_COLUMNS + ['timestamp_ns', 'timestamp', 'device_ms'])
+    if 'device_ms' in df.columns and df['device_ms'].notna().all():
+        t_s = df['device_ms'].to_numpy(dtype=np.float64) / 1000
+    elif 'timestamp_ns' in df.columns or 'timestamp' in df.columns:
+        t_s = (timestamps_ns(df) - timestamps_ns(df)[0]) / 1e9
+    else:
+        t_s = np.arange(len(df)) / SAMPLE_HZ
+    values = df.reindex(columns=FRAME_COLUMNS).to_numpy(dtype=np.float64)
+    return ReplaySource(os.path.basename(path), values, t_s, framing, batch_samples)
+
+
+def synthetic_source(index, duration_s, seed=0, framing=FRAMING, batch_samples=BATCH_SAMPLES):
+    """synthetic_log 의 합성 장치 하나를 (손실/지연 없이 보드가 보내는 값 그대로) 원본으로 만듭니다."""
+    device = SyntheticDevice(index, duration_s, seed=seed, start_ns=0, packet_loss=0, jitter_ms=0)
+    return ReplaySource(f"synthetic_{index}", device.frame(0, device.samples),
+                        np.arange(device.samples) / SAMPLE_HZ, framing, batch_samples)
+
+
+def build_source(spec, framing, batch_samples):
+    """원본 설명 ('log', 경로) / ('synthetic', 번호, 길이(초), 시드) 으로 원본을 만듭니다. (송신 프로세스에서 실행)"""
+    if spec[0] == 'log':
+        return load_source(spec[1], framing, batch_samples)
+    return synthetic_source(*spec[1:], framing=framing, batch_samples=batch_samples)
+
+
+# ---------------------------
+# 장치 (송신 프로세스에서 실행)
+# ---------------------------
+class ReplayDevice:
+    """
+    원본 하나를 자기 장치 ID / 소켓으로 보내는 가상 장치.
+    원본의 start 번째 패킷부터 보내고, 끝에 닿으면 처음으로 돌아갑니다. (loop 가 아니면 원본을 한 바퀴만)
+    """
+
+    def __init__(self, device_id, source, sock, start, offset_s, boot_ms, loop=False):
+        self.device_id = device_id
+        self.source = source
+        self.sock = sock
+        self.start = start
+        self.offset_s = offset_s
+        self.boot_ms = boot_ms
+        self.loop = loop
+        self.sent = 0
+        self.text_prefix = f"{device_id},".encode()
+
+    def _position(self):
+        index = self.start + self.sent
+        return index % len(self.source), index // len(self.source)
+
+    def due(self):
+        """다음 패킷을 보낼 시각 (전송 시작부터 원본 시간으로 몇 초 뒤인지). 보낼 패킷이 없으면 None."""
+        if not self.loop and self.sent >= len(self.source):
+            return None
+        j, cycle = self._position()
+        return self.offset_s + cycle * self.source.period_s + self.source.send_s[j] - self.source.send_s[self.start]
+
+    def packet(self):
+        """다음 패킷의 바이트. 헤더의 장치 ID와, 이 장치 기준으로 다시 매긴 seq / millis 를 채웁니다."""
+        src = self.source
+        j, cycle = self._position()
+        if src.framing == 'text':
+            return self.text_prefix + src.frames[j]
+        data = bytearray(src.frames[j])
+        seq = cycle * src.samples + src.seq[j] - src.seq[self.start]
+        millis = self.boot_ms + cycle * src.period_ms + src.millis[j] - src.millis[self.start]
+        HEADER_PATCH.pack_into(data, HEADER_PATCH_OFFSET, self.device_id, seq & 0xFFFFFFFF, millis & 0xFFFFFFFF)
+        return data
+
+
+def open_socket(protocol, host, port):
+    """장치 하나의 소켓. UDP 는 바인딩하지 않고 보내므로 커널이 장치마다 다른 송신 포트를 줍니다."""
+    if protocol == 'udp':
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_BYTES)
+        sock.connect((host, port))
+    else:
+        sock = socket.create_connection((host, port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def raise_file_limit(needed):
+    """장치마다 소켓을 하나씩 열기 때문에, 열 수 있는 파일 수를 (허용되는 만큼) 늘립니다."""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        target = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+
+def run_worker(worker, devices, source_specs, options, counters, start_event, stop_event):
+    """
+    송신 프로세스 하나: 맡은 장치들의 패킷을 보낼 시각 순서(힙)대로 보냅니다.
+    speed 가 0 이면 기다리지 않고 같은 순서로 최대한 빠르게 보냅니다. 진행 상황은 공유 카운터에 씁니다.
+    devices: [(장치 ID, 원본 번호, 시작 지연(초))]
+    """
+    row = worker * len(COUNTER_FIELDS)
+    field = {name: row + i for i, name in enumerate(COUNTER_FIELDS)}
+    speed = options['speed']
+    raise_file_limit(len(devices) + 64)
+    rng = np.random.default_rng([options['seed'], worker])
+
+    sources = {}
+    replay = []
+    for device_id, source_index, delay_s in devices:
+        if source_index not in sources:
+            sources[source_index] = build_source(source_specs[source_index], options['framing'], options['batch_samples'])
+        source = sources[source_index]
+        sock = open_socket(options['protocol'], options['host'], options['port'])
+        # 시작 지연(--ramp)은 벽시계 기준이므로 원본 시간으로 바꿔 둡니다. 패킷 간격 안의 어긋남을 더해 한꺼번에 몰리지 않게 합니다.
+        offset_s = delay_s * (speed or 1) + rng.uniform(0, source.period_s / len(source))
+        replay.append(ReplayDevice(device_id, source, sock, int(rng.integers(len(source))), offset_s,
+                                   int(rng.integers(1_000, 600_000)), options['loop']))
+    heap = [(device.due(), i) for i, device in enumerate(replay)]
+    heapq.heapify(heap)
+
+    # 원본을 만드는 데 걸리는 시간이 프로세스마다 다르므로, 모두 준비되면 다 같이 보내기 시작합니다.
+    counters[field['ready']] = 1
+    start_event.wait()
+
+    packets = samples = sent_bytes = errors = active = 0
+    max_lag = lag = 0.0
+    samples_per_packet = {'batch': options['batch_samples'], 'sample': 1, 'text': 1}[options['framing']]
+    duration = options['duration']
+    t0 = time.perf_counter()
+    next_report = 0.0
+    try:
+        while heap and not stop_event.is_set():
+            due, i = heap[0]
+            now = time.perf_counter() - t0
+            if duration and now >= duration:
+                break
+            if now >= next_report:
+                counters[field['packets']], counters[field['samples']] = packets, samples
+                counters[field['bytes']], counters[field['errors']] = sent_bytes, errors
+                counters[field['lag']], counters[field['max_lag']] = lag, max_lag
+                counters[field['active']] = active
+                next_report = now + 0.2
+            if speed:
+                due /= speed
+                if due > now:
+                    time.sleep(min(due - now, 0.1))
+                    continue
+                lag = now - due
+                max_lag = max(max_lag, lag)
+
+            device = replay[i]
+            data = device.packet()
+            try:
+                if options['protocol'] == 'udp':
+                    device.sock.send(data)
+                else:
+                    device.sock.sendall(data)
+                packets += 1
+                samples += samples_per_packet
+                sent_bytes += len(data)
+            except OSError:
+                # UDP 송신 버퍼 부족(ENOBUFS), 서버가 꺼져 있음(ECONNREFUSED) 등: 네트워크에서 잃은 것처럼 세고 넘어갑니다.
+                errors += 1
+            if device.sent == 0:
+                active += 1   # --ramp 로 늦게 시작하는 장치는 첫 패킷을 보낼 때부터 셉니다
+            device.sent += 1
+            next_due = device.due()
+            if next_due is None:
+                heapq.heappop(heap)
+                active -= 1
+                device.sock.close()
+            else:
+                heapq.heapreplace(heap, (next_due, i))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for device in replay:
+            device.sock.close()
+        counters[field['packets']], counters[field['samples']] = packets, samples
+        counters[field['bytes']], counters[field['errors']] = sent_bytes, errors
+        counters[field['lag']], counters[field['max_lag']] = lag, max_lag
+        counters[field['active']] = 0
+        counters[field['done']] = 1
+
+
+# ---------------------------
+# 실행 (부모 프로세스)
+# ---------------------------
+def plan_devices(count, sources, first_id=FIRST_DEVICE_ID, ramp=None):
+    """장치마다 (장치 ID, 원본 번호, 시작 지연(초)). ramp=(대수, 초) 이면 그 시간마다 그 대수씩 늦게 시작합니다."""
+    plan = []
+    for i in range(count):
+        delay_s = (i // ramp[0]) * ramp[1] if ramp else 0.0
+        plan.append((first_id + i, i % sources, delay_s))
+    return plan
+
+
+def _totals(counters, workers):
+    width = len(COUNTER_FIELDS)
+    rows = [counters[w * width:(w + 1) * width] for w in range(workers)]
+    total = {name: sum(row[i] for row in rows) for i, name in enumerate(COUNTER_FIELDS)}
+    total['lag'] = max(row[COUNTER_FIELDS.index('lag')] for row in rows)
+    total['max_lag'] = max(row[COUNTER_FIELDS.index('max_lag')] for row in rows)
+    return total
+
+
+def _rate_line(label, delta, seconds):
+    return (f"{label} {delta['packets'] / seconds:,.0f} 패킷/초, {delta['samples'] / seconds:,.0f} 샘플/초 "
+            f"(50Hz 장치 {delta['samples'] / seconds / SAMPLE_HZ:,.1f}대 분량), {delta['bytes'] * 8 / seconds / 1e6:,.2f} Mbit/s")
+
+
+def run_replay(source_specs, devices=DEVICES, speed=SPEED, protocol=PROTOCOL, host=HOST, port=None,
+               framing=FRAMING, batch_samples=BATCH_SAMPLES, duration=None, loop=False, ramp=None, workers=1,
+               first_id=FIRST_DEVICE_ID, seed=0):
+    """
+    장치 devices 대를 workers 개의 송신 프로세스에 나눠 보내고, STATUS_INTERVAL 마다 보낸 속도를 출력합니다.
+    전체 결과(보낸 패킷/샘플/바이트, 초당 속도, 송신 오류, 최대 지연)를 dict 로 반환합니다.
+    """
+    if port is None:
+        port = UDP_PORT if protocol == 'udp' else TCP_PORT
+    workers = max(1, min(workers, devices))
+    plan = plan_devices(devices, len(source_specs), first_id, ramp)
+    options = {'speed': speed, 'protocol': protocol, 'host': host, 'port': port, 'framing': framing,
+               'batch_samples': batch_samples, 'duration': duration, 'loop': loop, 'seed': seed}
+
+    ctx = multiprocessing.get_context('spawn')
+    counters = ctx.Array('d', workers * len(COUNTER_FIELDS), lock=False)
+    start_event, stop_event = ctx.Event(), ctx.Event()
+    processes = [ctx.Process(target=run_worker, daemon=True,
+                             args=(w, plan[w::workers], source_specs, options, counters, start_event, stop_event))
+                 for w in range(workers)]
+    speed_text = f"{speed:g}배속" if speed else "속도 제한 없음"
+    print(f"🚀 {host}:{port} ({protocol.upper()}, {framing}) 로 장치 {devices}대, 원본 {len(source_specs)}개, "
+          f"{speed_text}, 송신 프로세스 {workers}개")
+    for process in processes:
+        process.start()
+    # 원본 로그를 읽고 패킷 틀을 만드는 동안은 보낸 속도에 넣지 않습니다.
+    ready = COUNTER_FIELDS.index('ready')
+    while any(process.is_alive() for process in processes) and not all(
+            counters[w * len(COUNTER_FIELDS) + ready] or not process.is_alive() for w, process in enumerate(processes)):
+        time.sleep(0.05)
+    start_event.set()
+
+    t0 = time.perf_counter()
+    last, last_t = _totals(counters, workers), t0
+    try:
+        while any(process.is_alive() for process in processes):
+            time.sleep(min(0.2, max(0.0, last_t + STATUS_INTERVAL - time.perf_counter())))
+            now = time.perf_counter()
+            if now - last_t < STATUS_INTERVAL:
+                continue
+            total = _totals(counters, workers)
+            delta = {name: total[name] - last[name] for name in ('packets', 'samples', 'bytes')}
+            line = _rate_line(f"📤 [{now - t0:6.0f}초] 장치 {total['active']:.0f}대:", delta, now - last_t)
+            print(f"{line}, 송신 오류 누적 {total['errors']:.0f}건, 일정 지연 {total['lag']:.2f}초")
+            if speed and total['lag'] > LAG_WARNING_SECONDS:
+                print(f"   ⚠️ 송신기가 일정보다 {total['lag']:.1f}초 늦습니다. 잰 값은 서버가 아니라 송신기의 한계일 수 있습니다 (--workers 를 늘려 보세요).")
+            last, last_t = total, now
+    except KeyboardInterrupt:
+        print("\n🛑 전송을 멈춥니다.")
+        stop_event.set()
+        for process in processes:
+            process.join()
+
+    elapsed = time.perf_counter() - t0
+    total = _totals(counters, workers)
+    crashed = sum(1 for w, process in enumerate(processes)
+                  if process.exitcode != 0 and not counters[w * len(COUNTER_FIELDS) + COUNTER_FIELDS.index('done')])
+    if crashed:
+        print(f"❌ 송신 프로세스 {crashed}개가 비정상 종료했습니다. (서버가 떠 있는지, 열 수 있는 파일 수가 충분한지 확인하세요)")
+    print(_rate_line(f"✅ {elapsed:.1f}초 동안 패킷 {total['packets']:,.0f}개 ({total['bytes'] / 1e6:,.1f} MB) 전송, 평균",
+                     total, elapsed))
+    print(f"   송신 오류 {total['errors']:.0f}건, 최대 일정 지연 {total['max_lag']:.2f}초")
+    return {'elapsed_s': elapsed, 'devices': devices, 'speed': speed, 'packets': int(total['packets']),
+            'samples': int(total['samples']), 'bytes': int(total['bytes']), 'errors': int(total['errors']),
+            'packets_per_s': total['packets'] / elapsed, 'samples_per_s': total['samples'] / elapsed,
+            'max_lag_s': total['max_lag'], 'crashed_workers': crashed}
+
+
+def parse_speed(text):
+    """'1', '10', '2.5' 또는 'max' (제한 없음 = 0)."""
+    if text.lower() in ('max', 'unthrottled', '0'):
+        return 0.0
+    speed = float(text)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("재생 속도는 0보다 커야 합니다 (제한 없이 보내려면 max)")
+    return speed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="기록된/합성 로그를 여러 장치처럼 수신 서버로 다시 보내 부하를 겁니다.")
+    parser.add_argument('inputs', nargs='*', help="원본 로그 폴더, glob 패턴 또는 파일 (없으면 합성 원본)")
+    parser.add_argument('--devices', type=int, default=DEVICES, help="가상 장치 수 (기본: %(default)s)")
+    parser.add_argument('--speed', type=parse_speed, default=SPEED, help="재생 속도: 1, 10, ... 또는 max (기본: %(default)s)")
+    parser.add_argument('--protocol', choices=['udp', 'tcp'], default=PROTOCOL, help="전송 방식 (기본: %(default)s)")
+    parser.add_argument('--host', default=HOST, help="수신 서버 주소 (기본: %(default)s)")
+    parser.add_argument('--port', type=int, help=f"수신 서버 포트 (기본: UDP {UDP_PORT} / TCP {TCP_PORT})")
+    parser.add_argument('--framing', choices=['batch', 'sample', 'text'], default=FRAMING, help="패킷 형식 (기본: %(default)s)")
+    parser.add_argument('--batch-samples', type=int, default=BATCH_SAMPLES, help="배치 프레임 하나의 샘플 수 (기본: %(default)s)")
+    parser.add_argument('--duration', type=float, help="이 시간(초)이 지나면 멈춥니다")
+    parser.add_argument('--loop', action='store_true', help="원본을 다 보내면 처음부터 다시 보냅니다 (--duration 과 함께)")
+    parser.add_argument('--ramp', nargs=2, type=float, metavar=('DEVICES', 'SECONDS'),
+                        help="SECONDS 초마다 장치를 DEVICES 대씩 늘립니다")
+    parser.add_argument('--workers', type=int, default=1, help="송신 프로세스 수 (기본: %(default)s)")
+    parser.add_argument('--first-id', type=int, default=FIRST_DEVICE_ID, help="첫 장치 ID (기본: %(default)s)")
+    parser.add_argument('--synthetic-minutes', type=float, default=SYNTHETIC_MINUTES,
+                        help="합성 원본 길이(분) (기본: %(default)s)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if not 1 <= args.batch_samples <= 255:
+        parser.error("--batch-samples 는 1~255 사이여야 합니다")
+    if args.framing != 'text' and args.first_id + args.devices - 1 > 0xFFFF:
+        parser.error("바이너리 프레임의 장치 ID 는 65535 까지입니다 (--first-id / --devices 확인)")
+    if args.inputs:
+        logs = find_logs(args.inputs)
+        if not logs:
+            parser.error("보낼 로그를 찾지 못했습니다")
+        specs = [('log', path) for path in logs]
+    else:
+        specs = [('synthetic', i, args.synthetic_minutes * 60, args.seed)
+                 for i in range(min(args.devices, SYNTHETIC_SOURCES))]
+    ramp = (max(1, int(args.ramp[0])), args.ramp[1]) if args.ramp else None
+    run_replay(specs, args.devices, args.speed, args.protocol, args.host, args.port, args.framing, args.batch_samples,
+               args.duration, args.loop, ramp, args.workers, args.first_id, args.seed)
@@ -1,12 +1,17 @@
 import socket
+import threading
+import time
+import queue
 import matplotlib
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from collections import deque
-import csv
 import datetime
 
+from sensor_features import StreamingFeatures
+from live_plot import FeaturePlot, put_latest, run_render_loop
+from wire_protocol import decode_packet
+from log_writer import LogWriter, timestamp_ns
+from ingest_metrics import start_metrics
+from ingest_server import make_device_key
+
 # TkAgg 백엔드 설정
 matplotlib.use('TkAgg')
 
@@ -20,137 +25,122 @@ WINDOW_SIZE = 20
 STEP_SIZE = 10
 
 # ★ 그래프에 보여줄 최대 점의 개수 (이 값을 조절하면 화면에 보이는 시간이 달라집니다)
-GRAPH_WIDTH = 100 
-
-# 데이터 처리용 버퍼 (특징 추출용)
-buffer = deque(maxlen=WINDOW_SIZE + STEP_SIZE)
-
-# ★ 그래프 시각화용 버퍼 (maxlen을 설정하여 오래된 데이터 자동 삭제)
-z_variances = deque(maxlen=GRAPH_WIDTH)
-mean_pitches = deque(maxlen=GRAPH_WIDTH)
-
-new_data_counter = 0
-
-# --- 특징 추출 함수 ---
-def compute_feature(window_df):
-    df = window_df.copy()
-    for col in ['ax', 'ay', 'az']:
-        df[f'{col}_smooth'] = df[col].rolling(window=2).mean()
-    df.dropna(inplace=True)
-    if df.empty:
-        return None, None
-    z_acc_var = df['az_smooth'].var()
-    pitch_y_rad = np.mean(np.arctan2(df['ax_smooth'], np.sqrt(df['ay_smooth']**2 + df['az_smooth']**2)))
-    mean_pitch_absolute = np.abs(pitch_y_rad)
-    return z_acc_var, mean_pitch_absolute
-
-# --- 그래프 초기 설정 ---
-# FuncAnimation은 while True 루프와 충돌할 수 있어 제거하고, 수동 업데이트 방식 사용
-fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8))
-
-# 초기 빈 라인 생성
-line1, = ax1.plot([], [], 'o-', markersize=4, label='Z-axis Variance')
-ax1.set_title("Real-time Sensor Features (Sliding Window)")
-ax1.set_ylabel("Z-axis Variance")
-ax1.grid(True)
-ax1.legend(loc='upper right')
-# ★ X축을 고정합니다 (0 ~ GRAPH_WIDTH)
-ax1.set_xlim(0, GRAPH_WIDTH - 1)
-ax1.set_ylim(0, 0.1) 
-
-line2, = ax2.plot([], [], 'o-', color='red', markersize=4, label='Mean Pitch (Absolute)')
-ax2.set_xlabel("Time Step (Recent data)")
-ax2.set_ylabel("Mean Pitch (Radians)")
-ax2.grid(True)
-ax2.legend(loc='upper right')
-# ★ X축을 고정합니다
-ax2.set_xlim(0, GRAPH_WIDTH - 1)
-ax2.set_ylim(0, 0.5)
-
-fig.tight_layout()
+GRAPH_WIDTH = 100
+
+# ★ 그래프 갱신 주기 (초당 프레임 수). 데이터가 얼마나 빨리 들어오든 이 주기로만 다시 그립니다.
+RENDER_FPS = 10
+
+# ★ False로 두면 그래프 창 없이 수신/저장만 합니다.
+SHOW_PLOT = True
+
+# 로그 파일 형식 ('parquet', 'csv' 또는 'session')
+LOG_FORMAT = 'parquet'
+
+# 수신 스레드 -> 그래프로 넘기는 특징 큐의 크기 (가득 차면 오래된 값부터 버림)
+FEATURE_QUEUE_SIZE = 256
+
+# Prometheus 지표(/metrics)를 내보낼 포트 (ingest_metrics.py). None 이면 내보내지 않습니다.
+METRICS_PORT = 9102
+
+# ---------------------------
+# 수신 스레드
+# ---------------------------
+def receive_loop(sock, log_sink, feature_queue, stop_event, metrics=None):
+    """UDP 수신, 파싱, 저장, 특징 추출을 전담합니다. 그래프 갱신과 무관하게 계속 소켓을 비웁니다."""
+    # 슬라이딩 윈도우 특징 엔진 (샘플마다 상수 시간에 갱신)
+    features = StreamingFeatures(WINDOW_SIZE, STEP_SIZE)
+    # (장치 ID, 송신 주소) -> 장치 지표. 레이블 문자열을 패킷마다 만들지 않도록 한 번만 찾아 둡니다.
+    device_metrics = {}
+
+    while not stop_event.is_set():
+        try:
+            # UDP 데이터 수신 (타임아웃은 종료 신호를 확인하기 위한 용도)
+            try:
+                raw_data, addr = sock.recvfrom(1024)
+            except socket.timeout:
+                continue
+
+            if not raw_data.strip(): continue
+
+            # CSV 텍스트 / 바이너리(단일/배치) 프레임 모두 (샘플 수, 11) 블록으로 디코딩됩니다.
+            packet = decode_packet(raw_data)
+
+            # 파일 쓰기는 LogWriter 스레드가 모아서 처리합니다 (여기서는 큐에 넣기만 함).
+            log_sink.write(packet.values, timestamp_ns(), packet.seq, packet.millis)
+
+            # STEP_SIZE 샘플마다 나온 특징을 그래프 큐로 전달
+            started = time.perf_counter()
+            for z_var, pitch in features.push_block(packet.values):
+                put_latest(feature_queue, (z_var, pitch))
+
+            if metrics is not None:
+                source = (packet.device_id, addr)
+                device = device_metrics.get(source)
+                if device is None:
+                    device = device_metrics[source] = metrics.device(make_device_key(*source))
+                device.feature_time(time.perf_counter() - started)
+                device.packet(len(raw_data), len(packet.values))
+
+        except (ValueError, IndexError) as e:
+            print(f"데이터 파싱 오류: {e}")
+            if metrics is not None:
+                metrics.parse_error('udp')
+        except Exception as e:
+            print(f"오류: {e}")
+            stop_event.set()
+            break
 
 # ---------------------------
 # UDP 서버 및 메인 루프
 # ---------------------------
 sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 sock.bind((HOST, UDP_PORT))
-sock.settimeout(0.05) # ★ 소켓 타임아웃 설정 (그래프 반응성 향상을 위해 블로킹 방지)
+sock.settimeout(0.5) # 수신 스레드가 종료 신호를 주기적으로 확인하기 위한 타임아웃
 
 print(f"✅ UDP 서버가 {UDP_PORT} 포트에서 수신 대기 중입니다...")
 
+stop_event = threading.Event()
+
 try:
+    # 지표 서버는 로그를 열기 전에 시작합니다. (포트를 열지 못하면 지표 없이 계속)
+    metrics = start_metrics(METRICS_PORT)
+    if metrics is not None:
+        metrics.track_udp_socket(sock)
+
     timestamp_start = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"sensor_log_{timestamp_start}.csv"
-    print(f"📝 데이터를 '{filename}' 파일에 저장합니다.")
-
-    with open(filename, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        header = ['lat','lon','ax','ay','az','gx','gy','gz','mx','my','mz', 'timestamp']
-        writer.writerow(header)
-        
-        # 그래프 창 띄우기
-        plt.show(block=False)
-        
-        # 배경 저장 (블리팅 기법을 쓰고 싶다면 필요하지만, 여기선 단순 redraw 사용)
-        fig.canvas.draw()
-
-        while True:
-            try:
-                # UDP 데이터 수신 (타임아웃 설정으로 인해 데이터 없으면 예외 발생하고 루프 계속됨)
-                try:
-                    raw_data, addr = sock.recvfrom(1024)
-                except socket.timeout:
-                    # 데이터가 안 들어와도 그래프 창의 이벤트(창 닫기 등)를 처리하기 위해 업데이트
-                    fig.canvas.flush_events() 
-                    continue
-
-                data_line = raw_data.decode('utf-8').strip()
-                if not data_line: continue
-                
-                frame_values = list(map(float, data_line.split(',')))
-                if len(frame_values) != 11:
-                    continue
-                
-                timestamp_now = datetime.datetime.now().isoformat()
-                writer.writerow(frame_values + [timestamp_now])
-
-                buffer.append(frame_values)
-                new_data_counter += 1
-
-                # 일정 데이터가 모이면 특징 추출 및 그래프 업데이트
-                if new_data_counter >= STEP_SIZE and len(buffer) >= WINDOW_SIZE:
-                    new_data_counter = 0
-                    window_data = list(buffer)[-WINDOW_SIZE:]
-                    df = pd.DataFrame(window_data, columns=header[:-1])
-                    
-                    z_var, pitch = compute_feature(df)
-                    
-                    if z_var is not None:
-                        # ★ deque에 데이터 추가 (오래된 데이터는 자동으로 밀려남)
-                        z_variances.append(z_var)
-                        mean_pitches.append(pitch)
-                        
-                        # ★ 그래프 데이터 업데이트
-                        # x축 데이터는 항상 0, 1, ..., len-1 형태로 생성하여 '흐르는' 효과를 줌
-                        line1.set_data(range(len(z_variances)), z_variances)
-                        line2.set_data(range(len(mean_pitches)), mean_pitches)
-
-                        # Y축 스케일 자동 조정 (선택 사항)
-                        # 데이터가 튀었을 때 그래프 밖으로 나가는 것을 방지하고 싶다면 주석 해제
-                        # if z_var > ax1.get_ylim()[1]: ax1.set_ylim(0, z_var * 1.5)
-                        # if pitch > ax2.get_ylim()[1]: ax2.set_ylim(0, pitch * 1.5)
-
-                        fig.canvas.draw()
-                        fig.canvas.flush_events()
-
-            except (ValueError, IndexError) as e:
-                print(f"데이터 파싱 오류: {e}")
-            except Exception as e:
-                print(f"오류: {e}")
+    log_writer = LogWriter()
+    log_writer.start()
+    log_sink = log_writer.open_log(f"sensor_log_{timestamp_start}", LOG_FORMAT)
+    print(f"📝 데이터를 '{log_sink.path}' 파일에 저장합니다.")
+
+    feature_queue = queue.Queue(maxsize=FEATURE_QUEUE_SIZE)
+    if metrics is not None:
+        metrics.track_queue('log_writer', log_writer.backlog)
+        metrics.track_queue('feature', feature_queue.qsize)
+    receiver = threading.Thread(target=receive_loop, args=(sock, log_sink, feature_queue, stop_event, metrics),
+                                daemon=True)
+    receiver.start()
+
+    try:
+        if SHOW_PLOT:
+            plot = FeaturePlot("Real-time Sensor Features (Sliding Window)", GRAPH_WIDTH)
+            run_render_loop(plot, feature_queue, RENDER_FPS, lambda: not stop_event.is_set())
+            if not stop_event.is_set():
+                print("그래프 창이 닫혔습니다. 수신은 계속됩니다 (Ctrl+C로 종료).")
+
+        while receiver.is_alive():
+            receiver.join(timeout=0.5)
+            if not log_writer.healthy(log_sink):
+                print("❌ 로그 기록이 멈췄습니다. 수신을 종료합니다.")
                 break
+    finally:
+        # 수신 스레드를 먼저 멈춘 뒤, 남은 로그를 모두 기록하고 파일을 닫습니다.
+        stop_event.set()
+        receiver.join()
+        log_writer.stop()
 
 except KeyboardInterrupt:
     print("\n🛑 서버를 종료합니다.")
 finally:
     sock.close()
-    print("소켓이 닫혔습니다.")
\ No newline at end of file
+    print("소켓이 닫혔습니다.")
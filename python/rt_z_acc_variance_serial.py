@@ -2,14 +2,16 @@
 
 import serial  # pyserial 라이브러리 필요
 import time
+import threading
+import queue
 import matplotlib
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from collections import deque
-import csv
 import datetime
 
+from sensor_features import StreamingFeatures
+from live_plot import FeaturePlot, put_latest, run_render_loop
+from log_writer import LogWriter, timestamp_ns
+from ingest_metrics import start_metrics
+
 # TkAgg 백엔드 설정
 matplotlib.use('TkAgg')
 
@@ -21,50 +23,73 @@ BAUD_RATE = 115200
 
 WINDOW_SIZE = 20
 STEP_SIZE = 10
-GRAPH_WIDTH = 100 
-
-# 데이터 처리용 버퍼
-buffer = deque(maxlen=WINDOW_SIZE + STEP_SIZE)
-
-# 그래프 시각화용 버퍼
-z_variances = deque(maxlen=GRAPH_WIDTH)
-mean_pitches = deque(maxlen=GRAPH_WIDTH)
-
-new_data_counter = 0
-
-# --- 특징 추출 함수 (기존과 동일) ---
-def compute_feature(window_df):
-    df = window_df.copy()
-    for col in ['ax', 'ay', 'az']:
-        df[f'{col}_smooth'] = df[col].rolling(window=2).mean()
-    df.dropna(inplace=True)
-    if df.empty:
-        return None, None
-    z_acc_var = df['az_smooth'].var()
-    pitch_y_rad = np.mean(np.arctan2(df['ax_smooth'], np.sqrt(df['ay_smooth']**2 + df['az_smooth']**2)))
-    mean_pitch_absolute = np.abs(pitch_y_rad)
-    return z_acc_var, mean_pitch_absolute
-
-# --- 그래프 초기 설정 (기존과 동일) ---
-fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8))
-
-line1, = ax1.plot([], [], 'o-', markersize=4, label='Z-axis Variance')
-ax1.set_title("Real-time Sensor Features (Serial Communication)") # 제목 변경
-ax1.set_ylabel("Z-axis Variance")
-ax1.grid(True)
-ax1.legend(loc='upper right')
-ax1.set_xlim(0, GRAPH_WIDTH - 1)
-ax1.set_ylim(0, 0.1) 
-
-line2, = ax2.plot([], [], 'o-', color='red', markersize=4, label='Mean Pitch (Absolute)')
-ax2.set_xlabel("Time Step (Recent data)")
-ax2.set_ylabel("Mean Pitch (Radians)")
-ax2.grid(True)
-ax2.legend(loc='upper right')
-ax2.set_xlim(0, GRAPH_WIDTH - 1)
-ax2.set_ylim(0, 0.5)
-
-fig.tight_layout()
+GRAPH_WIDTH = 100
+
+# 그래프 갱신 주기 (초당 프레임 수). 데이터 수신 속도와 무관하게 이 주기로만 다시 그립니다.
+RENDER_FPS = 10
+
+# False로 두면 그래프 창 없이 수신/저장만 합니다.
+SHOW_PLOT = True
+
+# 로그 파일 형식 ('parquet', 'csv' 또는 'session')
+LOG_FORMAT = 'parquet'
+
+# 수신 스레드 -> 그래프로 넘기는 특징 큐의 크기 (가득 차면 오래된 값부터 버림)
+FEATURE_QUEUE_SIZE = 256
+
+# Prometheus 지표(/metrics)를 내보낼 포트 (ingest_metrics.py). None 이면 내보내지 않습니다.
+METRICS_PORT = 9103
+
+# ---------------------------
+# 수신 스레드
+# ---------------------------
+def receive_loop(ser, log_sink, feature_queue, stop_event, metrics=None):
+    """시리얼 수신, 파싱, 저장, 특징 추출을 전담합니다. 그래프 갱신과 무관하게 계속 포트를 비웁니다."""
+    # 슬라이딩 윈도우 특징 엔진 (샘플마다 상수 시간에 갱신)
+    features = StreamingFeatures(WINDOW_SIZE, STEP_SIZE)
+    # 시리얼은 장치가 하나뿐이므로 포트 이름을 장치 레이블로 씁니다.
+    device_metrics = metrics.device(COM_PORT) if metrics is not None else None
+
+    while not stop_event.is_set():
+        try:
+            # 시리얼 데이터 한 줄 읽기 (timeout 동안 데이터가 없으면 빈 문자열)
+            # decode 오류 무시 (errors='ignore')하여 깨진 바이트로 인한 멈춤 방지
+            raw_bytes = ser.readline()
+            raw_line = raw_bytes.decode('utf-8', errors='ignore').strip()
+
+            if not raw_line: continue
+
+            # 디버그 메시지("MPU connected" 등) 걸러내기 및 파싱
+            try:
+                frame_values = list(map(float, raw_line.split(',')))
+            except ValueError:
+                # 숫자로 변환 안 되는 문자열(디버그 메시지 등)은 무시하고 출력만 해봄
+                # print(f"Info: {raw_line}")
+                if metrics is not None:
+                    metrics.parse_error('serial')
+                continue
+
+            if len(frame_values) != 11:
+                if metrics is not None:
+                    metrics.parse_error('serial')
+                continue
+
+            # --- 이하 로직은 기존 UDP 코드와 동일 ---
+            log_sink.write([frame_values], timestamp_ns())
+
+            started = time.perf_counter()
+            feature = features.push(frame_values[2], frame_values[3], frame_values[4])
+            if feature is not None:
+                put_latest(feature_queue, feature)
+
+            if device_metrics is not None:
+                device_metrics.feature_time(time.perf_counter() - started)
+                device_metrics.packet(len(raw_bytes), 1)
+
+        except Exception as e:
+            print(f"오류 발생: {e}")
+            stop_event.set()
+            break
 
 # ---------------------------
 # 시리얼 통신 및 메인 루프
@@ -72,6 +97,7 @@ fig.tight_layout()
 
 # 시리얼 객체 초기화 변수
 ser = None
+stop_event = threading.Event()
 
 try:
     print(f"🔌 {COM_PORT} 포트 연결 시도 중 ({BAUD_RATE}bps)...")
@@ -80,69 +106,41 @@ try:
     ser.reset_input_buffer() # 쌓여있는 이전 데이터 삭제
     print("✅ 시리얼 연결 성공!")
 
+    # 지표 서버는 로그를 열기 전에 시작합니다. (포트 문제로 멈추더라도 열린 로그 파일이 남지 않도록)
+    metrics = start_metrics(METRICS_PORT)
+
     timestamp_start = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"sensor_log_serial_{timestamp_start}.csv"
-    print(f"📝 데이터를 '{filename}' 파일에 저장합니다.")
-
-    with open(filename, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        header = ['lat','lon','ax','ay','az','gx','gy','gz','mx','my','mz', 'timestamp']
-        writer.writerow(header)
-        
-        plt.show(block=False)
-        fig.canvas.draw()
-
-        while True:
-            try:
-                # 시리얼 데이터 한 줄 읽기
-                if ser.in_waiting > 0:
-                    # decode 오류 무시 (errors='ignore')하여 깨진 바이트로 인한 멈춤 방지
-                    raw_line = ser.readline().decode('utf-8', errors='ignore').strip()
-                else:
-                    # 데이터가 없으면 그래프 이벤트 처리 후 계속
-                    fig.canvas.flush_events()
-                    continue
-
-                if not raw_line: continue
-                
-                # 디버그 메시지("MPU connected" 등) 걸러내기 및 파싱
-                try:
-                    frame_values = list(map(float, raw_line.split(',')))
-                except ValueError:
-                    # 숫자로 변환 안 되는 문자열(디버그 메시지 등)은 무시하고 출력만 해봄
-                    # print(f"Info: {raw_line}") 
-                    continue
-
-                if len(frame_values) != 11:
-                    continue
-                
-                # --- 이하 로직은 기존 UDP 코드와 동일 ---
-                timestamp_now = datetime.datetime.now().isoformat()
-                writer.writerow(frame_values + [timestamp_now])
-
-                buffer.append(frame_values)
-                new_data_counter += 1
-
-                if new_data_counter >= STEP_SIZE and len(buffer) >= WINDOW_SIZE:
-                    new_data_counter = 0
-                    window_data = list(buffer)[-WINDOW_SIZE:]
-                    df = pd.DataFrame(window_data, columns=header[:-1])
-                    
-                    z_var, pitch = compute_feature(df)
-                    
-                    if z_var is not None:
-                        z_variances.append(z_var)
-                        mean_pitches.append(pitch)
-                        
-                        line1.set_data(range(len(z_variances)), z_variances)
-                        line2.set_data(range(len(mean_pitches)), mean_pitches)
-
-                        fig.canvas.draw()
-                        fig.canvas.flush_events()
-
-            except Exception as e:
-                print(f"오류 발생: {e}")
+    log_writer = LogWriter()
+    log_writer.start()
+    log_sink = log_writer.open_log(f"sensor_log_serial_{timestamp_start}", LOG_FORMAT)
+    print(f"📝 데이터를 '{log_sink.path}' 파일에 저장합니다.")
+
+    feature_queue = queue.Queue(maxsize=FEATURE_QUEUE_SIZE)
+    if metrics is not None:
+        metrics.track_queue('log_writer', log_writer.backlog)
+        metrics.track_queue('feature', feature_queue.qsize)
+        metrics.track_writer_backlog(COM_PORT, lambda: LogWriter.sink_backlog(log_sink))
+    receiver = threading.Thread(target=receive_loop, args=(ser, log_sink, feature_queue, stop_event, metrics),
+                                daemon=True)
+    receiver.start()
+
+    try:
+        if SHOW_PLOT:
+            plot = FeaturePlot("Real-time Sensor Features (Serial Communication)", GRAPH_WIDTH)
+            run_render_loop(plot, feature_queue, RENDER_FPS, lambda: not stop_event.is_set())
+            if not stop_event.is_set():
+                print("그래프 창이 닫혔습니다. 수신은 계속됩니다 (Ctrl+C로 종료).")
+
+        while receiver.is_alive():
+            receiver.join(timeout=0.5)
+            if not log_writer.healthy(log_sink):
+                print("❌ 로그 기록이 멈췄습니다. 수신을 종료합니다.")
                 break
+    finally:
+        # 수신 스레드를 먼저 멈춘 뒤, 남은 로그를 모두 기록하고 파일을 닫습니다.
+        stop_event.set()
+        receiver.join()
+        log_writer.stop()
 
 except serial.SerialException as e:
     print(f"❌ 시리얼 포트 오류: {e}")
@@ -154,4 +152,4 @@ except KeyboardInterrupt:
 finally:
     if ser is not None and ser.is_open:
         ser.close()
-    print("시리얼 포트가 닫혔습니다.")
\ No newline at end of file
+    print("시리얼 포트가 닫혔습니다.")
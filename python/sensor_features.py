@@ -0,0 +1,179 @@
+# sensor_features.py
+# 실시간 수신기(rt_*, ingest_server)와 분석 스크립트가 공통으로 사용하는 프레임 정의와 특징 추출 함수
+# (윈도우 하나용 pandas 버전, 실시간용 스트리밍 버전, 로그 전체용 벡터화 버전)
+
+import math
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 아두이노가 보내는 한 프레임(11개 값)의 컬럼 순서
+FRAME_COLUMNS = ['lat', 'lon', 'ax', 'ay', 'az', 'gx', 'gy', 'gz', 'mx', 'my', 'mz']
+# 기록할 때 나누는 두 스트림의 컬럼: GPS fix (값이 바뀔 때만) / IMU (매 샘플)
+GPS_COLUMNS = FRAME_COLUMNS[:2]
+IMU_COLUMNS = FRAME_COLUMNS[2:]
+
+# --- 특징 추출 함수 ---
+def compute_feature(window_df):
+    df = window_df.copy()
+    for col in ['ax', 'ay', 'az']:
+        df[f'{col}_smooth'] = df[col].rolling(window=2).mean()
+    df.dropna(inplace=True)
+    if df.empty:
+        return None, None
+    z_acc_var = df['az_smooth'].var()
+    pitch_y_rad = np.mean(np.arctan2(df['ax_smooth'], np.sqrt(df['ay_smooth']**2 + df['az_smooth']**2)))
+    mean_pitch_absolute = np.abs(pitch_y_rad)
+    return z_acc_var, mean_pitch_absolute
+
+
+# --- 스트리밍 특징 추출 (실시간 경로용) ---
+# 샘플이 들어올 때마다 상수 시간에 갱신되며, 결과는 위 compute_feature 와 수치적으로 같습니다.
+#
+# compute_feature 는 윈도우(WINDOW_SIZE 개) 안에서 2개 이동평균을 구하므로 윈도우마다 평활값이 WINDOW_SIZE - 1 개 생깁니다.
+# 이 평활값은 연속된 두 샘플에만 의존하므로, 새 샘플이 올 때마다 평활값 하나를 링 버퍼에 넣고 가장 오래된 값을 빼면 됩니다.
+# - z_variance: 평활된 az 의 표본분산 (Welford 방식의 이동 평균/제곱편차합)
+# - mean_pitch: 평활된 가속도로 구한 pitch 의 평균의 절댓값 (이동 합)
+
+# 누적 오차가 쌓이지 않도록 이 샘플 수마다 링 버퍼에서 합계를 다시 계산합니다.
+RESYNC_INTERVAL = 1000
+
+
+class StreamingFeatures:
+    """
+    WINDOW_SIZE / STEP_SIZE 슬라이딩 윈도우 특징을 샘플 단위로 갱신합니다.
+    특징 추출 시점(STEP_SIZE 샘플마다, 윈도우가 찬 뒤)은 기존 수신기의 buffer / new_data_counter 로직과 같습니다.
+    """
+
+    def __init__(self, window_size, step_size):
+        if window_size < 2:
+            raise ValueError("window_size 는 2 이상이어야 합니다")
+        self.window_size = window_size
+        self.step_size = step_size
+        self._n = window_size - 1
+        # 열 0: 평활된 az, 열 1: 평활된 가속도로 구한 pitch (rad)
+        self._ring = np.zeros((self._n, 2))
+        self._pos = 0
+        self._filled = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._pitch_sum = 0.0
+        self._prev = None
+        self._since_resync = 0
+
+        self.sample_count = 0
+        self.new_data_counter = 0
+
+    def push(self, ax, ay, az):
+        """샘플 하나를 넣습니다. 특징 추출 시점이면 (z_variance, mean_pitch) 를, 아니면 None 을 반환합니다."""
+        prev = self._prev
+        if prev is not None:
+            ax_s = (prev[0] + ax) / 2
+            ay_s = (prev[1] + ay) / 2
+            az_s = (prev[2] + az) / 2
+            self._add(az_s, math.atan2(ax_s, math.sqrt(ay_s ** 2 + az_s ** 2)))
+        self._prev = (ax, ay, az)
+
+        self.sample_count += 1
+        self.new_data_counter += 1
+        if self.new_data_counter >= self.step_size and self.sample_count >= self.window_size:
+            self.new_data_counter = 0
+            return self.feature()
+        return None
+
+    def push_block(self, values):
+        """(샘플 수, 11) 블록을 순서대로 넣고, 그 사이에 나온 특징들을 목록으로 반환합니다."""
+        features = []
+        for ax, ay, az in np.asarray(values)[:, 2:5].tolist():
+            feature = self.push(ax, ay, az)
+            if feature is not None:
+                features.append(feature)
+        return features
+
+    def _add(self, z, pitch):
+        ring = self._ring
+        if self._filled < self._n:
+            self._filled += 1
+            delta = z - self._mean
+            self._mean += delta / self._filled
+            self._m2 += delta * (z - self._mean)
+            self._pitch_sum += pitch
+        else:
+            old_z, old_pitch = ring[self._pos]
+            new_mean = self._mean + (z - old_z) / self._n
+            self._m2 += (z - old_z) * (z - new_mean + old_z - self._mean)
+            self._mean = new_mean
+            self._pitch_sum += pitch - old_pitch
+        ring[self._pos, 0] = z
+        ring[self._pos, 1] = pitch
+        self._pos = (self._pos + 1) % self._n
+
+        self._since_resync += 1
+        if self._since_resync >= RESYNC_INTERVAL and self._filled == self._n:
+            self._resync()
+
+    def _resync(self):
+        z = self._ring[:, 0]
+        self._mean = z.mean()
+        self._m2 = ((z - self._mean) ** 2).sum()
+        self._pitch_sum = self._ring[:, 1].sum()
+        self._since_resync = 0
+
+    def feature(self):
+        """현재 윈도우의 (z_variance, mean_pitch). 평활값이 없으면 (None, None)."""
+        if self._filled == 0:
+            return None, None
+        z_var = max(self._m2, 0.0) / (self._filled - 1) if self._filled > 1 else float('nan')
+        return z_var, abs(self._pitch_sum / self._filled)
+
+
+# --- 로그 전체 윈도우 특징 추출 (분석 스크립트용) ---
+def window_features(df, window_size, step_size, lat_col='lat', lon_col='lon'):
+    """
+    로그 전체의 슬라이딩 윈도우 특징을 한 번에 계산합니다.
+    기존 analyze_log_file 의 루프(윈도우마다 iloc -> rolling(2).mean() -> dropna -> var/arctan2/median)와 같은 결과를
+    sliding_window_view 로 모든 윈도우에 대해 동시에 구합니다.
+
+    윈도우 시작 위치는 range(0, len(df) - window_size, step_size) 이고, 윈도우마다 첫 행은 평활값이 없어 빠지므로
+    나머지 window_size - 1 개 행으로 z_variance, mean_pitch, lat/lon 중앙값을 계산합니다.
+    """
+    columns = ['z_variance', 'mean_pitch', 'lat', 'lon']
+    starts = np.arange(0, len(df) - window_size, step_size)
+    if len(starts) == 0 or window_size < 2:
+        return pd.DataFrame(columns=columns)
+
+    acc = df[['ax', 'ay', 'az']].to_numpy(dtype=np.float64)
+    # smooth[k] 는 (k+1)번째 행의 2개 이동평균
+    smooth = (acc[1:] + acc[:-1]) / 2
+    pitch = np.arctan2(smooth[:, 0], np.sqrt(smooth[:, 1] ** 2 + smooth[:, 2] ** 2))
+    lat = df[lat_col].to_numpy(dtype=np.float64)[1:]
+    lon = df[lon_col].to_numpy(dtype=np.float64)[1:]
+
+    # 기존 dropna 와 같게: 그 행의 어느 컬럼이든 비어 있거나, 직전 행의 가속도가 비어 있으면 그 행은 빠집니다.
+    row_valid = df.notna().all(axis=1).to_numpy()
+    acc_valid = ~np.isnan(acc).any(axis=1)
+    valid = row_valid[1:] & acc_valid[:-1]
+
+    def windows(values, starts):
+        return sliding_window_view(values, window_size - 1)[starts]
+
+    if valid.all():
+        z_variance = windows(smooth[:, 2], starts).var(axis=1, ddof=1)
+        mean_pitch = np.abs(windows(pitch, starts).mean(axis=1))
+        lat_median = np.median(windows(lat, starts), axis=1)
+        lon_median = np.median(windows(lon, starts), axis=1)
+    else:
+        # 빈 행이 있으면 NaN 으로 가리고 nan 함수로 계산합니다. 유효한 행이 하나도 없는 윈도우는 건너뜁니다.
+        counts = windows(valid, starts).sum(axis=1)
+        starts, counts = starts[counts > 0], counts[counts > 0]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            az_w = windows(np.where(valid, smooth[:, 2], np.nan), starts)
+            az_mean = np.nanmean(az_w, axis=1, keepdims=True)
+            z_variance = np.nansum((az_w - az_mean) ** 2, axis=1) / (counts - 1)
+            z_variance[counts < 2] = np.nan
+            mean_pitch = np.abs(np.nanmean(windows(np.where(valid, pitch, np.nan), starts), axis=1))
+            lat_median = np.nanmedian(windows(np.where(valid, lat, np.nan), starts), axis=1)
+            lon_median = np.nanmedian(windows(np.where(valid, lon, np.nan), starts), axis=1)
+
+    return pd.DataFrame({'z_variance': z_variance, 'mean_pitch': mean_pitch, 'lat': lat_median, 'lon': lon_median})
@@ -0,0 +1,256 @@
+# sensor_log.py
+# 센서 로그(CSV / Parquet / 세션 파일)를 읽는 공용 로더와, Parquet 로그를 기존 CSV 형식으로 내보내는 변환기
+# 분석 스크립트는 파일 형식과 상관없이 load_sensor_log() 로 필요한 컬럼만 읽습니다.
+# IMU / GPS fix 스트림이 나뉘어 기록된 로그는 lat/lon 을 요청하면 GPS fix 를 as-of 결합으로 붙여서 돌려줍니다.
+#
+# 사용법: python sensor_log.py sensor_log_xxx.parquet (또는 .bin) [출력.csv]
+
+import argparse
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from gps_fixes import join_positions
+from log_writer import GPS_LOG_SUFFIX, ns_to_datetime
+from sensor_features import GPS_COLUMNS
+from session_store import META_COLUMNS, open_session, records_to_frame, to_timestamp_ns
+
+# ---------------------------
+# 설정
+# ---------------------------
+# 로그를 나눠 읽을 때(CSV 내보내기, 손실 분석 등) 한 번에 읽는 행 수 (긴 로그도 메모리에 통째로 올리지 않습니다)
+EXPORT_BATCH_ROWS = 100_000
+
+# IMU 행에 GPS fix 를 as-of 결합할 기준 열. 두 스트림 모두 값이 빠짐없이 있고 오름차순인 첫 열을 씁니다.
+# 배치 프레임은 한 블록의 샘플이 모두 같은 수신 시각(timestamp_ns)을 가지므로, 장치 seq / device_ms 가 있으면 그것으로 결합합니다.
+# (seq 가 없는 예전 텍스트 로그나, 중간에 장치가 재시작되어 seq 가 되돌아간 로그는 수신 시각으로 결합)
+GPS_JOIN_COLUMNS = ['seq', 'device_ms', 'timestamp_ns']
+
+
+def is_parquet(path):
+    return os.path.splitext(path)[1].lower() in ('.parquet', '.pq')
+
+
+def is_session(path):
+    return os.path.splitext(path)[1].lower() == '.bin'
+
+
+def gps_log_path(path):
+    """IMU 로그와 함께 기록된 GPS fix 로그 경로. (sensor_log_xxx.bin -> sensor_log_xxx_gps.bin)"""
+    stem, ext = os.path.splitext(path)
+    return stem + GPS_LOG_SUFFIX + ext
+
+
+def has_gps_log(path):
+    """lat/lon 이 빠진 IMU 로그이고, 짝이 되는 GPS fix 로그가 있으면 True."""
+    return os.path.exists(gps_log_path(path)) and not set(GPS_COLUMNS) <= set(log_columns(path))
+
+
+def log_columns(path):
+    """로그 파일에 들어 있는 컬럼 이름 목록을 (데이터를 읽지 않고) 반환합니다."""
+    if is_session(path):
+        return open_session(path).value_columns + META_COLUMNS
+    if is_parquet(path):
+        return pq.read_schema(path).names
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def load_sensor_log(path, columns=None, parse_timestamps=False, t0=None, t1=None):
+    """
+    센서 로그를 DataFrame 으로 읽습니다.
+    columns 를 주면 그 중 파일에 있는 컬럼만 읽습니다. (Parquet 은 나머지 컬럼을 디스크에서 읽지도 않습니다)
+    parse_timestamps=True 이면 'timestamp' 컬럼을 datetime 으로 만들어 줍니다.
+    (새 로그의 정수 나노초 'timestamp_ns' 와 예전 로그의 isoformat 문자열 'timestamp' 를 모두 지원)
+    t0, t1 을 주면 수신 시각이 [t0, t1) 인 행만 남깁니다. (세션 파일은 그 구간만, Parquet 은 해당 row group 만 읽음)
+    """
+    plan = _read_plan(path, columns, parse_timestamps, t0, t1)
+    t0, t1 = plan['t0'], plan['t1']
+
+    if is_session(path):
+        df = records_to_frame(open_session(path).slice(t0, t1), plan['read_columns'])
+    elif is_parquet(path):
+        filters = [('timestamp_ns', op, t) for op, t in (('>=', t0), ('<', t1)) if t is not None]
+        df = pd.read_parquet(path, columns=plan['read_columns'], filters=filters or None)
+    else:
+        df = pd.read_csv(path, usecols=plan['read_columns'])
+    return _finish_frame(df, path, plan)
+
+
+def iter_sensor_log(path, chunk_rows=EXPORT_BATCH_ROWS, columns=None, parse_timestamps=False, t0=None, t1=None):
+    """
+    load_sensor_log 와 같은 결과를 chunk_rows 행 안팎의 DataFrame 조각으로 나눠 돌려줍니다. (조각을 이어 붙이면 같은 표)
+    파일 전체를 메모리에 올리지 않으므로 메모리보다 큰 로그도 처리할 수 있습니다.
+    """
+    plan = _read_plan(path, columns, parse_timestamps, t0, t1)
+    t0, t1 = plan['t0'], plan['t1']
+
+    if is_session(path):
+        records = open_session(path).slice(t0, t1)
+        chunks = (records_to_frame(records[start:start + chunk_rows], plan['read_columns'])
+                  for start in range(0, len(records), chunk_rows))
+    elif is_parquet(path):
+        time_filter = None
+        for op, t in (('>=', t0), ('<', t1)):
+            if t is not None:
+                expr = ds.field('timestamp_ns') >= t if op == '>=' else ds.field('timestamp_ns') < t
+                time_filter = expr if time_filter is None else time_filter & expr
+        batches = ds.dataset(path, format='parquet').to_batches(columns=plan['read_columns'], filter=time_filter,
+                                                                 batch_size=chunk_rows)
+        chunks = (batch.to_pandas() for batch in batches if batch.num_rows)
+    else:
+        chunks = pd.read_csv(path, usecols=plan['read_columns'], chunksize=chunk_rows)
+
+    fixes = load_gps_fixes(path) if plan['attach_gps'] else None
+    for df in chunks:
+        df = _finish_frame(df, path, plan, fixes)
+        if len(df):
+            yield df
+
+
+def _read_plan(path, columns, parse_timestamps, t0, t1):
+    """load_sensor_log / iter_sensor_log 가 공통으로 쓰는 읽기 설정 (읽을 컬럼, 시간 구간, GPS 결합 여부)."""
+    plan = {'columns': columns, 'parse_timestamps': parse_timestamps,
+            't0': to_timestamp_ns(t0), 't1': to_timestamp_ns(t1), 'read_columns': None, 'wanted': None}
+    plan['time_filtered'] = plan['t0'] is not None or plan['t1'] is not None
+    plan['attach_gps'] = (columns is None or any(col in columns for col in GPS_COLUMNS)) and has_gps_log(path)
+
+    if columns is not None:
+        wanted = list(columns)
+        if parse_timestamps or plan['time_filtered']:
+            wanted += ['timestamp', 'timestamp_ns']
+        available = set(log_columns(path))
+        read_columns = list(dict.fromkeys(col for col in wanted if col in available))
+        if plan['attach_gps']:
+            read_columns += [col for col in GPS_JOIN_COLUMNS if col in available and col not in read_columns]
+        plan['wanted'], plan['read_columns'] = wanted, read_columns
+    return plan
+
+
+def _finish_frame(df, path, plan, fixes=None):
+    """읽은 표(또는 조각)에 시각 변환, CSV 시간 구간 필터, GPS fix 결합을 적용합니다."""
+    t0, t1 = plan['t0'], plan['t1']
+    # 세션 파일과 Parquet 은 읽을 때 이미 시간 구간이 걸러져 있습니다. CSV 는 시간 구간 인덱스가 없으므로 읽은 뒤에 걸러냅니다.
+    csv_filter = plan['time_filtered'] and not (is_session(path) or is_parquet(path))
+
+    if plan['parse_timestamps'] or csv_filter:
+        if 'timestamp_ns' in df.columns:
+            df['timestamp'] = ns_to_datetime(df['timestamp_ns'])
+        elif 'timestamp' in df.columns:
+            df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601')
+    if csv_filter:
+        mask = pd.Series(True, index=df.index)
+        if t0 is not None:
+            mask &= df['timestamp'] >= ns_to_datetime(pd.Series([t0])).iloc[0]
+        if t1 is not None:
+            mask &= df['timestamp'] < ns_to_datetime(pd.Series([t1])).iloc[0]
+        df = df[mask].reset_index(drop=True)
+
+    if plan['attach_gps']:
+        attach_gps_fixes(df, fixes if fixes is not None else load_gps_fixes(path))
+        if plan['columns'] is not None:
+            df = df.drop(columns=[col for col in GPS_JOIN_COLUMNS if col in df.columns and col not in plan['wanted']])
+    return df
+
+
+def load_gps_fixes(path):
+    """IMU 로그와 짝이 되는 GPS fix 로그(결합 기준 열, lat, lon)를 읽습니다. fix 는 약 1초에 하나라 통째로 읽어도 작습니다."""
+    return load_sensor_log(gps_log_path(path), columns=GPS_JOIN_COLUMNS + GPS_COLUMNS)
+
+
+def gps_join_keys(df, fixes):
+    """GPS_JOIN_COLUMNS 중 결합에 쓸 수 있는 첫 열로 (IMU 행 키, fix 키) int64 배열 쌍을 만듭니다."""
+    for col in GPS_JOIN_COLUMNS:
+        if col not in df.columns or col not in fixes.columns:
+            continue
+        if df[col].isna().any() or fixes[col].isna().any():
+            continue
+        keys = df[col].to_numpy(dtype='int64')
+        fix_keys = fixes[col].to_numpy(dtype='int64')
+        if (np.diff(keys) >= 0).all() and (np.diff(fix_keys) >= 0).all():
+            return keys, fix_keys
+    raise ValueError("IMU 로그와 GPS fix 로그를 결합할 공통 열(seq / device_ms / timestamp_ns)이 없습니다")
+
+
+def attach_gps_fixes(df, fixes):
+    """
+    IMU 행마다 그 행 이전(같은 행 포함)의 마지막 GPS fix 를 lat/lon 컬럼으로 붙입니다. (as-of 결합, 제자리 수정)
+    장치 seq(없으면 device_ms, 그것도 없으면 수신 시각) 기준이라, 배치 블록 중간에 fix 가 바뀌어도 그 샘플부터 새 fix 가 붙습니다.
+    첫 fix 보다 먼저 기록된 행은 NaN 입니다.
+    """
+    keys, fix_keys = gps_join_keys(df, fixes)
+    positions = join_positions(keys, fix_keys, fixes[GPS_COLUMNS].to_numpy(dtype='float64'), method='asof')
+    for i, col in enumerate(GPS_COLUMNS):
+        df.insert(i, col, positions[:, i])
+    return df
+
+
+def iter_log_chunks(path, chunk_rows=EXPORT_BATCH_ROWS, columns=None):
+    """
+    로그를 chunk_rows 행씩 DataFrame 으로 나눠 읽습니다. (파일 전체를 메모리에 올리지 않음)
+    columns 를 주면 그 중 파일에 있는 컬럼만 읽습니다.
+    """
+    if columns is not None:
+        available = set(log_columns(path))
+        columns = [col for col in columns if col in available]
+
+    if is_session(path):
+        records = open_session(path).records
+        for start in range(0, len(records), chunk_rows):
+            yield records_to_frame(records[start:start + chunk_rows], columns)
+    elif is_parquet(path):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+
+
+def timestamps_ns(df):
+    """
+    DataFrame 의 수신 시각을 정수 나노초 배열로 반환합니다.
+    예전 로그의 isoformat 문자열 'timestamp' 는 로컬 시각으로 해석합니다. (ns_to_datetime 의 역변환)
+    """
+    if 'timestamp_ns' in df.columns:
+        return df['timestamp_ns'].to_numpy(dtype='int64')
+    local_tz = datetime.datetime.now().astimezone().tzinfo
+    return pd.to_datetime(df['timestamp'], format='ISO8601').dt.tz_localize(local_tz).to_numpy(dtype='datetime64[ns]').view('int64')
+
+
+def to_csv(log_path, csv_path=None):
+    """
+    Parquet / 세션 로그를 기존 도구가 읽던 CSV 형식으로 내보냅니다.
+    나눠서 읽으며 변환하고, 수신 시각(timestamp_ns)은 이때 isoformat 문자열 'timestamp' 로 바꿉니다.
+    """
+    if csv_path is None:
+        csv_path = os.path.splitext(log_path)[0] + '.csv'
+
+    # IMU / GPS 가 나뉜 로그는 기존 형식처럼 행마다 lat/lon 을 다시 붙여서 내보냅니다.
+    fixes = load_gps_fixes(log_path) if has_gps_log(log_path) else None
+
+    header = True
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        for df in iter_log_chunks(log_path):
+            if fixes is not None:
+                attach_gps_fixes(df, fixes)
+            if 'timestamp_ns' in df.columns:
+                df.insert(df.columns.get_loc('timestamp_ns'), 'timestamp',
+                          ns_to_datetime(df['timestamp_ns']).dt.strftime('%Y-%m-%dT%H:%M:%S.%f'))
+                df = df.drop(columns='timestamp_ns')
+            for col in ('seq', 'device_ms'):
+                if col in df.columns:
+                    df[col] = df[col].astype('Int64')
+            df.to_csv(f, index=False, header=header)
+            header = False
+    return csv_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parquet / 세션(.bin) 센서 로그를 CSV 로 내보냅니다.")
+    parser.add_argument('log_path')
+    parser.add_argument('csv_path', nargs='?')
+    args = parser.parse_args()
+    out_path = to_csv(args.log_path, args.csv_path)
+    print(f"✅ '{out_path}' 파일로 내보냈습니다.")
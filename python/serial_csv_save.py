@@ -1,7 +1,8 @@
 import serial
-import csv
 import time
 
+from log_writer import LogWriter, timestamp_ns
+
 # 시리얼 포트와 속도 설정
 SERIAL_PORT = "/dev/cu.usbmodem1051DB2BD6FC2"  # 예: Windows는 "COM3", Mac은 "/dev/tty.usbmodemXXXX"
 BAUD_RATE = 115200
@@ -14,30 +15,37 @@ def main():
     ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
     time.sleep(2)  # 시리얼 안정화 대기
 
-    # CSV 파일 열기
-    with open(CSV_FILE, mode="w", newline="") as file:
-        writer = csv.writer(file)
-
-        # 헤더 작성
-        header = ["latitude", "longitude",
-                  "accelX", "accelY", "accelZ",
-                  "gyroX", "gyroY", "gyroZ",
-                  "magX", "magY", "magZ"]
-        writer.writerow(header)
-
-        print("데이터 수집 시작... (Ctrl+C로 종료)")
-
-        try:
-            while True:
-                line = ser.readline().decode("utf-8").strip()
-                if line:
-                    values = line.split(",")
-                    if len(values) == 11:
-                        writer.writerow(values)
-                        file.flush()
-                        print(values)
-        except KeyboardInterrupt:
-            print("데이터 수집 종료")
+    # 파일 쓰기는 LogWriter 스레드가 모아서 처리합니다 (행마다 flush 하지 않음).
+    log_writer = LogWriter()
+    log_writer.start()
+
+    # 헤더 작성 (뒤에 timestamp_ns, seq, device_ms 컬럼이 자동으로 붙습니다)
+    header = ["latitude", "longitude",
+              "accelX", "accelY", "accelZ",
+              "gyroX", "gyroY", "gyroZ",
+              "magX", "magY", "magZ"]
+    log_sink = log_writer.open_csv(CSV_FILE, header)
+
+    print("데이터 수집 시작... (Ctrl+C로 종료)")
+
+    try:
+        while True:
+            line = ser.readline().decode("utf-8").strip()
+            if line:
+                values = line.split(",")
+                if len(values) == 11:
+                    try:
+                        log_sink.write([list(map(float, values))], timestamp_ns())
+                    except ValueError:
+                        continue
+                    print(values)
+                if not log_writer.healthy(log_sink):
+                    print("❌ 로그 기록이 멈췄습니다. 수집을 종료합니다.")
+                    break
+    except KeyboardInterrupt:
+        print("데이터 수집 종료")
+    finally:
+        log_writer.stop()
 
     ser.close()
 
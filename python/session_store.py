@@ -0,0 +1,156 @@
+# session_store.py
+# 고정 길이 레코드로 된 바이너리 세션 파일(.bin)과 시각 인덱스(.idx) 정의, 그리고 시간 구간 조회용 리더
+# 수 GB 짜리 긴 기록에서도 원하는 시간 구간만 np.memmap 뷰로 꺼내 볼 수 있습니다. (나머지 부분은 읽지 않음)
+#
+# 사용 예:
+#     session = open_session('sensor_log_7_2025-09-26_03-40-56.bin')
+#     records = session.slice('2025-09-26 03:45:00', '2025-09-26 03:46:30')   # 복사 없는 memmap 뷰
+#     df = records_to_frame(records)                                          # 이 구간만 DataFrame 으로
+
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+
+from sensor_features import FRAME_COLUMNS, GPS_COLUMNS, IMU_COLUMNS
+
+# ---------------------------
+# 파일 형식 정의 (리틀 엔디언, 패딩 없음)
+# ---------------------------
+SESSION_MAGIC = b'HKSS'
+SESSION_VERSION = 1
+
+# 파일 맨 앞의 헤더. 레코드 크기를 같이 적어 두어 형식이 바뀐 파일을 잘못 읽지 않도록 합니다.
+SESSION_HEADER_DTYPE = np.dtype([('magic', 'S4'), ('version', '<u2'), ('record_size', '<u2'), ('reserved', '<u8')])
+
+# 레코드 하나 = 샘플 하나. seq/device_ms 가 없는 텍스트 프레임은 -1 로 기록합니다.
+META_COLUMNS = ['timestamp_ns', 'seq', 'device_ms']
+
+
+def record_dtype(value_columns=FRAME_COLUMNS):
+    """값 컬럼 목록에 맞는 레코드 형식. 수신 시각/seq/device_ms 는 int64, lat/lon 은 float64, IMU 값은 float32."""
+    return np.dtype([(col, '<i8') for col in META_COLUMNS] +
+                    [(col, '<f8' if col in GPS_COLUMNS else '<f4') for col in value_columns])
+
+
+RECORD_DTYPE = record_dtype(FRAME_COLUMNS)   # 76 바이트 (한 프레임 전체)
+
+# 파일에 기록될 수 있는 레코드 형식들. 헤더의 record_size 로 구분합니다.
+# (프레임 전체 76 바이트 / GPS 를 뺀 IMU 스트림 60 바이트 / GPS fix 스트림 40 바이트)
+RECORD_LAYOUTS = {record_dtype(columns).itemsize: list(columns) for columns in (FRAME_COLUMNS, IMU_COLUMNS, GPS_COLUMNS)}
+
+# 사이드카 인덱스: (수신 시각, 레코드 번호) 쌍. 시각이 INDEX_INTERVAL_NS 이상 지날 때마다 한 줄씩 추가합니다.
+INDEX_DTYPE = np.dtype([('timestamp_ns', '<i8'), ('record', '<i8')])
+INDEX_INTERVAL_NS = 1_000_000_000
+
+MISSING = -1
+
+
+def index_path(path):
+    return os.path.splitext(path)[0] + '.idx'
+
+
+def make_header(value_columns=FRAME_COLUMNS):
+    header = np.zeros(1, dtype=SESSION_HEADER_DTYPE)
+    header['magic'] = SESSION_MAGIC
+    header['version'] = SESSION_VERSION
+    header['record_size'] = record_dtype(value_columns).itemsize
+    return header
+
+
+def make_records(values, timestamp, seq=None, device_ms=None, value_columns=FRAME_COLUMNS):
+    """(샘플 수, 값 개수) 블록을 레코드 배열로 변환합니다. (LogWriter 의 세션 싱크가 사용)"""
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    records = np.empty(len(values), dtype=record_dtype(value_columns))
+    records['timestamp_ns'] = timestamp
+    records['seq'] = seq if seq is not None else MISSING
+    records['device_ms'] = device_ms if device_ms is not None else MISSING
+    for i, col in enumerate(value_columns):
+        records[col] = values[:, i]
+    return records
+
+
+def to_timestamp_ns(t):
+    """
+    조회 시각을 정수 나노초로 변환합니다.
+    정수는 그대로, 문자열/datetime 은 (시간대가 없으면) 로그와 같은 로컬 시각으로 해석합니다.
+    """
+    if t is None or isinstance(t, (int, np.integer)):
+        return t
+    t = pd.Timestamp(t)
+    if t.tzinfo is None:
+        t = t.tz_localize(datetime.datetime.now().astimezone().tzinfo)
+    return t.value
+
+
+# ---------------------------
+# 리더
+# ---------------------------
+class SessionFile:
+    """세션 파일 하나를 memmap 으로 엽니다. 레코드는 실제로 접근한 페이지만 디스크에서 읽힙니다."""
+
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=SESSION_HEADER_DTYPE, count=1)
+        if len(header) == 0 or header[0]['magic'] != SESSION_MAGIC:
+            raise ValueError(f"세션 파일 형식이 아닙니다: {path}")
+        if header[0]['version'] != SESSION_VERSION or header[0]['record_size'] not in RECORD_LAYOUTS:
+            raise ValueError(f"지원하지 않는 세션 파일 버전입니다: {header[0]['version']}")
+        self.value_columns = RECORD_LAYOUTS[int(header[0]['record_size'])]
+        dtype = record_dtype(self.value_columns)
+
+        # 기록 도중 끊긴 파일이면 마지막의 불완전한 레코드는 무시합니다.
+        count = (os.path.getsize(path) - SESSION_HEADER_DTYPE.itemsize) // dtype.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=dtype, mode='r',
+                                     offset=SESSION_HEADER_DTYPE.itemsize, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=dtype)
+
+        idx_path = index_path(path)
+        index = np.fromfile(idx_path, dtype=INDEX_DTYPE) if os.path.exists(idx_path) else np.zeros(0, dtype=INDEX_DTYPE)
+        self.index = index[index['record'] < count]
+
+    def __len__(self):
+        return len(self.records)
+
+    def _bounds(self, t):
+        """t 이상인 첫 레코드 위치를 찾습니다. 인덱스로 범위를 좁힌 뒤 그 구간의 시각만 이진 탐색합니다."""
+        lo, hi = 0, len(self.records)
+        if len(self.index):
+            pos = np.searchsorted(self.index['timestamp_ns'], t, side='left')
+            if pos > 0:
+                lo = int(self.index['record'][pos - 1])
+            if pos < len(self.index):
+                hi = int(self.index['record'][pos])
+        return lo + int(np.searchsorted(self.records['timestamp_ns'][lo:hi], t, side='left'))
+
+    def slice(self, t0=None, t1=None):
+        """[t0, t1) 구간의 레코드를 복사 없는 memmap 뷰로 반환합니다. None 이면 처음/끝까지."""
+        t0, t1 = to_timestamp_ns(t0), to_timestamp_ns(t1)
+        start = self._bounds(t0) if t0 is not None else 0
+        stop = self._bounds(t1) if t1 is not None else len(self.records)
+        return self.records[start:max(start, stop)]
+
+
+def open_session(path):
+    return SessionFile(path)
+
+
+def records_to_frame(records, columns=None):
+    """
+    레코드 배열을 분석 스크립트가 쓰는 DataFrame(로그 컬럼 순서)으로 변환합니다. 이때 처음으로 복사가 일어납니다.
+    columns 를 주면 그 컬럼만 꺼냅니다.
+    """
+    df = pd.DataFrame(index=pd.RangeIndex(len(records)))
+    value_columns = [col for col in records.dtype.names if col not in META_COLUMNS]
+    for col in value_columns + META_COLUMNS:
+        if columns is not None and col not in columns:
+            continue
+        values = np.asarray(records[col])
+        if col in ('seq', 'device_ms'):
+            df[col] = pd.arrays.IntegerArray(values.copy(), values == MISSING)
+        else:
+            df[col] = values
+    return df
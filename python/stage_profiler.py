@@ -0,0 +1,330 @@
+# stage_profiler.py
+# 분석 파이프라인 단계별 계측: 단계마다 걸린 시간, CPU 시간, 최대 메모리(RSS) 증가량, 처리 행 수를 기록합니다.
+# 분석이 느릴 때 CSV 읽기 / 칼만 필터 / 윈도우 특징 / 클러스터링 / folium 지도 중 어디가 문제인지 보기 위한 용도입니다.
+#
+# - 단계 함수에는 @stage 데코레이터를, 함수 안의 세부 구간에는 with span('이름'): 을 씁니다. (안쪽 구간은 바깥 단계의 자식)
+# - enable() 을 부르기 전에는 아무것도 재지 않습니다. 이때 데코레이터는 전역 변수 하나만 확인하고 원래 함수를 부릅니다.
+# - 결과는 finish() 에서 JSON 기록 파일(또는 chrome://tracing / Perfetto 에서 여는 Chrome trace 형식)로 저장하고 요약을 출력합니다.
+# - cprofile_path 를 주면 단계가 실행되는 동안만 cProfile 로 함수별 시간을 재서 저장합니다. (python -m pstats / snakeviz 로 열기)
+# - 최대 메모리는 리눅스의 최대 RSS 기록(VmHWM)을 구간마다 되돌려서 잽니다. 다른 OS 에서는 프로세스 전체의 최대 RSS 입니다.
+#   (맥: resource 모듈, 윈도우: psutil 의 최대 작업 집합. 둘 다 없으면 메모리는 0 으로 기록됩니다)
+# - 메인 스레드에서 차례로 실행되는 단계를 재는 용도입니다. (여러 스레드에서 동시에 구간을 열면 부모/자식 관계가 섞입니다)
+#
+# 사용법 (분석 스크립트의 PROFILE_TRACE_PATH 설정, 또는 직접):
+#     stage_profiler.enable('profile_trace.json', chrome=False, cprofile_path='profile.prof')
+#     ... 분석 ...
+#     stage_profiler.finish()
+
+import cProfile
+import functools
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:   # 윈도우에는 resource 모듈이 없습니다.
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# ---------------------------
+# 설정
+# ---------------------------
+# Chrome trace 에 단계 구간과 함께 RSS 변화를 카운터 그래프로 넣습니다.
+CHROME_RSS_COUNTER = True
+
+
+# ---------------------------
+# 메모리 (RSS)
+# ---------------------------
+def _read_rss_kb(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return None
+
+
+def reset_peak_rss():
+    """최대 RSS 기록을 지금 RSS 로 되돌립니다. (리눅스만 가능, 아니면 False)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """지금까지(reset_peak_rss 이후)의 최대 RSS (MB)."""
+    try:
+        return _read_rss_kb('VmHWM') / 1024
+    except (OSError, TypeError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / (1024 if sys.platform == 'darwin' else 1)
+    if psutil is not None:
+        memory = psutil.Process().memory_info()
+        return getattr(memory, 'peak_wset', memory.rss) / 1024 / 1024
+    return 0.0
+
+
+def current_rss_mb():
+    try:
+        return _read_rss_kb('VmRSS') / 1024
+    except (OSError, TypeError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    return peak_rss_mb()
+
+
+def _table_rows(value):
+    """표/배열이면 첫 번째 차원 길이, 아니면 None."""
+    shape = getattr(value, 'shape', None)
+    return int(shape[0]) if shape else None
+
+
+def _count_rows(value):
+    """행 수로 받은 값: 정수는 그대로, 표/배열은 행 수, 그 밖에는 None."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return _table_rows(value)
+
+
+# ---------------------------
+# 구간 기록
+# ---------------------------
+class Span:
+    """열려 있는 구간 하나. rows 는 구간 안에서 직접 정할 수도 있습니다. (with span(...) as s: s.rows = len(df))"""
+
+    __slots__ = ('name', 'rows', 'depth', 'parent', 'start', 'cpu_start', 'rss_start', 'peak')
+
+    def __init__(self, name, rows, depth, parent):
+        self.name = name
+        self.rows = rows
+        self.depth = depth
+        self.parent = parent
+        self.start = self.cpu_start = self.rss_start = self.peak = None
+
+
+class _NullSpan:
+    """계측이 꺼져 있을 때 span() 이 돌려주는 빈 구간. (rows 를 정해도 무시)"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class StageProfiler:
+    """구간을 열고 닫으며 기록을 모읍니다. 보통은 모듈 함수 enable() / stage / span / finish() 로 씁니다."""
+
+    def __init__(self, trace_path=None, chrome=False, cprofile_path=None):
+        self.trace_path = trace_path
+        self.chrome = chrome
+        self.cprofile_path = cprofile_path
+        self.profile = cProfile.Profile() if cprofile_path else None
+        # 최대 RSS 를 구간마다 되돌릴 수 있어야 구간별 최대 메모리를 잴 수 있습니다.
+        self.peak_resettable = reset_peak_rss()
+        self.records = []
+        self.stack = []
+        self.t0 = time.perf_counter()
+        self.created = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+    def open(self, name, rows=None):
+        parent = self.stack[-1] if self.stack else None
+        span = Span(name, rows, len(self.stack), parent.name if parent else None)
+        if self.peak_resettable:
+            # 자식 구간이 최대 RSS 기록을 되돌리기 전에, 지금까지의 최대값을 열려 있는 바깥 구간들에 넘겨 둡니다.
+            peak = peak_rss_mb()
+            for outer in self.stack:
+                outer.peak = max(outer.peak, peak)
+            reset_peak_rss()
+        span.rss_start = current_rss_mb()
+        span.peak = span.rss_start
+        if self.profile is not None and not self.stack:
+            self.profile.enable()
+        self.stack.append(span)
+        span.cpu_start = time.process_time()
+        span.start = time.perf_counter()
+        return span
+
+    def close(self, span, error=None):
+        end = time.perf_counter()
+        cpu = time.process_time() - span.cpu_start
+        self.stack.pop()
+        if self.profile is not None and not self.stack:
+            self.profile.disable()
+        span.peak = max(span.peak, peak_rss_mb())
+        if self.stack:
+            self.stack[-1].peak = max(self.stack[-1].peak, span.peak)
+        wall = end - span.start
+        rows = _count_rows(span.rows)
+        self.records.append({
+            'name': span.name, 'parent': span.parent, 'depth': span.depth,
+            'start_s': span.start - self.t0, 'wall_s': wall, 'cpu_s': cpu,
+            'rows': rows, 'rows_per_s': rows / wall if rows and wall > 0 else None,
+            'rss_start_mb': span.rss_start, 'peak_rss_mb': span.peak, 'peak_delta_mb': span.peak - span.rss_start,
+            'error': error,
+        })
+
+    def summary(self):
+        """단계 이름별 합계 (처음 실행된 순서): 호출 수, 시간, CPU 시간, 행 수, 최대 메모리 증가량."""
+        stages = {}
+        for record in sorted(self.records, key=lambda r: r['start_s']):
+            total = stages.setdefault(record['name'], {'depth': record['depth'], 'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                                       'rows': 0, 'peak_delta_mb': 0.0})
+            total['calls'] += 1
+            total['wall_s'] += record['wall_s']
+            total['cpu_s'] += record['cpu_s']
+            total['rows'] += record['rows'] or 0
+            total['peak_delta_mb'] = max(total['peak_delta_mb'], record['peak_delta_mb'])
+        return stages
+
+    def trace(self):
+        """JSON 기록: 실행 정보 + 구간 목록(끝난 순서) + 단계별 합계."""
+        return {'created': self.created, 'argv': sys.argv, 'pid': os.getpid(),
+                'peak_per_span': self.peak_resettable, 'spans': self.records, 'stages': self.summary()}
+
+    def chrome_trace(self):
+        """Chrome trace event 형식 (chrome://tracing, https://ui.perfetto.dev 에서 열기). 시간 단위는 마이크로초입니다."""
+        pid = os.getpid()
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': os.path.basename(sys.argv[0])}}]
+        for record in self.records:
+            events.append({'name': record['name'], 'cat': 'stage', 'ph': 'X', 'pid': pid, 'tid': 0,
+                           'ts': record['start_s'] * 1e6, 'dur': record['wall_s'] * 1e6,
+                           'args': {key: record[key] for key in ('cpu_s', 'rows', 'rows_per_s', 'peak_delta_mb', 'error')}})
+            if CHROME_RSS_COUNTER:
+                events.append({'name': 'RSS (MB)', 'ph': 'C', 'pid': pid, 'tid': 0, 'ts': record['start_s'] * 1e6,
+                               'args': {'rss': round(record['rss_start_mb'], 1)}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def print_summary(self):
+        print("\n--- 단계별 실행 시간 ---")
+        for name, total in self.summary().items():
+            rows = f"{total['rows']:>12,}행 {total['rows'] / total['wall_s']:>12,.0f}행/초" if total['rows'] and total['wall_s'] > 0 else ' ' * 29
+            print(f"{'  ' * total['depth']}{name:<{36 - 2 * total['depth']}} {total['calls']:>4}회 {total['wall_s']:9.3f}초  "
+                  f"CPU {total['cpu_s']:9.3f}초  {rows}  최대 메모리 +{total['peak_delta_mb']:.1f}MB")
+        if not self.peak_resettable:
+            print("참고: 이 OS 에서는 구간별 최대 메모리를 잴 수 없어 프로세스 전체의 최대 RSS 기준입니다.")
+
+    def save(self):
+        if self.trace_path:
+            with open(self.trace_path, 'w', encoding='utf-8') as f:
+                json.dump(self.chrome_trace() if self.chrome else self.trace(), f, ensure_ascii=False, indent=1)
+            print(f"단계별 실행 기록을 '{self.trace_path}' 에 저장했습니다.")
+        if self.profile is not None:
+            self.profile.dump_stats(self.cprofile_path)
+            print(f"cProfile 결과를 '{self.cprofile_path}' 에 저장했습니다. (python -m pstats {self.cprofile_path})")
+
+
+# ---------------------------
+# 모듈 함수 (전역 계측기)
+# ---------------------------
+_profiler = None
+
+
+def enable(trace_path=None, chrome=False, cprofile_path=None):
+    """계측을 켭니다. 이미 켜져 있으면 새로 시작합니다. 저장은 finish() 에서 합니다."""
+    global _profiler
+    _profiler = StageProfiler(trace_path, chrome, cprofile_path)
+    return _profiler
+
+
+def is_enabled():
+    return _profiler is not None
+
+
+def finish(print_summary=True):
+    """계측을 끄고 기록을 저장합니다. (켜져 있지 않으면 아무것도 하지 않음) 계측기를 반환합니다."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        if print_summary:
+            profiler.print_summary()
+        profiler.save()
+    return profiler
+
+
+class _SpanContext:
+    __slots__ = ('profiler', 'span')
+
+    def __init__(self, profiler, name, rows):
+        self.profiler = profiler
+        self.span = profiler.open(name, rows)
+
+    def __enter__(self):
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.close(self.span, exc_type.__name__ if exc_type else None)
+        return False
+
+
+def span(name, rows=None):
+    """
+    with span('window_features') as s: ... 로 쓰는 구간. 계측이 꺼져 있으면 아무것도 하지 않습니다.
+    rows 는 처리한 행 수(정수, 또는 표/배열)이며, 구간 안에서 s.rows 로 정해도 됩니다.
+    """
+    profiler = _profiler
+    if profiler is None:
+        return _NULL_SPAN
+    return _SpanContext(profiler, name, rows)
+
+
+def set_rows(rows):
+    """지금 열려 있는 가장 안쪽 구간의 행 수를 정합니다. (데코레이터로 감싼 함수 안에서, 계측이 꺼져 있으면 무시)"""
+    if _profiler is not None and _profiler.stack:
+        _profiler.stack[-1].rows = rows
+
+
+def stage(name=None, rows=None):
+    """
+    단계 함수를 구간으로 감싸는 데코레이터. @stage() 또는 @stage('이름', rows=...)
+    rows: 결과를 받아 행 수(정수 또는 표)를 돌려주는 함수. None 이면 인자 중 가장 긴 표(또는 결과 표)의 행 수를 씁니다.
+    함수 안에서 set_rows() 로 정한 값이 있으면 그 값을 씁니다.
+    """
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _profiler
+            if profiler is None:
+                return func(*args, **kwargs)
+            span_ = profiler.open(label)
+            error = None
+            try:
+                result = func(*args, **kwargs)
+                if span_.rows is None:
+                    if rows is not None:
+                        span_.rows = rows(result)
+                    else:
+                        counts = [n for n in map(_table_rows, args) if n is not None]
+                        span_.rows = max(counts) if counts else _table_rows(result)
+                return result
+            except BaseException as e:
+                error = type(e).__name__
+                raise
+            finally:
+                profiler.close(span_, error)
+
+        return wrapper
+
+    return decorate
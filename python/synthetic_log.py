@@ -0,0 +1,444 @@
+# synthetic_log.py
+# 부하 테스트 / 성능 측정용 합성 센서 로그 생성기
+# 장치(보행자)마다 수신 서버가 남기는 것과 같은 형식의 로그(sensor_log_<장치>_<시각>.*)를 CHUNK_SECONDS 단위로 나눠 디스크에 씁니다.
+# 몇 시간짜리 로그도 메모리에는 조각 하나만 올라가고, 조각 하나는 배열 연산으로 한 번에 만들어집니다. (1천만 행 = 수 초)
+#
+# 담기는 내용
+# - 보행: 장치마다 다른 케이던스(분당 걸음 수, 천천히 변함), 걸음마다 발 디딤 충격(az), 발 흔들림(자이로), 멈춰 서는 구간
+# - 지형: 무작위 위치의 계단(충격이 크고 흔들림이 많음) / 경사로(pitch) / 단차(한 번의 큰 충격)
+#   정답 구간은 truth_<로그 이름>.csv 에 (종류, 분석 스크립트의 구역 종류, 시작/끝 시각, 실제 위치) 로 저장합니다.
+# - GPS: 1Hz fix, 시간에 따라 천천히 변하는 위치 오차, 수신 끊김(그동안 좌표 0)
+# - 네트워크: PACKET_SAMPLES 샘플을 한 패킷으로 보내고(Hackathon.ino 의 FRAME_BATCH_SIZE), 패킷 손실(연속 손실 포함)과
+#   지연 변동(jitter)을 적용한 수신 시각(timestamp_ns) 순서로 기록합니다. seq/device_ms 는 장치 기준 값이라 손실을 추적할 수 있습니다.
+#
+# 사용법: python synthetic_log.py [--devices 4] [--minutes 60 | --rows 10M] [--format parquet|csv|session] [--out synthetic_logs]
+#         [--loss 0.01] [--jitter-ms 15] [--no-split-gps] [--workers N] [--seed 0]
+
+import argparse
+import datetime
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy.signal import lfilter
+
+import session_store
+from gps_fixes import fix_change_mask
+from log_writer import GPS_LOG_SUFFIX, LOG_COLUMNS, LOG_FORMAT, SPLIT_GPS
+from sensor_features import FRAME_COLUMNS, GPS_COLUMNS, IMU_COLUMNS
+
+# ---------------------------
+# 설정
+# ---------------------------
+SAMPLE_HZ = 50
+# 패킷 하나에 담기는 샘플 수 (Hackathon.ino 의 FRAME_BATCH_SIZE)
+PACKET_SAMPLES = 10
+# 한 번에 만들어 쓰는 길이 (초). 50Hz 에서 10분 = 3만 행
+CHUNK_SECONDS = 600
+
+# 보행: 장치별 평균 케이던스 (평균, 표준편차) 분당 걸음 수, 보폭 (m)
+CADENCE_SPM = (105.0, 8.0)
+STEP_LENGTH_M = 0.7
+# 장치 시작 위치: 이 중심에서 AREA_RADIUS_M 안의 무작위 위치
+CENTER_LAT, CENTER_LON = 37.5665, 126.9780
+AREA_RADIUS_M = 2000.0
+
+# 지형/멈춤 구간: 시간당 평균 횟수와 길이 범위 (초)
+EVENT_KINDS = ('flat', 'stairs', 'ramp', 'bump', 'pause')
+EVENTS_PER_HOUR = {'stairs': 20, 'ramp': 15, 'bump': 30, 'pause': 12}
+EVENT_SECONDS = {'stairs': (8, 20), 'ramp': (10, 30), 'bump': (0.1, 0.1), 'pause': (5, 30)}
+RAMP_PITCH_RAD = (0.3, 0.6)
+# 정답 구간의 종류 -> 분석 스크립트(cluster_zones)의 구역 종류
+ZONE_TYPES = {'stairs': 'Stair/Bump Zone', 'bump': 'Stair/Bump Zone', 'ramp': 'Ramp Zone'}
+
+# GPS: 위치 오차 표준편차 (m) 와 1초 간 상관 계수, 수신 끊김 (시간당 횟수, 길이 범위 초)
+GPS_NOISE_M = 3.0
+GPS_NOISE_CORRELATION = 0.9
+GPS_OUTAGES_PER_HOUR = 2
+GPS_OUTAGE_SECONDS = (5, 60)
+
+# 네트워크: 패킷 손실률, 연속 손실 평균 길이 (패킷), 기본 지연과 지연 변동(지수 분포 평균) (ms)
+PACKET_LOSS = 0.01
+LOSS_BURST_PACKETS = 3
+LATENCY_MS = 20.0
+JITTER_MS = 15.0
+
+DEFAULT_OUTPUT_DIR = 'synthetic_logs'
+FORMAT_EXTENSIONS = {'parquet': '.parquet', 'csv': '.csv', 'session': '.bin'}
+
+METERS_PER_DEG_LAT = 111_320.0
+META_COLUMNS = LOG_COLUMNS[len(FRAME_COLUMNS):]   # timestamp_ns, seq, device_ms
+
+
+def _schedule(rng, rates_per_hour, seconds, duration_s):
+    """
+    겹치지 않는 구간들을 포아송 과정으로 배치합니다. (구간 사이 간격 ~ 지수 분포, 종류는 횟수 비율대로)
+    반환값: (종류 이름 배열, 시작 초 배열, 끝 초 배열)
+    """
+    kinds = [kind for kind, rate in rates_per_hour.items() if rate > 0]
+    if not kinds or duration_s <= 0:
+        return np.array([], dtype=object), np.zeros(0), np.zeros(0)
+    rates = np.array([rates_per_hour[kind] for kind in kinds], dtype=np.float64) / 3600.0
+    n = int(rates.sum() * duration_s * 1.5) + 16
+    while True:
+        chosen = rng.choice(len(kinds), n, p=rates / rates.sum())
+        lo = np.array([seconds[kinds[i]][0] for i in chosen])
+        hi = np.array([seconds[kinds[i]][1] for i in chosen])
+        lengths = rng.uniform(lo, hi)
+        gaps = rng.exponential(1.0 / rates.sum(), n)
+        starts = np.cumsum(gaps) + np.concatenate(([0.0], np.cumsum(lengths)[:-1]))
+        if starts[-1] >= duration_s:
+            keep = starts < duration_s
+            return np.array(kinds, dtype=object)[chosen[keep]], starts[keep], (starts + lengths)[keep]
+        n *= 2
+
+
+class SyntheticDevice:
+    """
+    장치(보행자) 한 대의 합성 기록. 초 단위 상태(케이던스, 방향, 실제 위치, GPS 오차, 구간 배치)를 처음에 만들어 두고,
+    chunks() 가 샘플 단위 값을 조각마다 배열 연산으로 만듭니다. (조각끼리 이어지는 상태는 수신 시각 하나뿐)
+    """
+
+    def __init__(self, device_id, duration_s, seed=0, start_ns=None, packet_loss=PACKET_LOSS,
+                 loss_burst=LOSS_BURST_PACKETS, latency_ms=LATENCY_MS, jitter_ms=JITTER_MS,
+                 gps_outages_per_hour=GPS_OUTAGES_PER_HOUR):
+        self.device_id = device_id
+        self.seed = seed
+        self.samples = int(round(duration_s * SAMPLE_HZ)) // PACKET_SAMPLES * PACKET_SAMPLES
+        self.packet_loss = packet_loss
+        self.loss_burst = loss_burst
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        rng = np.random.default_rng([seed, device_id])
+        start_ns = time.time_ns() if start_ns is None else start_ns
+        self.start_ns = int(start_ns + rng.uniform(0, 60) * 1e9)
+        self.boot_ms = int(rng.integers(1_000, 600_000))   # 장치가 켜진 뒤 기록을 시작하기까지 (device_ms 시작 값)
+        seconds = self.samples // SAMPLE_HZ + 2
+
+        # 지형/멈춤 구간
+        self.event_kind, self.event_start, self.event_end = _schedule(rng, EVENTS_PER_HOUR, EVENT_SECONDS, seconds - 2)
+        self.event_code = np.array([EVENT_KINDS.index(kind) for kind in self.event_kind], dtype=np.int64)
+        self.event_pitch = np.where(self.event_kind == 'ramp', rng.uniform(*RAMP_PITCH_RAD, len(self.event_kind)), 0.0)
+
+        # 초마다 케이던스 (멈춤 구간은 0), 걸음 수 누적, 방향(rad), 속도 -> 실제 위치
+        centers = np.arange(seconds) + 0.5
+        cadence = rng.normal(*CADENCE_SPM) + 6 * np.sin(2 * np.pi * centers / 300 + rng.uniform(0, 2 * np.pi))
+        self.cadence = np.where(self._kind_at(centers)[0] == EVENT_KINDS.index('pause'), 0.0, np.maximum(cadence, 60))
+        self.cum_steps = np.concatenate(([0.0], np.cumsum(self.cadence / 60)))
+        # 방향: 작은 흔들림 + 가끔 (분당 약 1번) 3초에 걸쳐 도는 모퉁이
+        self.turn_rate = rng.normal(0, 0.02, seconds)
+        corners = np.flatnonzero(rng.random(seconds) < 1 / 60)
+        for offset in range(3):
+            self.turn_rate[np.minimum(corners + offset, seconds - 1)] += rng.choice([-1, 1], len(corners)) * np.pi / 6
+        self.turn_rate[self.cadence == 0] = 0.0
+        heading = rng.uniform(0, 2 * np.pi) + np.concatenate(([0.0], np.cumsum(self.turn_rate)))
+        speed = STEP_LENGTH_M * self.cadence / 60
+        radius, angle = AREA_RADIUS_M * np.sqrt(rng.random()), rng.uniform(0, 2 * np.pi)
+        north = radius * np.cos(angle) + np.concatenate(([0.0], np.cumsum(speed * np.cos(heading[:-1]))))
+        east = radius * np.sin(angle) + np.concatenate(([0.0], np.cumsum(speed * np.sin(heading[:-1]))))
+        self.heading = heading
+        self.cos_lat = np.cos(np.radians(CENTER_LAT))
+        self.true_lat = CENTER_LAT + north / METERS_PER_DEG_LAT
+        self.true_lon = CENTER_LON + east / (METERS_PER_DEG_LAT * self.cos_lat)
+
+        # GPS fix (초마다): 실제 위치 + AR(1) 오차, 수신 끊김 구간은 0
+        a = GPS_NOISE_CORRELATION
+        error = lfilter([GPS_NOISE_M * np.sqrt(1 - a * a)], [1, -a], rng.normal(size=(2, seconds + 1)), axis=1)
+        self.fix_lat = self.true_lat + error[0] / METERS_PER_DEG_LAT
+        self.fix_lon = self.true_lon + error[1] / (METERS_PER_DEG_LAT * self.cos_lat)
+        _, out_start, out_end = _schedule(rng, {'outage': gps_outages_per_hour}, {'outage': GPS_OUTAGE_SECONDS}, seconds - 2)
+        second = np.arange(seconds + 1)
+        idx = np.searchsorted(out_start, second, side='right') - 1
+        outage = second < np.append(out_end, -np.inf)[idx]
+        self.fix_lat[outage] = 0.0
+        self.fix_lon[outage] = 0.0
+        self.outage_seconds = int(outage.sum())
+
+        self.sent = self.received = 0
+        self._last_arrival = 0
+
+    def _kind_at(self, t):
+        """시각 t (초, 배열) 의 (구간 종류 번호, 구간 번호). 어느 구간에도 없으면 (0 = flat, -1)."""
+        # 구간 번호 -1 은 덧붙인 마지막 값(끝 = -inf, 종류 = flat)을 가리키므로 구간이 없는 경우도 그대로 처리됩니다.
+        idx = np.searchsorted(self.event_start, t, side='right') - 1
+        event = np.where(t < np.append(self.event_end, -np.inf)[idx], idx, -1)
+        return np.append(self.event_code, 0)[event], event
+
+    def frame(self, k0, k1):
+        """
+        샘플 [k0, k1) 의 (샘플 수, 11) 센서 값 배열 (전송 전, 손실 없음).
+        위경도만 float64 이고 나머지는 float32 로 계산합니다. (로그에도 float32 로 저장되므로)
+        """
+        rng = np.random.Generator(np.random.SFC64([self.seed, self.device_id, k0]))   # 정규 난수가 PCG64 보다 빠름
+        k = np.arange(k0, k1)
+        n = len(k)
+        s = k // SAMPLE_HZ
+        frac = (k - s * SAMPLE_HZ) / SAMPLE_HZ
+        kind, event = self._kind_at(k / SAMPLE_HZ)
+        stairs = kind == EVENT_KINDS.index('stairs')
+        cadence = self.cadence[s]
+        walking = (cadence > 0).astype(np.float32)
+
+        # 걸음 위상: 초마다의 걸음 수 누적을 선형 보간. 두 걸음(한 보폭 주기)으로 나눈 나머지만 float32 로 (한 걸음 = 2π)
+        phase = (np.float32(2 * np.pi) * (self.cum_steps[s] % 2 + frac * cadence / 60)).astype(np.float32)
+        cos_phase, sin_phase = np.cos(phase), np.sin(phase)
+        from_strike = (phase + np.float32(np.pi)) % np.float32(2 * np.pi) - np.float32(np.pi)   # 발 디딤 순간(위상 0)으로부터
+        width = np.where(stairs, np.float32(0.8), np.float32(0.4))
+        strike = walking * np.where(stairs, np.float32(0.8), np.float32(0.25)) * np.exp(-(from_strike / width) ** 2)
+        bump = np.where(kind == EVENT_KINDS.index('bump'), np.float32(1.5), np.float32(0.0))
+        gait = walking * (np.float32(0.12) * cos_phase + np.float32(0.05) * (2 * cos_phase * cos_phase - 1))
+        pitch = np.float32(0.05) + np.append(self.event_pitch, 0.0).astype(np.float32)[event]
+        heading = (self.heading[s] + frac * self.turn_rate[s]).astype(np.float32)
+
+        noise = rng.standard_normal((n, 9), dtype=np.float32)
+        noise *= np.array([0.02, 0.02, 1.0, 3.0, 3.0, 1.0, 0.005, 0.005, 0.005], dtype=np.float32)
+        noise[:, 2] *= np.where(stairs, np.float32(0.3), np.float32(0.02))
+        swing = walking * 115 * (1 - cos_phase)                   # 발 흔들림 (deg/s) = 230 sin²(위상/2), 디딤 순간에는 0 (ZUPT)
+
+        values = np.empty((n, len(FRAME_COLUMNS)))
+        values[:, 0] = self.fix_lat[s]
+        values[:, 1] = self.fix_lon[s]
+        values[:, 2] = np.sin(pitch) * (1 + gait) + np.float32(0.05) * walking * sin_phase
+        values[:, 3] = np.float32(0.05) * walking * np.sin(phase / 2)
+        values[:, 4] = np.cos(pitch) * (1 + gait + strike + bump)
+        values[:, 5] = swing
+        values[:, 6] = np.float32(0.3) * swing
+        values[:, 7] = np.degrees(self.turn_rate)[s]
+        values[:, 8] = np.float32(0.3) * np.cos(heading)
+        values[:, 9] = np.float32(-0.3) * np.sin(heading)
+        values[:, 10] = -0.4
+        values[:, 2:] += noise
+        return values
+
+    def chunks(self, chunk_seconds=CHUNK_SECONDS):
+        """
+        수신 서버가 받은 순서대로의 로그 조각(DataFrame, LOG_COLUMNS)을 차례로 만듭니다.
+        패킷마다 손실 여부와 도착 시각(보낸 시각 + 지연 + 지수 분포 변동)을 정하고, 살아남은 패킷을 도착 순서로 정렬합니다.
+        (조각 경계를 넘는 순서 뒤바뀜은 도착 시각을 앞 조각의 마지막 도착 시각 이상으로 올려서 처리합니다)
+        """
+        step = max(chunk_seconds * SAMPLE_HZ // PACKET_SAMPLES, 1) * PACKET_SAMPLES
+        for k0 in range(0, self.samples, step):
+            k1 = min(k0 + step, self.samples)
+            values = self.frame(k0, k1)
+            rng = np.random.default_rng([self.seed, self.device_id, k0, 1])
+            packets = (k1 - k0) // PACKET_SAMPLES
+
+            # 연속 손실: 손실이 시작될 확률 = 손실률 / 평균 길이, 길이 ~ 기하 분포
+            lost = np.zeros(packets, dtype=bool)
+            if self.packet_loss > 0:
+                starts = np.flatnonzero(rng.random(packets) < self.packet_loss / self.loss_burst)
+                ends = np.minimum(starts + rng.geometric(1 / self.loss_burst, len(starts)), packets)
+                delta = np.zeros(packets + 1, dtype=np.int64)
+                np.add.at(delta, starts, 1)
+                np.add.at(delta, ends, -1)
+                lost = np.cumsum(delta)[:packets] > 0
+
+            # 패킷은 마지막 샘플을 측정한 시각에 보냅니다.
+            send_s = (k0 + (np.arange(packets) + 1) * PACKET_SAMPLES - 1) / SAMPLE_HZ
+            delay_ms = self.latency_ms + (rng.exponential(self.jitter_ms, packets) if self.jitter_ms > 0 else 0.0)
+            arrival = self.start_ns + np.round((send_s + delay_ms / 1000) * 1e9).astype(np.int64)
+            order = np.argsort(arrival, kind='stable')
+            order = order[~lost[order]]
+            arrival = np.maximum.accumulate(np.maximum(arrival[order], self._last_arrival)) if len(order) else arrival[:0]
+            if len(arrival):
+                self._last_arrival = int(arrival[-1])
+
+            rows = (order[:, None] * PACKET_SAMPLES + np.arange(PACKET_SAMPLES)).ravel()
+            df = pd.DataFrame(values[rows], columns=FRAME_COLUMNS)
+            df['timestamp_ns'] = np.repeat(arrival, PACKET_SAMPLES)
+            df['seq'] = k0 + rows
+            df['device_ms'] = self.boot_ms + (k0 + rows) * (1000 // SAMPLE_HZ)
+            self.sent += k1 - k0
+            self.received += len(df)
+            yield df
+
+    def truth(self):
+        """정답 구간 (계단/경사로/단차) DataFrame: 종류, 구역 종류, 시작/끝 시각(ns), 구간 가운데의 실제 위치, 경사로 pitch."""
+        terrain = np.isin(self.event_kind, list(ZONE_TYPES))
+        kind = self.event_kind[terrain]
+        start, end = self.event_start[terrain], self.event_end[terrain]
+        middle = (start + end) / 2
+        seconds = np.arange(len(self.true_lat))
+        return pd.DataFrame({
+            'type': kind, 'zone_type': [ZONE_TYPES[k] for k in kind],
+            'start_ns': self.start_ns + np.round(start * 1e9).astype(np.int64),
+            'end_ns': self.start_ns + np.round(end * 1e9).astype(np.int64),
+            'lat': np.interp(middle, seconds, self.true_lat), 'lon': np.interp(middle, seconds, self.true_lon),
+            'pitch': self.event_pitch[terrain],
+        })
+
+
+# ---------------------------
+# 조각 단위 로그 파일 쓰기
+# ---------------------------
+class ChunkLogFile:
+    """
+    LogWriter 싱크와 같은 형식(컬럼, 타입, 세션 파일 인덱스)의 로그 파일 하나에 DataFrame 조각을 이어 씁니다.
+    수신 서버와 달리 행마다 수신 시각이 다를 수 있습니다.
+    """
+
+    def __init__(self, path, log_format, value_columns):
+        self.path = path
+        self.log_format = log_format
+        self.value_columns = list(value_columns)
+        self.file = open(path, 'w', newline='', encoding='utf-8') if log_format == 'csv' else open(path, 'wb')
+        if log_format == 'csv':
+            self.file.write(','.join(self.value_columns + META_COLUMNS) + '\n')
+        elif log_format == 'parquet':
+            fields = [pa.field(col, pa.float64() if col in GPS_COLUMNS else pa.float32()) for col in self.value_columns]
+            fields += [pa.field(col, pa.int64()) for col in META_COLUMNS]
+            self.schema = pa.schema(fields)
+            # 잡음이 섞인 센서 값은 사전(dictionary) 인코딩이 도움이 안 되고 쓰기만 몇 배 느려지므로, 반복되는 위경도에만 씁니다.
+            self.writer = pq.ParquetWriter(self.file, self.schema,
+                                           use_dictionary=[col for col in GPS_COLUMNS if col in self.value_columns])
+        elif log_format == 'session':
+            self.file.write(session_store.make_header(self.value_columns).tobytes())
+            self.index_file = open(session_store.index_path(path), 'wb')
+            self._records = 0
+            self._last_second = None
+        else:
+            raise ValueError(f"알 수 없는 로그 형식입니다: {log_format}")
+
+    def write(self, df):
+        df = df[self.value_columns + META_COLUMNS]
+        if self.log_format == 'csv':
+            df.to_csv(self.file, header=False, index=False, float_format='%.10g')
+        elif self.log_format == 'parquet':
+            self.writer.write_table(pa.Table.from_arrays(
+                [pa.array(df[field.name].to_numpy(dtype=field.type.to_pandas_dtype())) for field in self.schema],
+                schema=self.schema))
+        else:
+            timestamps = df['timestamp_ns'].to_numpy(dtype=np.int64)
+            records = session_store.make_records(df[self.value_columns].to_numpy(dtype=np.float64), timestamps,
+                                                 df['seq'].to_numpy(), df['device_ms'].to_numpy(), self.value_columns)
+            self.file.write(records.tobytes())
+            # 인덱스: 수신 시각의 초(INDEX_INTERVAL_NS)가 바뀌는 첫 레코드마다 한 줄
+            second = timestamps // session_store.INDEX_INTERVAL_NS
+            new = np.flatnonzero(np.diff(np.concatenate(([second[0] - 1 if self._last_second is None else self._last_second],
+                                                         second))) != 0) if len(second) else np.zeros(0, dtype=np.int64)
+            index = np.zeros(len(new), dtype=session_store.INDEX_DTYPE)
+            index['timestamp_ns'] = timestamps[new]
+            index['record'] = self._records + new
+            self.index_file.write(index.tobytes())
+            self._records += len(records)
+            if len(second):
+                self._last_second = second[-1]
+
+    def close(self):
+        if self.log_format == 'parquet':
+            self.writer.close()
+        elif self.log_format == 'session':
+            self.index_file.close()
+        self.file.close()
+
+
+class ChunkLogWriter:
+    """
+    로그 하나(path_stem + 확장자)에 조각을 씁니다. split_gps 이면 log_writer 와 같이 IMU 로그와
+    GPS fix 로그(path_stem + GPS_LOG_SUFFIX + 확장자, 좌표가 바뀐 행만)로 나눕니다.
+    """
+
+    def __init__(self, path_stem, log_format=LOG_FORMAT, split_gps=SPLIT_GPS):
+        ext = FORMAT_EXTENSIONS[log_format]
+        self.path = path_stem + ext
+        self.split_gps = split_gps
+        if split_gps:
+            self.imu = ChunkLogFile(self.path, log_format, IMU_COLUMNS)
+            self.gps = ChunkLogFile(path_stem + GPS_LOG_SUFFIX + ext, log_format, GPS_COLUMNS)
+            self._last_fix = None
+        else:
+            self.log = ChunkLogFile(self.path, log_format, FRAME_COLUMNS)
+
+    def write(self, df):
+        if not self.split_gps:
+            self.log.write(df)
+            return
+        self.imu.write(df)
+        new_fix = fix_change_mask(df['lat'].to_numpy(), df['lon'].to_numpy(), self._last_fix)
+        if len(df):
+            self._last_fix = df[GPS_COLUMNS].to_numpy()[-1]
+        self.gps.write(df[new_fix])
+
+    def close(self):
+        for log in ((self.imu, self.gps) if self.split_gps else (self.log,)):
+            log.close()
+
+
+# ---------------------------
+# 생성
+# ---------------------------
+def generate_session(out_dir, device_id, duration_s, log_format=LOG_FORMAT, split_gps=SPLIT_GPS, seed=0, start_ns=None,
+                     **device_options):
+    """장치 한 대의 로그와 정답 구간 파일을 out_dir 에 씁니다. 반환값: 요약 dict"""
+    started = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    device = SyntheticDevice(device_id, duration_s, seed, start_ns, **device_options)
+    stamp = datetime.datetime.fromtimestamp(device.start_ns / 1e9).strftime("%Y-%m-%d_%H-%M-%S")
+    stem = os.path.join(out_dir, f"sensor_log_{device_id}_{stamp}")
+    writer = ChunkLogWriter(stem, log_format, split_gps)
+    try:
+        for chunk in device.chunks():
+            writer.write(chunk)
+    finally:
+        writer.close()
+    truth = device.truth()
+    truth_path = os.path.join(out_dir, f"truth_{os.path.basename(stem)}.csv")
+    truth.to_csv(truth_path, index=False)
+    return {'device': device_id, 'path': writer.path, 'truth_path': truth_path, 'rows': device.received,
+            'lost': device.sent - device.received, 'events': len(truth), 'gps_outage_seconds': device.outage_seconds,
+            'seconds': time.perf_counter() - started}
+
+
+def generate_sessions(out_dir=DEFAULT_OUTPUT_DIR, devices=1, duration_s=3600, log_format=LOG_FORMAT, split_gps=SPLIT_GPS,
+                      seed=0, workers=1, **device_options):
+    """장치 devices 대의 로그를 만듭니다. (workers 개 프로세스에서 장치별로 병렬) 반환값: 장치별 요약 DataFrame"""
+    os.makedirs(out_dir, exist_ok=True)
+    start_ns = time.time_ns()
+    args = [(out_dir, device_id, duration_s, log_format, split_gps, seed, start_ns) for device_id in range(1, devices + 1)]
+    if workers > 1 and devices > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, devices)) as pool:
+            futures = [pool.submit(generate_session, *a, **device_options) for a in args]
+            results = [future.result() for future in futures]
+    else:
+        results = [generate_session(*a, **device_options) for a in args]
+    for result in results:
+        print(f"장치 {result['device']}: {result['rows']:,}행 (손실 {result['lost']:,}행), 정답 구간 {result['events']}개, "
+              f"GPS 끊김 {result['gps_outage_seconds']}초 -> '{result['path']}' ({result['seconds']:.1f}초)")
+    return pd.DataFrame(results)
+
+
+def parse_rows(text):
+    """'10M', '250k', '5000' 같은 행 수 문자열."""
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1].lower(), 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="부하 테스트용 합성 센서 로그를 장치별로 만듭니다.")
+    parser.add_argument('--devices', type=int, default=1, help="장치 수 (기본: %(default)s)")
+    length = parser.add_mutually_exclusive_group()
+    length.add_argument('--minutes', type=float, default=60.0, help="장치별 기록 길이 (분, 기본: %(default)s)")
+    length.add_argument('--rows', type=parse_rows, default=None, help="장치별 샘플 수 (예: 10M, 손실 전)")
+    parser.add_argument('--format', choices=list(FORMAT_EXTENSIONS), default=LOG_FORMAT, help="로그 형식 (기본: %(default)s)")
+    parser.add_argument('--no-split-gps', action='store_true', help="GPS fix 를 따로 나누지 않고 한 파일에 씁니다")
+    parser.add_argument('--out', default=DEFAULT_OUTPUT_DIR, help="출력 폴더 (기본: %(default)s)")
+    parser.add_argument('--loss', type=float, default=PACKET_LOSS, help="패킷 손실률 (기본: %(default)s)")
+    parser.add_argument('--loss-burst', type=float, default=LOSS_BURST_PACKETS, help="연속 손실 평균 길이 (패킷)")
+    parser.add_argument('--jitter-ms', type=float, default=JITTER_MS, help="지연 변동 평균 (ms, 기본: %(default)s)")
+    parser.add_argument('--gps-outages', type=float, default=GPS_OUTAGES_PER_HOUR, help="시간당 GPS 끊김 횟수")
+    parser.add_argument('--workers', type=int, default=1, help="병렬 프로세스 수 (장치별)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    duration_s = args.rows / SAMPLE_HZ if args.rows else args.minutes * 60
+    started = time.perf_counter()
+    summary = generate_sessions(args.out, args.devices, duration_s, args.format, not args.no_split_gps, args.seed,
+                                args.workers, packet_loss=args.loss, loss_burst=args.loss_burst, jitter_ms=args.jitter_ms,
+                                gps_outages_per_hour=args.gps_outages)
+    elapsed = time.perf_counter() - started
+    print(f"✅ 장치 {len(summary)}대, 모두 {summary['rows'].sum():,}행을 {elapsed:.1f}초에 만들었습니다. "
+          f"({summary['rows'].sum() / elapsed:,.0f}행/초)")
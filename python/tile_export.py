@@ -0,0 +1,366 @@
+# tile_export.py
+# 세션 경로(칼만 필터로 보정한 GPS fix)와 구역 지도(zone_store.py)의 구역을 z/x/y GeoJSON 타일 피라미드로 내보냅니다.
+# 지도 페이지(index.html)는 화면에 보이는 타일만 그때그때 받아 오므로, 수천 개의 보행 기록을 모은 도시 전체 지도도 바로 열립니다.
+#
+# - 타일 좌표는 웹 메르카토르(슬리피 맵, OpenStreetMap 과 같은 z/x/y)입니다.
+# - 경로는 줌마다 그 줌의 화면 1픽셀 정도 허용 오차로 단순화한 뒤(track_simplify.py) 타일 경계로 나눕니다.
+# - 내보내기는 증분 방식입니다. 세션을 하나 추가하면 그 세션 경로가 지나가는 타일만 다시 씁니다.
+#   (그 타일의 다른 세션 경로는 그대로 두고, 구역은 구역 지도에서 그 타일 범위만 다시 읽어 넣습니다)
+#   이미 내보낸 세션은 로그 파일이 바뀌지 않았으면 건너뜁니다. (manifest.json)
+# - 구역 지도에 새 구역이 들어오면(ZoneStore.data_version() 이 바뀌면) 경로와 상관없이 구역이 있는 모든 타일의 구역을 다시 씁니다.
+#
+# 사용법: python tile_export.py logs/ [--db zone_map.db] [--out tiles] [--force]
+#         cd tiles && python -m http.server 8000   ->  http://localhost:8000/ 에서 지도 보기
+#         (브라우저는 file:// 로 연 페이지에서 타일을 fetch 하지 못하므로 간단한 웹 서버로 열어야 합니다)
+
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+
+from anal_special_point_and_plot_map import KALMAN_Q_VAL, KALMAN_R_VAL, valid_gps_rows
+from batch_analysis import find_logs, session_name
+from gps_fixes import unique_fixes
+from kalman import kalman_track
+from sensor_features import GPS_COLUMNS
+from sensor_log import load_sensor_log
+from track_simplify import lod_tolerance_m, simplify_track
+from zone_store import ZONE_DB_PATH, ZoneStore
+
+# ---------------------------
+# 설정
+# ---------------------------
+TILE_DIR = 'tiles'
+# 타일을 만드는 줌 범위. 이보다 더 확대하면 지도 페이지가 MAX_ZOOM 타일을 늘려서 씁니다.
+MIN_ZOOM = 12
+MAX_ZOOM = 18
+# 좌표 소수점 자릿수 (6자리 = 약 0.1m)
+COORD_DIGITS = 6
+# 경로를 타일로 나누기 전에, 선분 하나가 타일 폭의 이 비율보다 길지 않도록 중간 점을 넣습니다. (타일을 건너뛰지 않도록)
+MAX_SEGMENT_TILES = 0.5
+
+MANIFEST_FILE = 'manifest.json'
+TILE_EXT = '.geojson'
+
+
+# ---------------------------
+# 타일 좌표 (웹 메르카토르)
+# ---------------------------
+def tile_coords(lat, lon, zoom):
+    """위경도 -> 실수 타일 좌표 (x, y). 정수 부분이 타일 번호입니다."""
+    n = 2.0 ** zoom
+    lat_rad = np.radians(np.asarray(lat, dtype=np.float64))
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * n
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def tile_bounds(zoom, x, y):
+    """타일 (zoom, x, y) 의 (위도 최소, 경도 최소, 위도 최대, 경도 최대)."""
+    n = 2.0 ** zoom
+
+    def lat_at(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return lat_at(y + 1), x / n * 360.0 - 180.0, lat_at(y), (x + 1) / n * 360.0 - 180.0
+
+
+def tile_path(out_dir, zoom, x, y):
+    return os.path.join(out_dir, str(zoom), str(x), f"{y}{TILE_EXT}")
+
+
+# ---------------------------
+# 경로 -> 타일 조각
+# ---------------------------
+def session_track(path):
+    """세션 로그에서 칼만 필터로 보정한 GPS fix 경로 (fix 수, 2) [lat, lon] 를 계산합니다. (분석 스크립트와 같은 필터/설정)"""
+    df = valid_gps_rows(load_sensor_log(path, columns=GPS_COLUMNS))
+    z = df[GPS_COLUMNS].to_numpy(dtype=np.float64)
+    if len(z) == 0:
+        return z
+    return kalman_track(z[unique_fixes(z[:, 0], z[:, 1])], KALMAN_R_VAL, KALMAN_Q_VAL)
+
+
+def densify(points, tx, ty, max_step=MAX_SEGMENT_TILES):
+    """타일 좌표로 max_step 보다 긴 선분에 중간 점을 넣습니다. 반환값: (위경도 점, 타일 x, 타일 y)"""
+    length = np.hypot(np.diff(tx), np.diff(ty))
+    parts = np.maximum(np.ceil(length / max_step).astype(np.int64), 1)
+    seg = np.repeat(np.arange(len(length)), parts)
+    t = (np.arange(len(seg)) - np.repeat(np.cumsum(parts) - parts, parts)) / parts[seg]
+
+    def interp(values):
+        values = np.asarray(values)
+        return np.concatenate([values[seg] + (values[seg + 1] - values[seg]) * (t[:, None] if values.ndim == 2 else t),
+                               values[-1:]])
+
+    return interp(points), interp(tx), interp(ty)
+
+
+def track_tile_pieces(points, zoom):
+    """
+    경로 (n, 2) [lat, lon] 를 zoom 의 타일마다 나눕니다. 반환값: {(x, y): [조각 (m, 2) 배열, ...]}
+    선분은 양 끝점이 속한 타일에 모두 넣으므로 조각이 타일 경계를 살짝 넘어 이어 그려집니다.
+    """
+    if len(points) < 2:
+        return {}
+    tx, ty = tile_coords(points[:, 0], points[:, 1], zoom)
+    points, tx, ty = densify(points, tx, ty)
+    tile_x, tile_y = np.floor(tx).astype(np.int64), np.floor(ty).astype(np.int64)
+    key = tile_x * (1 << zoom) + tile_y
+
+    # (타일, 선분 번호) 쌍: 선분 i 는 점 i 의 타일과 점 i+1 의 타일에 속합니다.
+    seg = np.arange(len(points) - 1)
+    other = key[1:] != key[:-1]
+    seg_keys = np.concatenate([key[:-1], key[1:][other]])
+    seg_ids = np.concatenate([seg, seg[other]])
+    order = np.lexsort((seg_ids, seg_keys))
+    seg_keys, seg_ids = seg_keys[order], seg_ids[order]
+    # 같은 타일 안에서 선분 번호가 이어지는 동안이 한 조각입니다.
+    breaks = np.flatnonzero((seg_keys[1:] != seg_keys[:-1]) | (seg_ids[1:] != seg_ids[:-1] + 1)) + 1
+    pieces = {}
+    for start, end in zip(np.r_[0, breaks], np.r_[breaks, len(seg_ids)]):
+        k = int(seg_keys[start])
+        pieces.setdefault((k >> zoom, k & ((1 << zoom) - 1)), []).append(points[seg_ids[start]:seg_ids[end - 1] + 2])
+    return pieces
+
+
+# ---------------------------
+# GeoJSON
+# ---------------------------
+def _round(value):
+    return None if value is None or (isinstance(value, float) and math.isnan(value)) else round(float(value), COORD_DIGITS)
+
+
+def track_feature(session, piece):
+    coords = [[round(lon, COORD_DIGITS), round(lat, COORD_DIGITS)] for lat, lon in piece.tolist()]
+    return {'type': 'Feature', 'properties': {'kind': 'track', 'session': session},
+            'geometry': {'type': 'LineString', 'coordinates': coords}}
+
+
+def zone_features(store, zoom, x, y):
+    lat_min, lon_min, lat_max, lon_max = tile_bounds(zoom, x, y)
+    zones = store.zones_in_bbox(lat_min, lat_max, lon_min, lon_max)
+    # 타일 경계 위의 구역이 두 타일에 모두 들어가지 않도록 [최소, 최대) 로 자릅니다.
+    zones = zones[(zones['lat'] > lat_min) & (zones['lat'] <= lat_max) & (zones['lon'] >= lon_min) & (zones['lon'] < lon_max)]
+    return [{'type': 'Feature',
+             'properties': {'kind': 'zone', 'id': int(zone['id']), 'type': zone['type'],
+                            'observations': int(zone['observations']), 'points_count': int(zone['points_count']),
+                            'max_variance': _round(zone['max_variance']), 'avg_pitch': _round(zone['avg_pitch'])},
+             'geometry': {'type': 'Point', 'coordinates': [_round(zone['lon']), _round(zone['lat'])]}}
+            for zone in zones.to_dict('records')]
+
+
+def read_tile(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['features']
+
+
+def write_tile(path, features):
+    """타일을 씁니다. 남은 내용이 없는 타일은 지웁니다. (지도 페이지는 없는 타일을 빈 타일로 봅니다)"""
+    if not features:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f, ensure_ascii=False, separators=(',', ':'))
+
+
+# ---------------------------
+# 증분 내보내기
+# ---------------------------
+def load_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'min_zoom': MIN_ZOOM, 'max_zoom': MAX_ZOOM, 'center': None, 'sessions': {},
+                'zones_version': None, 'zone_tiles': []}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(out_dir, manifest):
+    with open(os.path.join(out_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+
+def export_session(out_dir, session, track, store, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, old_tiles=()):
+    """
+    세션 하나의 경로를 타일에 넣고, 그 타일들의 구역을 구역 지도에서 다시 채웁니다.
+    old_tiles (이전에 내보낸 같은 세션의 타일)에서는 이 세션의 옛 경로를 지웁니다. 반환값: 이 세션이 지나가는 타일 목록
+    """
+    pieces = {}
+    for zoom in range(min_zoom, max_zoom + 1):
+        simplified = simplify_track(track[:, 0], track[:, 1], lod_tolerance_m(zoom)) if len(track) else track
+        for (x, y), parts in track_tile_pieces(simplified, zoom).items():
+            pieces[(zoom, x, y)] = parts
+
+    touched = set(pieces) | {tuple(tile) for tile in old_tiles}
+    for zoom, x, y in touched:
+        path = tile_path(out_dir, zoom, x, y)
+        features = [feature for feature in read_tile(path)
+                    if feature['properties']['kind'] == 'track' and feature['properties']['session'] != session]
+        features += [track_feature(session, piece) for piece in pieces.get((zoom, x, y), [])]
+        features += zone_features(store, zoom, x, y) if store is not None else []
+        write_tile(path, features)
+    return sorted(pieces)
+
+
+def zone_tiles(zones, zoom):
+    """구역이 들어가는 zoom 의 타일 (x, y) 집합. (zone_features 의 경계 규칙과 같게 내림)"""
+    if len(zones) == 0:
+        return set()
+    tx, ty = tile_coords(zones['lat'].to_numpy(), zones['lon'].to_numpy(), zoom)
+    return set(zip(np.floor(tx).astype(np.int64).tolist(), np.floor(ty).astype(np.int64).tolist()))
+
+
+def export_zone_layers(out_dir, store, manifest, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    """
+    구역이 있는 모든 타일(과 전에 구역이 있던 타일)의 구역을 구역 지도에서 다시 채웁니다. 경로는 그대로 둡니다.
+    반환값: 다시 쓴 타일 수
+    """
+    zones = store.all_zones()
+    tiles = {tuple(tile) for tile in manifest.get('zone_tiles', [])}
+    for zoom in range(min_zoom, max_zoom + 1):
+        tiles |= {(zoom, x, y) for x, y in zone_tiles(zones, zoom)}
+
+    with_zones = []
+    for zoom, x, y in tiles:
+        path = tile_path(out_dir, zoom, x, y)
+        zone_layer = zone_features(store, zoom, x, y)
+        write_tile(path, [feature for feature in read_tile(path) if feature['properties']['kind'] != 'zone'] + zone_layer)
+        if zone_layer:
+            with_zones.append([zoom, x, y])
+    manifest['zone_tiles'] = sorted(with_zones)
+    manifest['zones_version'] = list(store.data_version())
+    return len(tiles)
+
+
+def export_tiles(inputs, out_dir=TILE_DIR, db_path=ZONE_DB_PATH, force=False, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    """로그들(폴더/glob/파일)의 경로와 구역을 타일로 내보냅니다. 바뀐 세션만 처리합니다."""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    if (manifest['min_zoom'], manifest['max_zoom']) != (min_zoom, max_zoom):
+        print("줌 범위가 바뀌어 모든 세션을 다시 내보냅니다.")
+        force = True
+        manifest.update(min_zoom=min_zoom, max_zoom=max_zoom)
+
+    store = ZoneStore(db_path) if db_path and os.path.exists(db_path) else None
+    if store is None:
+        print(f"구역 지도 '{db_path}' 가 없어 경로만 내보냅니다.")
+    exported = skipped = 0
+    try:
+        for path in find_logs(inputs):
+            session = session_name(path)
+            entry = manifest['sessions'].get(session)
+            mtime = os.path.getmtime(path)
+            if entry is not None and entry['mtime'] >= mtime and not force:
+                skipped += 1
+                continue
+            track = session_track(path)
+            tiles = export_session(out_dir, session, track, store, min_zoom, max_zoom, entry['tiles'] if entry else ())
+            manifest['sessions'][session] = {'mtime': mtime, 'fixes': len(track), 'tiles': tiles}
+            if manifest['center'] is None and len(track):
+                manifest['center'] = [float(track[0, 0]), float(track[0, 1])]
+            save_manifest(out_dir, manifest)   # 세션마다 저장해 두면 중간에 멈춰도 이어서 할 수 있습니다.
+            exported += 1
+            print(f"{session}: GPS fix {len(track)}개 -> 타일 {len(tiles)}개 갱신")
+
+        # 세션 경로가 지나가지 않는 곳의 구역도, 마지막 내보내기 이후 새로 들어온 구역도 타일에 반영합니다.
+        if store is not None and (force or manifest.get('zones_version') != list(store.data_version())):
+            rewritten = export_zone_layers(out_dir, store, manifest, min_zoom, max_zoom)
+            save_manifest(out_dir, manifest)
+            print(f"구역 지도가 바뀌어 구역 타일 {rewritten}개를 다시 썼습니다.")
+    finally:
+        if store is not None:
+            store.close()
+
+    write_map_page(out_dir, manifest)
+    print(f"✅ 세션 {exported}개를 내보냈습니다. (변경 없음 {skipped}개) 지도: '{os.path.join(out_dir, 'index.html')}'")
+
+
+# ---------------------------
+# 지도 페이지
+# ---------------------------
+MAP_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>보행 경로 / 위험 구역 지도</title>
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>html, body, #map { height: 100%; margin: 0; }</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+// 화면에 보이는 타일의 GeoJSON 만 받아 그리고, 화면에서 벗어난 타일은 지웁니다.
+var MIN_ZOOM = __MIN_ZOOM__, MAX_ZOOM = __MAX_ZOOM__;
+var map = L.map('map').setView(__CENTER__, 16);
+L.tileLayer('https://tile.openstreetmap.org/{z}/{x}/{y}.png', {
+    maxZoom: 20, maxNativeZoom: 19, attribution: '&copy; OpenStreetMap contributors'
+}).addTo(map);
+
+function zoneColor(type) { return type.indexOf('Stair') >= 0 ? 'red' : 'orange'; }
+
+var GeoJsonTiles = L.GridLayer.extend({
+    initialize: function (options) {
+        L.GridLayer.prototype.initialize.call(this, options);
+        this._features = {};
+        this.on('tileunload', function (e) {
+            var key = this._tileCoordsToKey(e.coords);
+            if (this._features[key]) { map.removeLayer(this._features[key]); delete this._features[key]; }
+        });
+    },
+    createTile: function (coords, done) {
+        var tile = document.createElement('div');
+        var key = this._tileCoordsToKey(coords), self = this;
+        fetch(coords.z + '/' + coords.x + '/' + coords.y + '__TILE_EXT__')
+            .then(function (response) { return response.ok ? response.json() : null; })
+            .then(function (data) {
+                if (data && self._tiles[key]) {
+                    self._features[key] = L.geoJSON(data, {
+                        style: function () { return {color: 'blue', weight: 4, opacity: 0.6}; },
+                        pointToLayer: function (feature, latlng) {
+                            var p = feature.properties;
+                            return L.circleMarker(latlng, {radius: 6 + Math.min(p.observations, 10), color: zoneColor(p.type),
+                                                           fillOpacity: 0.5})
+                                .bindPopup('<b>' + p.type + '</b><br>관측 ' + p.observations + '회, 윈도우 ' + p.points_count + '개');
+                        }
+                    }).addTo(map);
+                }
+                done(null, tile);
+            })
+            .catch(function () { done(null, tile); });
+        return tile;
+    }
+});
+new GeoJsonTiles({minNativeZoom: MIN_ZOOM, maxNativeZoom: MAX_ZOOM, minZoom: MIN_ZOOM, maxZoom: 20}).addTo(map);
+</script>
+</body>
+</html>
+"""
+
+
+def write_map_page(out_dir, manifest):
+    center = manifest['center'] or [37.5665, 126.9780]
+    page = (MAP_PAGE.replace('__MIN_ZOOM__', str(manifest['min_zoom'])).replace('__MAX_ZOOM__', str(manifest['max_zoom']))
+            .replace('__CENTER__', json.dumps(center)).replace('__TILE_EXT__', TILE_EXT))
+    with open(os.path.join(out_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(page)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="세션 경로와 구역을 z/x/y GeoJSON 타일로 내보냅니다. (바뀐 세션만)")
+    parser.add_argument('inputs', nargs='+', help="로그 폴더, glob 패턴 또는 파일 경로")
+    parser.add_argument('--db', default=ZONE_DB_PATH, help="구역 지도 데이터베이스 (기본: %(default)s)")
+    parser.add_argument('--out', default=TILE_DIR, help="타일 폴더 (기본: %(default)s)")
+    parser.add_argument('--min-zoom', type=int, default=MIN_ZOOM)
+    parser.add_argument('--max-zoom', type=int, default=MAX_ZOOM)
+    parser.add_argument('--force', action='store_true', help="모든 세션을 다시 내보냅니다")
+    args = parser.parse_args()
+    export_tiles(args.inputs, args.out, args.db, args.force, args.min_zoom, args.max_zoom)
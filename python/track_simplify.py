@@ -0,0 +1,143 @@
+# track_simplify.py
+# 지도(folium)에 그리는 경로 선의 단순화와 줌 단계별 상세도(level of detail)
+# 로그의 경로는 IMU 행(50Hz)마다 한 점이라 같은 GPS fix 가 수십 번 반복되고, 이걸 그대로 PolyLine 에 넣으면
+# HTML 이 수 MB 가 됩니다. 여기서는
+#   1) 연속으로 반복된 좌표를 하나로 줄이고
+#   2) Douglas–Peucker 단순화(허용 오차 m)를 배열 연산으로 적용한 뒤
+#   3) 줌 단계마다 그 줌의 화면 1픽셀 정도 오차로 단순화한 선을 따로 만들어, 지도 줌에 맞는 것 하나만 보이게 합니다.
+# 거리 오차는 허용 오차 안이므로 가장 확대한 화면(거리 수준)에서는 원래 선과 구별되지 않습니다.
+
+import numpy as np
+import folium
+from branca.element import MacroElement
+from jinja2 import Template
+
+# ---------------------------
+# 설정
+# ---------------------------
+# 가장 확대한 줌(LOD_BASE_ZOOM)에서의 허용 오차 (m). 위도 37도, 줌 18 에서 화면 1픽셀 ≈ 0.47m
+LOD_BASE_TOLERANCE_M = 0.5
+LOD_BASE_ZOOM = 18
+# 상세도를 따로 만드는 줌 단계. 줌이 하나 작아질 때마다 1픽셀의 길이가 2배이므로 허용 오차도 2배씩 커집니다.
+LOD_ZOOMS = (12, 14, 16, 18)
+
+# 위도 1도의 길이 (m)
+METERS_PER_DEG_LAT = 111_320.0
+
+
+def dedupe_points(lat, lon):
+    """빈 값(NaN)인 점과 바로 앞 점과 같은 점을 뺀 좌표 배열 (n, 2)."""
+    points = np.column_stack([np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)])
+    points = points[~np.isnan(points).any(axis=1)]
+    if len(points) < 2:
+        return points
+    changed = np.r_[True, (points[1:] != points[:-1]).any(axis=1)]
+    return points[changed]
+
+
+def douglas_peucker_mask(x, y, tolerance):
+    """
+    Douglas–Peucker 단순화로 남길 점을 True 로 표시합니다. (x, y 는 같은 단위, tolerance 도 그 단위)
+    재귀 대신, 한 번의 반복마다 '현재 남긴 점들로 나뉜 모든 구간'에서 가장 먼 점을 동시에 찾아 남깁니다.
+    (반복 횟수 = 재귀 깊이, 한 번의 반복은 점 수에 비례하는 배열 연산)
+    """
+    n = len(x)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[[0, n - 1]] = True
+    if n < 3:
+        return keep
+    active = np.ones(n, dtype=bool)   # 아직 단순화가 끝나지 않은 구간에 속한 점
+    while True:
+        kept = np.flatnonzero(keep)
+        # 점마다 속한 구간 [kept[seg], kept[seg + 1]]
+        seg = np.minimum(np.searchsorted(kept, np.arange(n), side='right') - 1, len(kept) - 2)
+        a, b = kept[seg], kept[seg + 1]
+        # 점에서 선분 a-b 까지의 거리 (선분 양 끝이 같은 점이면 그 점까지의 거리)
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        length2 = dx * dx + dy * dy
+        t = np.clip(((x - x[a]) * dx + (y - y[a]) * dy) / np.where(length2 > 0, length2, 1.0), 0.0, 1.0)
+        dist = np.hypot(x - (x[a] + t * dx), y - (y[a] + t * dy))
+        dist[keep | ~active] = -1.0
+
+        # 점은 구간 순서대로 놓여 있으므로 구간별 최댓값은 구간 시작 위치로 reduceat 하면 됩니다.
+        seg_max = np.maximum.reduceat(dist, kept[:-1])
+        split = seg_max > tolerance
+        if not split.any():
+            return keep
+        # 나눌 구간마다 가장 먼 점(여러 개면 첫 번째)을 남깁니다.
+        candidates = np.flatnonzero((dist == seg_max[seg]) & split[seg])
+        _, first = np.unique(seg[candidates], return_index=True)
+        keep[candidates[first]] = True
+        # 더 나눌 필요가 없는 구간의 점은 다음 반복부터 보지 않습니다.
+        active &= split[seg]
+
+
+def simplify_track(lat, lon, tolerance_m):
+    """
+    위경도 경로를 허용 오차 tolerance_m (m) 로 단순화해 [[lat, lon], ...] 배열 (m, 2) 로 반환합니다.
+    짧은 거리이므로 경로 평균 위도 기준의 등장방형 투영(m)에서 계산합니다.
+    """
+    points = dedupe_points(lat, lon)
+    if len(points) < 3 or tolerance_m <= 0:
+        return points
+    cos_lat = np.cos(np.radians(points[:, 0].mean()))
+    y = points[:, 0] * METERS_PER_DEG_LAT
+    x = points[:, 1] * METERS_PER_DEG_LAT * cos_lat
+    return points[douglas_peucker_mask(x - x[0], y - y[0], tolerance_m)]
+
+
+def lod_tolerance_m(zoom):
+    """줌 단계의 허용 오차 (m). LOD_BASE_ZOOM 에서 LOD_BASE_TOLERANCE_M, 줌이 하나 작아질 때마다 2배."""
+    return LOD_BASE_TOLERANCE_M * 2.0 ** (LOD_BASE_ZOOM - zoom)
+
+
+class ZoomLevelSwitch(MacroElement):
+    """줌이 바뀔 때마다 (최대 줌, 레이어) 목록에서 현재 줌에 맞는 레이어 하나만 지도에 남깁니다."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function () {
+            var map = {{ this._parent.get_name() }};
+            var levels = [{% for zoom, layer in this.levels %}[{{ zoom }}, {{ layer.get_name() }}],{% endfor %}];
+            function update() {
+                var zoom = map.getZoom();
+                var chosen = levels[levels.length - 1][1];
+                for (var i = levels.length - 1; i >= 0; i--) { if (zoom <= levels[i][0]) { chosen = levels[i][1]; } }
+                levels.forEach(function (level) {
+                    if (level[1] === chosen) { map.addLayer(level[1]); } else { map.removeLayer(level[1]); }
+                });
+            }
+            map.on('zoomend', update);
+            update();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, levels):
+        super().__init__()
+        self._name = 'ZoomLevelSwitch'
+        self.levels = levels
+
+
+def add_tracks_with_lod(m, tracks, zooms=LOD_ZOOMS):
+    """
+    경로들을 줌 단계별로 단순화해 지도 m 에 넣습니다.
+    tracks: [(lat 배열, lon 배열, folium.PolyLine 인자 dict), ...]
+    줌 z 이하(그리고 더 작은 단계보다 큰 줌)에서는 z 단계의 선이, 가장 큰 단계보다 더 확대하면 가장 자세한 선이 보입니다.
+    반환값: 단계별 점 수 {줌: 점 수}
+    """
+    levels, counts = [], {}
+    for zoom in sorted(zooms):
+        layer = folium.FeatureGroup(name=f'track_z{zoom}', control=False, show=False)
+        counts[zoom] = 0
+        for lat, lon, kwargs in tracks:
+            points = simplify_track(lat, lon, lod_tolerance_m(zoom))
+            if len(points) >= 2:
+                folium.PolyLine(points.tolist(), **kwargs).add_to(layer)
+                counts[zoom] += len(points)
+        layer.add_to(m)
+        levels.append((zoom, layer))
+    ZoomLevelSwitch(levels).add_to(m)
+    return counts
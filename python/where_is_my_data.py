@@ -1,22 +1,56 @@
+import numpy as np
 import pandas as pd
 
+from log_writer import ns_to_datetime
+from loss_tracker import LossTracker
+from sensor_log import iter_log_chunks, timestamps_ns
+
 # --- 설정 ---
-# 1. 분석할 CSV 파일 경로를 지정하세요.
+# 1. 분석할 로그 파일 경로를 지정하세요. (CSV / Parquet / 세션 .bin)
 FILE_PATH = 'sensor_log_2025-09-26_03-40-56.csv'  # 👈 여기에 실제 파일명을 입력하세요.
 
-# 2. 아두이노에서 설정한 데이터 전송 주파수 (Hz)
+# 2. 아두이노에서 설정한 데이터 전송 주파수 (Hz). seq 가 없는 (텍스트 프레임) 로그에서만 사용됩니다.
 EXPECTED_HZ = 50.0
 
+# 3. 한 번에 읽을 행 수. 파일 크기와 상관없이 이만큼씩만 메모리에 올립니다.
+CHUNK_ROWS = 100_000
+
 # --- 프로그램 ---
 
+def feed_chunk(tracker, df):
+    """
+    로그 조각 하나를 손실 집계 엔진에 넣습니다.
+    seq 가 있는 행(바이너리 프레임)과 없는 행(텍스트 프레임)이 섞여 있으면 연속 구간별로 나눠 넣습니다.
+    """
+    timestamps = timestamps_ns(df)
+    if 'seq' not in df.columns:
+        tracker.update(timestamps)
+        return
+
+    has_seq = df['seq'].notna().to_numpy()
+    seq = df['seq'].to_numpy(dtype='float64', na_value=np.nan)
+    device_ms = df['device_ms'].to_numpy(dtype='float64', na_value=np.nan) if 'device_ms' in df.columns else None
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(has_seq)) + 1, [len(df)]))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if has_seq[start]:
+            ms = device_ms[start:end] if device_ms is not None else None
+            tracker.update(timestamps[start:end], seq[start:end].astype('int64'),
+                           ms.astype('int64') if ms is not None and not np.isnan(ms).any() else None)
+        else:
+            tracker.update(timestamps[start:end])
+
+
 def analyze_timestamp_gaps(file_path, frequency):
-    """CSV 파일의 타임스탬프를 분석하여 데이터 누락을 검증합니다."""
-    
+    """로그 파일을 조각씩 읽으며 데이터 누락을 검증합니다. (수신 서버와 같은 LossTracker 엔진 사용)"""
+
     print(f"'{file_path}' 파일을 분석합니다...")
-    
+
+    tracker = LossTracker(expected_hz=frequency)
     try:
-        # CSV 파일을 읽고, 'timestamp' 컬럼을 datetime 객체로 변환
-        df = pd.read_csv(file_path, parse_dates=['timestamp'])
+        # 수신 시각과 seq/device_ms 컬럼만 읽습니다.
+        # (예전 로그는 isoformat 문자열 'timestamp', 새 로그는 정수 나노초 'timestamp_ns' 컬럼)
+        for chunk in iter_log_chunks(file_path, CHUNK_ROWS, columns=['timestamp', 'timestamp_ns', 'seq', 'device_ms']):
+            feed_chunk(tracker, chunk)
     except FileNotFoundError:
         print(f"❗️ 오류: 파일을 찾을 수 없습니다. -> {file_path}")
         return
@@ -24,61 +58,49 @@ def analyze_timestamp_gaps(file_path, frequency):
         print(f"❗️ 오류: 파일을 읽는 중 문제가 발생했습니다. -> {e}")
         return
 
-    if df.empty:
+    if tracker.received == 0:
         print("❗️ 파일이 비어있거나 데이터를 읽을 수 없습니다.")
         return
 
-    # 기본 정보 계산
-    actual_rows = len(df)
-    start_time = df['timestamp'].iloc[0]
-    end_time = df['timestamp'].iloc[-1]
+    print_report(tracker)
+
+
+def print_report(tracker):
+    summary = tracker.summary()
+    start_time, end_time = ns_to_datetime(pd.Series([tracker.first_ns, tracker.last_ns]))
     total_duration = end_time - start_time
-    total_duration_s = total_duration.total_seconds()
-    
-    expected_rows = int(total_duration_s * frequency)
-    loss_percentage = max(0, (1 - actual_rows / expected_rows)) * 100 if expected_rows > 0 else 0
 
     print("\n--- 전체 데이터 요약 ---")
     print(f"기록 시작 시간: {start_time}")
     print(f"기록 종료 시간: {end_time}")
-    print(f"총 기록 시간: {total_duration} (약 {total_duration_s:.2f}초)")
-    print(f"기대 데이터 수: {expected_rows} 개")
-    print(f"실제 데이터 수: {actual_rows} 개")
-    print(f"데이터 손실률: {loss_percentage:.2f}%")
-
-    # 각 행 사이의 시간 간격 계산
-    df['time_diff_s'] = df['timestamp'].diff().dt.total_seconds()
-
-    # 예상 시간 간격 (50Hz -> 0.02초)
-    expected_interval_s = 1 / frequency
-    
-    # 예상 간격의 2배를 초과하는 경우를 '누락'으로 간주
-    gap_threshold_s = expected_interval_s * 2
-    
-    gaps_df = df[df['time_diff_s'] > gap_threshold_s]
+    print(f"총 기록 시간: {total_duration} (약 {summary['duration_seconds']:.2f}초)")
+    print(f"기대 데이터 수: {summary['received'] + summary['lost']} 개")
+    print(f"실제 데이터 수: {summary['received']} 개")
+    print(f"데이터 손실률: {summary['loss_rate'] * 100:.2f}%")
+    if summary['out_of_order'] or summary['resets']:
+        print(f"순서 뒤바뀜/중복: {summary['out_of_order']} 개, 장치 재시작: {summary['resets']} 회")
 
     print("\n--- 데이터 누락 상세 분석 ---")
-    if gaps_df.empty:
+    if summary['gap_count'] == 0:
         print("✅ 데이터 누락이 감지되지 않았습니다.")
-    else:
-        num_gaps = len(gaps_df)
-        avg_gap_duration = gaps_df['time_diff_s'].mean()
-        max_gap_duration = gaps_df['time_diff_s'].max()
-
-        print(f"❗️ 총 {num_gaps}개의 데이터 누락 구간이 감지되었습니다.")
-        print(f"평균 누락 시간: {avg_gap_duration:.2f}초")
-        print(f"최대 누락 시간: {max_gap_duration:.2f}초")
-
-        print("\n가장 큰 누락 구간 Top 5 (발생 시점과 누락된 시간):")
-        
-        # 'time_diff_s'를 기준으로 가장 큰 5개의 누락 구간을 찾음
-        top_gaps = gaps_df.nlargest(5, 'time_diff_s')
-        
-        for index, row in top_gaps.iterrows():
-            # 누락은 (이전 행)과 (현재 행) 사이에서 발생했음
-            gap_start_time = df['timestamp'].iloc[index - 1]
-            gap_duration = row['time_diff_s']
-            print(f" - {gap_start_time} 부터 약 {gap_duration:.2f}초 동안 데이터 누락")
+        return
+
+    print(f"❗️ 총 {summary['gap_count']}개의 데이터 누락 구간이 감지되었습니다.")
+    print(f"평균 누락 시간: {summary['mean_gap_seconds']:.2f}초")
+    print(f"최대 누락 시간: {summary['max_gap_seconds']:.2f}초")
+
+    print("\n누락 시간 분포:")
+    histogram = tracker.histogram()
+    for i, (edge, count) in enumerate(histogram):
+        upper = f"{histogram[i + 1][0]:g}초" if i + 1 < len(histogram) else ""
+        print(f" - {edge:g}초 ~ {upper}: {count}개")
+
+    top_gaps = tracker.top_gaps()
+    print(f"\n가장 큰 누락 구간 Top {len(top_gaps)} (발생 시점과 누락된 시간):")
+    gap_start_times = ns_to_datetime(pd.Series([start_ns for _, start_ns, _ in top_gaps], dtype='int64'))
+    for (gap_duration, _, missing), gap_start_time in zip(top_gaps, gap_start_times):
+        # 누락은 (이전 행)과 (현재 행) 사이에서 발생했음
+        print(f" - {gap_start_time} 부터 약 {gap_duration:.2f}초 동안 데이터 누락 ({missing}개)")
 
 if __name__ == '__main__':
-    analyze_timestamp_gaps(FILE_PATH, EXPECTED_HZ)
\ No newline at end of file
+    analyze_timestamp_gaps(FILE_PATH, EXPECTED_HZ)
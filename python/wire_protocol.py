@@ -0,0 +1,229 @@
+# wire_protocol.py
+# 보드 -> 서버 패킷 형식 정의와 디코더
+# 기존 CSV 텍스트 프레임과, 버전이 붙은 바이너리 프레임(Hackathon.ino 의 USE_BINARY_FRAME)을 모두 해석합니다.
+
+from collections import namedtuple
+
+import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
+
+from sensor_features import FRAME_COLUMNS
+
+# ---------------------------
+# 바이너리 프레임 정의 (리틀 엔디언, 패딩 없음)
+# ---------------------------
+MAGIC = b'HK'
+PROTOCOL_VERSION = 1
+KIND_SAMPLE = 1   # 샘플 1개짜리 프레임
+KIND_BATCH = 2    # 샘플 여러 개를 묶은 프레임 (Hackathon.ino 의 FRAME_BATCH_SIZE)
+
+HEADER_FIELDS = [
+    ('magic', 'S2'),
+    ('version', 'u1'),
+    ('kind', 'u1'),
+    ('device_id', '<u2'),
+    ('seq', '<u4'),       # 장치가 프레임마다 1씩 증가시키는 일련번호
+    ('millis', '<u4'),    # 장치의 millis() 값
+]
+
+# lat/lon 은 1e-7도 단위 int32, IMU 값은 int16 고정소수점으로 보냅니다.
+PAYLOAD_FIELDS = [('lat', '<i4'), ('lon', '<i4')] + [(col, '<i2') for col in FRAME_COLUMNS[2:]]
+PAYLOAD_SCALES = np.array([1e7, 1e7,            # 도(degree)
+                           1000, 1000, 1000,    # 가속도: mg
+                           100, 100, 100,       # 자이로: 0.01 deg/s
+                           10, 10, 10])         # 지자기: 0.1 uT
+
+SAMPLE_FRAME_DTYPE = np.dtype(HEADER_FIELDS + PAYLOAD_FIELDS)   # 40 바이트
+
+# 배치 프레임: 헤더(seq, millis 는 첫 샘플 기준) 뒤에 샘플이 count 개 이어집니다.
+BATCH_HEADER_DTYPE = np.dtype(HEADER_FIELDS + [('count', 'u1'), ('reserved', 'u1')])   # 16 바이트
+BATCH_SAMPLE_DTYPE = np.dtype([('offset_ms', '<u2')] + PAYLOAD_FIELDS)                # 28 바이트
+
+# 스트림(TCP)에서 배치 헤더의 샘플 수가 들어 있는 위치 (길이 접두사 역할)
+BATCH_COUNT_OFFSET = BATCH_HEADER_DTYPE.fields['count'][1]
+
+# 스트림에서 줄바꿈 없이 이 길이를 넘는 텍스트는 깨진 데이터로 보고 버립니다.
+MAX_TEXT_LINE = 512
+
+# 디코딩 결과. 텍스트 프레임이면 seq, millis 는 None 이고, values 는 항상 (샘플 수, 11) 배열입니다.
+Packet = namedtuple('Packet', ['device_id', 'seq', 'millis', 'values'])
+
+
+def is_binary_frame(data):
+    return data[:2] == MAGIC
+
+
+def decode_text(data):
+    """
+    CSV 텍스트 프레임을 해석합니다.
+    값이 11개면 장치 ID 없이, 맨 앞에 장치 ID가 붙은 12개 필드면 그 ID와 함께 반환합니다.
+    """
+    fields = data.decode('utf-8').strip().split(',')
+    device_id = None
+    if len(fields) == len(FRAME_COLUMNS) + 1:
+        device_id = fields[0].strip()
+        fields = fields[1:]
+    if len(fields) != len(FRAME_COLUMNS):
+        raise ValueError(f"필드 개수가 {len(fields)}개입니다 (기대값 {len(FRAME_COLUMNS)}개)")
+    values = np.array([list(map(float, fields))])
+    return Packet(device_id, None, None, values)
+
+
+def _payload_to_values(samples):
+    return structured_to_unstructured(samples[FRAME_COLUMNS], dtype=np.float64) / PAYLOAD_SCALES
+
+
+def _check_header(header, kind):
+    if header['magic'] != MAGIC:
+        raise ValueError("바이너리 프레임 헤더가 올바르지 않습니다")
+    if header['version'] != PROTOCOL_VERSION:
+        raise ValueError(f"지원하지 않는 프로토콜 버전입니다: {header['version']}")
+    if header['kind'] != kind:
+        raise ValueError(f"프레임 종류가 섞여 있습니다: {header['kind']}")
+
+
+def decode_samples(data):
+    """
+    샘플 프레임을 numpy.frombuffer 로 한 번에 해석합니다.
+    같은 장치의 프레임 여러 개가 이어 붙어 있어도(TCP 등) 한 번에 처리합니다.
+    """
+    if len(data) == 0 or len(data) % SAMPLE_FRAME_DTYPE.itemsize != 0:
+        raise ValueError(f"바이너리 프레임 길이가 맞지 않습니다: {len(data)} 바이트")
+    frames = np.frombuffer(data, dtype=SAMPLE_FRAME_DTYPE)
+    if (frames['magic'] != MAGIC).any() or (frames['kind'] != KIND_SAMPLE).any():
+        raise ValueError("바이너리 프레임 헤더가 올바르지 않습니다")
+    _check_header(frames[0], KIND_SAMPLE)
+    return Packet(int(frames['device_id'][0]), frames['seq'].astype(np.int64),
+                  frames['millis'].astype(np.int64), _payload_to_values(frames))
+
+
+def decode_batch(data):
+    """배치 프레임 하나를 (샘플 수, 11) 블록으로 한 번에 풀어냅니다. 샘플별 seq/millis 는 헤더 기준으로 계산합니다."""
+    if len(data) < BATCH_HEADER_DTYPE.itemsize:
+        raise ValueError(f"배치 프레임이 너무 짧습니다: {len(data)} 바이트")
+    header = np.frombuffer(data, dtype=BATCH_HEADER_DTYPE, count=1)[0]
+    _check_header(header, KIND_BATCH)
+    count = int(header['count'])
+    if count == 0:
+        raise ValueError("샘플이 없는 배치 프레임입니다")
+    if len(data) != BATCH_HEADER_DTYPE.itemsize + count * BATCH_SAMPLE_DTYPE.itemsize:
+        raise ValueError(f"배치 프레임 길이가 맞지 않습니다: {len(data)} 바이트, 샘플 {count}개")
+    samples = np.frombuffer(data, dtype=BATCH_SAMPLE_DTYPE, count=count, offset=BATCH_HEADER_DTYPE.itemsize)
+    seq = int(header['seq']) + np.arange(count, dtype=np.int64)
+    millis = int(header['millis']) + samples['offset_ms'].astype(np.int64)
+    return Packet(int(header['device_id']), seq, millis, _payload_to_values(samples))
+
+
+def decode_binary(data):
+    """프레임 종류(샘플/배치)에 맞는 바이너리 디코더를 선택합니다."""
+    if len(data) < 4:
+        raise ValueError(f"바이너리 프레임이 너무 짧습니다: {len(data)} 바이트")
+    if data[3] == KIND_BATCH:
+        return decode_batch(data)
+    if data[3] == KIND_SAMPLE:
+        return decode_samples(data)
+    raise ValueError(f"알 수 없는 프레임 종류입니다: {data[3]}")
+
+
+def decode_packet(data):
+    """헤더를 보고 바이너리/텍스트 중 알맞은 디코더를 선택합니다."""
+    if is_binary_frame(data):
+        return decode_binary(data)
+    return decode_text(data)
+
+
+def split_stream(buf):
+    """
+    스트림(TCP 등) 재조립 버퍼에서 완성된 프레임들을 잘라냅니다.
+    텍스트 프레임은 줄바꿈으로, 바이너리 프레임은 헤더의 종류와 샘플 수로 길이를 알아냅니다.
+    (완성된 프레임 목록, 소비한 바이트 수)를 반환하며, 남은 바이트는 다음 수신 데이터와 이어 붙여 다시 넘기면 됩니다.
+    """
+    frames = []
+    pos = 0
+    n = len(buf)
+    while pos < n:
+        if buf[pos:pos + 2] == MAGIC:
+            if n - pos < 4:
+                break
+            kind = buf[pos + 3]
+            if kind == KIND_SAMPLE:
+                length = SAMPLE_FRAME_DTYPE.itemsize
+            elif kind == KIND_BATCH:
+                if n - pos < BATCH_HEADER_DTYPE.itemsize:
+                    break
+                length = BATCH_HEADER_DTYPE.itemsize + buf[pos + BATCH_COUNT_OFFSET] * BATCH_SAMPLE_DTYPE.itemsize
+            else:
+                # 알 수 없는 종류: 한 바이트씩 건너뛰며 다음 프레임 경계를 찾습니다.
+                pos += 1
+                continue
+            if n - pos < length:
+                break
+            frames.append(bytes(buf[pos:pos + length]))
+            pos += length
+        else:
+            end = buf.find(b'\n', pos)
+            if end < 0:
+                if n - pos > MAX_TEXT_LINE:
+                    pos = n
+                break
+            line = bytes(buf[pos:end]).strip()
+            if line:
+                frames.append(line)
+            pos = end + 1
+    return frames, pos
+
+
+def merge_packets(packets):
+    """같은 장치에서 연달아 온 패킷들을 하나의 블록으로 합칩니다. (seq 유무가 같은 패킷끼리만 합쳐야 합니다)"""
+    if len(packets) == 1:
+        return packets[0]
+    values = np.concatenate([p.values for p in packets])
+    if packets[0].seq is None:
+        return Packet(packets[0].device_id, None, None, values)
+    return Packet(packets[0].device_id,
+                  np.concatenate([p.seq for p in packets]),
+                  np.concatenate([p.millis for p in packets]),
+                  values)
+
+
+def _scale_payload(target, values):
+    scaled = np.rint(np.atleast_2d(values) * PAYLOAD_SCALES)
+    for i, (col, dtype) in enumerate(PAYLOAD_FIELDS):
+        info = np.iinfo(np.dtype(dtype))
+        target[col] = np.clip(scaled[:, i], info.min, info.max)
+
+
+def _fill_header(header, kind, device_id, seq, millis):
+    header['magic'] = MAGIC
+    header['version'] = PROTOCOL_VERSION
+    header['kind'] = kind
+    header['device_id'] = device_id
+    header['seq'] = seq
+    header['millis'] = millis
+
+
+def encode_frames(device_id, seq, millis, values):
+    """
+    (샘플 수, 11) 배열을 샘플 프레임들로 직렬화합니다. (재전송/부하 테스트용)
+    seq, millis 는 샘플마다의 배열이거나 첫 샘플의 값(이후 1씩 / 그대로 증가)일 수 있습니다.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    n = len(values)
+    frames = np.zeros(n, dtype=SAMPLE_FRAME_DTYPE)
+    _fill_header(frames, KIND_SAMPLE, device_id, seq if np.ndim(seq) else seq + np.arange(n), millis)
+    _scale_payload(frames, values)
+    return frames.tobytes()
+
+
+def encode_batch(device_id, seq, millis, values, offsets_ms):
+    """(샘플 수, 11) 배열을 배치 프레임 하나로 직렬화합니다. seq, millis 는 첫 샘플 기준 값입니다."""
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    if not 0 < len(values) <= 255:
+        raise ValueError("배치 프레임에는 1~255개의 샘플만 담을 수 있습니다")
+    header = np.zeros(1, dtype=BATCH_HEADER_DTYPE)
+    _fill_header(header, KIND_BATCH, device_id, seq, millis)
+    header['count'] = len(values)
+    samples = np.zeros(len(values), dtype=BATCH_SAMPLE_DTYPE)
+    samples['offset_ms'] = offsets_ms
+    _scale_payload(samples, values)
+    return header.tobytes() + samples.tobytes()
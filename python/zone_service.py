@@ -0,0 +1,338 @@
+# zone_service.py
+# 경로 안내 클라이언트용 위험 구역 조회 HTTP 서비스 (aiohttp)
+# 구역 지도 데이터베이스(zone_store.py)의 구역을 메모리의 격자(grid) 공간 인덱스에 올려 두고
+# "이 사각형 안의 구역", "이 지점 반경 안의 구역" 질의에 답합니다.
+# 같은 질의의 응답(JSON 바이트)은 LRU 캐시에 두고, 새 세션이 지도에 들어오면 인덱스를 다시 만들면서 캐시를 비웁니다.
+#
+# GET  /zones?bbox=위도_최소,경도_최소,위도_최대,경도_최대[&type=stair|ramp]
+# GET  /zones/near?lat=37.5&lon=127.0[&radius=50][&type=stair|ramp]    (가까운 순서, distance_m 포함)
+# POST /sessions/{세션 이름}   본문: 구역 목록 JSON [{"type": ..., "lat": ..., "lon": ..., "points_count": ...}, ...]
+# GET  /health
+#
+# 사용법: python zone_service.py [--db zone_map.db] [--port 8080]
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from aiohttp import web
+
+from zone_store import METERS_PER_DEG_LAT, ZONE_DB_PATH, ZoneStore
+
+# ---------------------------
+# 설정
+# ---------------------------
+HOST = '0.0.0.0'
+PORT = 8080
+
+# 격자 한 칸의 크기 (도). 0.002도 = 위도 방향 약 220m
+GRID_CELL_DEG = 0.002
+# 응답 캐시에 두는 질의 수
+CACHE_SIZE = 4096
+# 캐시 키를 만들 때 좌표를 반올림하는 자릿수 (6자리 = 약 0.1m). 같은 화면을 다시 요청하면 캐시에서 바로 답합니다.
+CACHE_KEY_DIGITS = 6
+# 다른 프로세스(batch_analysis.py --db 등)가 지도에 세션을 넣었는지 확인하는 주기 (초)
+RELOAD_INTERVAL = 2.0
+
+DEFAULT_RADIUS_M = 50.0
+MAX_RADIUS_M = 5000.0
+# 응답 하나에 담는 최대 구역 수 (넘으면 truncated=true)
+MAX_RESULTS = 2000
+
+# type 파라미터 -> 구역 종류
+ZONE_TYPES = {'stair': 'Stair/Bump Zone', 'ramp': 'Ramp Zone'}
+RESPONSE_FIELDS = ['id', 'type', 'lat', 'lon', 'observations', 'points_count', 'max_variance', 'avg_pitch']
+
+
+class LRUCache:
+    """최근에 쓴 항목을 CACHE_SIZE 개까지 기억하는 캐시."""
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.size:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ZoneIndex:
+    """
+    구역 좌표의 격자 인덱스. 격자 칸마다 그 칸에 속한 구역 번호 배열을 두고,
+    질의 사각형이 걸치는 칸의 후보만 정확한 범위/거리로 걸러냅니다. (만든 뒤에는 읽기 전용)
+    """
+
+    def __init__(self, zones_df, cell_deg=GRID_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.zones = zones_df.reset_index(drop=True)
+        self.lat = self.zones['lat'].to_numpy(dtype=np.float64)
+        self.lon = self.zones['lon'].to_numpy(dtype=np.float64)
+        self.types = self.zones['type'].to_numpy(dtype=object)
+        # JSON 으로 바로 내보낼 수 있도록 구역마다 dict 를 미리 만들어 둡니다. (NaN -> null)
+        records = self.zones[RESPONSE_FIELDS].astype(object).where(self.zones[RESPONSE_FIELDS].notna(), None)
+        self.records = records.to_dict('records')
+
+        self.cells = {}
+        if len(self.zones):
+            keys = np.column_stack([np.floor(self.lat / cell_deg), np.floor(self.lon / cell_deg)]).astype(np.int64)
+            order = np.lexsort((keys[:, 1], keys[:, 0]))
+            keys = keys[order]
+            starts = np.flatnonzero(np.r_[True, (keys[1:] != keys[:-1]).any(axis=1)])
+            for start, end in zip(starts, np.r_[starts[1:], len(order)]):
+                self.cells[(int(keys[start, 0]), int(keys[start, 1]))] = order[start:end]
+
+    def __len__(self):
+        return len(self.zones)
+
+    def bbox(self, lat_min, lon_min, lat_max, lon_max, zone_type=None):
+        """사각형 안의 구역 번호 배열."""
+        i0, i1 = math.floor(lat_min / self.cell_deg), math.floor(lat_max / self.cell_deg)
+        j0, j1 = math.floor(lon_min / self.cell_deg), math.floor(lon_max / self.cell_deg)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) <= len(self.cells):
+            parts = [self.cells[(i, j)] for i in range(i0, i1 + 1) for j in range(j0, j1 + 1) if (i, j) in self.cells]
+        else:
+            # 사각형이 아주 크면 (지도 전체 등) 채워진 칸만 훑는 쪽이 빠릅니다.
+            parts = [ids for (i, j), ids in self.cells.items() if i0 <= i <= i1 and j0 <= j <= j1]
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        ids = np.concatenate(parts)
+        mask = (self.lat[ids] >= lat_min) & (self.lat[ids] <= lat_max) & (self.lon[ids] >= lon_min) & (self.lon[ids] <= lon_max)
+        if zone_type is not None:
+            mask &= self.types[ids] == zone_type
+        return np.sort(ids[mask])
+
+    def near(self, lat, lon, radius_m, zone_type=None):
+        """반경 안의 구역 번호와 거리(m), 가까운 순서."""
+        dlat = radius_m / METERS_PER_DEG_LAT
+        coslat = max(math.cos(math.radians(lat)), 1e-6)
+        dlon = dlat / coslat
+        ids = self.bbox(lat - dlat, lon - dlon, lat + dlat, lon + dlon, zone_type)
+        dist = np.hypot((self.lat[ids] - lat) * METERS_PER_DEG_LAT, (self.lon[ids] - lon) * METERS_PER_DEG_LAT * coslat)
+        keep = dist <= radius_m
+        ids, dist = ids[keep], dist[keep]
+        order = np.argsort(dist, kind='stable')
+        return ids[order], dist[order]
+
+
+class ZoneService:
+    """HTTP 처리기. 인덱스와 캐시는 이벤트 루프 스레드에서만 바꾸고, 데이터베이스 작업은 스레드 풀에서 합니다."""
+
+    def __init__(self, db_path=ZONE_DB_PATH):
+        self.db_path = db_path
+        self.index = ZoneIndex(pd.DataFrame(columns=RESPONSE_FIELDS))
+        self.version = None
+        self.cache = LRUCache()
+        self.loaded_at = None
+        self.queries = 0
+        self._reload_lock = asyncio.Lock()
+        self._tasks = []
+
+    # ---- 데이터 적재 ----
+    def _read_version(self):
+        with ZoneStore(self.db_path) as store:
+            return store.data_version()
+
+    def _load(self):
+        with ZoneStore(self.db_path) as store:
+            version = store.data_version()
+            zones = store.all_zones()
+        return version, ZoneIndex(zones)
+
+    async def reload(self, force=False):
+        """데이터베이스가 바뀌었으면 인덱스를 새로 만들고 캐시를 비웁니다. (만드는 동안에도 이전 인덱스로 응답)"""
+        loop = asyncio.get_running_loop()
+        async with self._reload_lock:
+            if not force and await loop.run_in_executor(None, self._read_version) == self.version:
+                return False
+            version, index = await loop.run_in_executor(None, self._load)
+            self.index, self.version = index, version
+            self.cache.clear()
+            self.loaded_at = time.time()
+            print(f"🗺️ 구역 {len(index)}개를 불러왔습니다. (세션 {version[0]}개)")
+            return True
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(RELOAD_INTERVAL)
+            try:
+                await self.reload()
+            except Exception as e:
+                print(f"구역 지도를 다시 불러오지 못했습니다: {e}")
+
+    async def start_watching(self, app):
+        await self.reload(force=True)
+        self._tasks.append(asyncio.create_task(self._watch()))
+
+    async def stop_watching(self, app):
+        for task in self._tasks:
+            task.cancel()
+
+    # ---- 응답 ----
+    def _respond(self, key, build):
+        self.queries += 1
+        body = self.cache.get(key)
+        if body is None:
+            body = json.dumps(build(), ensure_ascii=False).encode('utf-8')
+            self.cache.put(key, body)
+        return web.Response(body=body, content_type='application/json')
+
+    def _zone_list(self, ids, distances=None):
+        truncated = len(ids) > MAX_RESULTS
+        ids = ids[:MAX_RESULTS]
+        zones = [self.index.records[i] for i in ids]
+        if distances is not None:
+            zones = [dict(zone, distance_m=round(float(d), 2)) for zone, d in zip(zones, distances[:MAX_RESULTS])]
+        return {'count': len(zones), 'truncated': truncated, 'zones': zones}
+
+    async def handle_bbox(self, request):
+        try:
+            lat_min, lon_min, lat_max, lon_max = (float(v) for v in request.query['bbox'].split(','))
+            zone_type = parse_zone_type(request.query.get('type'))
+        except (KeyError, ValueError):
+            raise web.HTTPBadRequest(text="bbox=위도_최소,경도_최소,위도_최대,경도_최대 [, type=stair|ramp] 형식이어야 합니다.")
+        if not (valid_coordinate(lat_min, lon_min) and valid_coordinate(lat_max, lon_max)):
+            raise web.HTTPBadRequest(text=COORDINATE_ERROR)
+        if lat_min > lat_max or lon_min > lon_max:
+            raise web.HTTPBadRequest(text="bbox 의 최솟값이 최댓값보다 큽니다.")
+        key = ('bbox', *(round(v, CACHE_KEY_DIGITS) for v in (lat_min, lon_min, lat_max, lon_max)), zone_type)
+        return self._respond(key, lambda: self._zone_list(self.index.bbox(lat_min, lon_min, lat_max, lon_max, zone_type)))
+
+    async def handle_near(self, request):
+        try:
+            lat, lon = float(request.query['lat']), float(request.query['lon'])
+            radius = float(request.query.get('radius', DEFAULT_RADIUS_M))
+            zone_type = parse_zone_type(request.query.get('type'))
+        except (KeyError, ValueError):
+            raise web.HTTPBadRequest(text="lat, lon [, radius(m), type=stair|ramp] 가 필요합니다.")
+        if not valid_coordinate(lat, lon):
+            raise web.HTTPBadRequest(text=COORDINATE_ERROR)
+        if not 0 < radius <= MAX_RADIUS_M:
+            raise web.HTTPBadRequest(text=f"radius 는 0 보다 크고 {MAX_RADIUS_M:g}m 이하여야 합니다.")
+        key = ('near', round(lat, CACHE_KEY_DIGITS), round(lon, CACHE_KEY_DIGITS), radius, zone_type)
+        return self._respond(key, lambda: self._zone_list(*self.index.near(lat, lon, radius, zone_type)))
+
+    async def handle_ingest(self, request):
+        session = request.match_info['session']
+        try:
+            zones = pd.DataFrame(await request.json())
+        except (ValueError, TypeError, OverflowError):
+            raise web.HTTPBadRequest(text="본문은 구역 목록 JSON 이어야 합니다.")
+        if len(zones) and not {'type', 'lat', 'lon'} <= set(zones.columns):
+            raise web.HTTPBadRequest(text="구역마다 type, lat, lon 이 필요합니다.")
+        if len(zones):
+            # JSON 에서는 문자열 / bool / null 도 들어올 수 있으므로, 숫자인지 직접 확인한 뒤 float 로 바꿉니다.
+            for col in ('lat', 'lon'):
+                if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in zones[col]):
+                    raise web.HTTPBadRequest(text=f"구역의 {col} 은 숫자여야 합니다.")
+                try:
+                    zones[col] = zones[col].astype(np.float64)
+                except OverflowError:
+                    raise web.HTTPBadRequest(text=COORDINATE_ERROR)
+            if not all(map(valid_coordinate, zones['lat'], zones['lon'])):
+                raise web.HTTPBadRequest(text=COORDINATE_ERROR)
+            if not all(isinstance(v, str) for v in zones['type']):
+                raise web.HTTPBadRequest(text="구역의 type 은 문자열이어야 합니다.")
+            # 나머지 값은 없어도(null) 되지만, 있으면 병합 가중 평균에 쓰이므로 범위를 확인합니다.
+            if 'points_count' in zones.columns and not all(_missing(v) or _positive_int(v) for v in zones['points_count']):
+                raise web.HTTPBadRequest(text="구역의 points_count 는 1 이상의 정수여야 합니다.")
+            for col in ('max_variance', 'avg_pitch'):
+                if col in zones.columns and not all(_missing(v) or _finite_number(v) for v in zones[col]):
+                    raise web.HTTPBadRequest(text=f"구역의 {col} 은 유한한 숫자이거나 null 이어야 합니다.")
+
+        def ingest():
+            with ZoneStore(self.db_path) as store:
+                if store.has_session(session):
+                    return None
+                return store.ingest(session, zones)
+
+        result = await asyncio.get_running_loop().run_in_executor(None, ingest)
+        if result is None:
+            raise web.HTTPConflict(text=f"'{session}' 세션은 이미 지도에 있습니다.")
+        await self.reload(force=True)
+        return web.json_response({'session': session, 'merged': result[0], 'inserted': result[1], 'zones': len(self.index)})
+
+    async def handle_health(self, request):
+        return web.json_response({'zones': len(self.index), 'sessions': self.version[0] if self.version else 0,
+                                  'loaded_at': self.loaded_at, 'queries': self.queries,
+                                  'cache': {'size': len(self.cache), 'hits': self.cache.hits, 'misses': self.cache.misses}})
+
+
+COORDINATE_ERROR = "위도는 -90~90, 경도는 -180~180 사이의 유한한 숫자여야 합니다."
+
+
+def valid_coordinate(lat, lon):
+    """NaN / 무한대가 아니고 위도·경도 범위 안이면 True. (격자 칸 계산의 math.floor 가 실패하지 않도록)"""
+    return math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180
+
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _finite_number(value):
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return False
+    try:
+        return math.isfinite(value)
+    except OverflowError:
+        return False
+
+
+def _positive_int(value):
+    # 정수가 섞인 열은 pandas 가 float 로 바꾸므로 5.0 같은 값도 정수로 봅니다. (SQLite 정수 범위 안)
+    return _finite_number(value) and float(value).is_integer() and 0 < value < 2 ** 63
+
+
+def parse_zone_type(value):
+    if value is None or value == '':
+        return None
+    if value not in ZONE_TYPES:
+        raise ValueError(value)
+    return ZONE_TYPES[value]
+
+
+def make_app(db_path=ZONE_DB_PATH):
+    service = ZoneService(db_path)
+    app = web.Application()
+    app['zone_service'] = service
+    app.router.add_get('/zones', service.handle_bbox)
+    app.router.add_get('/zones/near', service.handle_near)
+    app.router.add_post('/sessions/{session}', service.handle_ingest)
+    app.router.add_get('/health', service.handle_health)
+    app.on_startup.append(service.start_watching)
+    app.on_cleanup.append(service.stop_watching)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="구역 지도 데이터베이스의 위험 구역을 HTTP 로 조회하는 서비스")
+    parser.add_argument('--db', default=ZONE_DB_PATH, help="구역 지도 데이터베이스 (기본: %(default)s)")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    args = parser.parse_args()
+    print(f"✅ 구역 조회 서비스를 http://{args.host}:{args.port} 에서 시작합니다. (지도: '{args.db}')")
+    web.run_app(make_app(args.db), host=args.host, port=args.port, print=None)
@@ -0,0 +1,208 @@
+# zone_store.py
+# 여러 세션의 구역(Stair/Bump, Ramp)을 하나로 합쳐 두는 지도 데이터베이스 (SQLite + R*Tree 공간 인덱스)
+# 세션 분석 결과(process_and_cluster_zones 의 구역 표)를 넣으면, 같은 종류의 기존 구역 중 MERGE_RADIUS_M 안에서
+# 가장 가까운 것과 합치고 (없으면 새 구역), 관측 횟수 / 윈도우 수 / 최대 분산 / 평균 pitch 를 누적 값으로 갱신합니다.
+# 주변 구역은 R*Tree 로 찾으므로, 세션 하나를 넣는 시간은 지도 전체 크기가 아니라 그 세션의 구역 수에 비례합니다.
+#
+# 사용법: python zone_store.py add batch_results/special/*_zones.csv   (파일 이름에서 _zones 를 뗀 것이 세션 이름)
+#         python zone_store.py export merged_zones.csv
+#         (--db 로 데이터베이스 파일을 바꿀 수 있습니다. 기본: ZONE_DB_PATH)
+
+import argparse
+import math
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+# ---------------------------
+# 설정
+# ---------------------------
+ZONE_DB_PATH = 'zone_map.db'
+# 이 거리(m) 안의 같은 종류 구역은 같은 장소(같은 계단 등)로 보고 합칩니다.
+MERGE_RADIUS_M = 10.0
+
+# 위도 1도의 길이 (m). 병합 반경 정도의 짧은 거리는 등장방형(equirectangular) 근사로 충분합니다.
+METERS_PER_DEG_LAT = 111_320.0
+
+ZONE_COLUMNS = ['id', 'type', 'lat', 'lon', 'observations', 'points_count', 'max_variance', 'avg_pitch',
+                'first_session', 'last_session']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS zones (
+    id            INTEGER PRIMARY KEY,
+    type          TEXT    NOT NULL,
+    lat           REAL    NOT NULL,   -- 합쳐진 구역들의 윈도우 수 가중 평균 위치
+    lon           REAL    NOT NULL,
+    observations  INTEGER NOT NULL,   -- 합쳐진 세션 구역 수
+    points_count  INTEGER NOT NULL,   -- 윈도우 수 합
+    max_variance  REAL,               -- z 분산 최댓값
+    avg_pitch     REAL,               -- 윈도우 수 가중 평균 pitch
+    first_session TEXT,
+    last_session  TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS zone_index USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+CREATE TABLE IF NOT EXISTS sessions (
+    name        TEXT PRIMARY KEY,
+    ingested_ns INTEGER NOT NULL,
+    zones       INTEGER NOT NULL
+);
+"""
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """두 좌표 사이의 거리 (m, 등장방형 근사)."""
+    dy = (lat2 - lat1) * METERS_PER_DEG_LAT
+    dx = (lon2 - lon1) * METERS_PER_DEG_LAT * math.cos(math.radians((lat1 + lat2) / 2))
+    return math.hypot(dx, dy)
+
+
+def _nan_to_none(value):
+    return None if value is None or (isinstance(value, float) and math.isnan(value)) else value
+
+
+class ZoneStore:
+    """구역 지도 데이터베이스. with 문으로 쓰거나 다 쓴 뒤 close() 를 부르세요."""
+
+    def __init__(self, path=ZONE_DB_PATH, merge_radius_m=MERGE_RADIUS_M):
+        self.path = path
+        self.merge_radius_m = merge_radius_m
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def has_session(self, session):
+        return self.conn.execute("SELECT 1 FROM sessions WHERE name = ?", (session,)).fetchone() is not None
+
+    def ingest(self, session, zones_df):
+        """
+        세션 하나의 구역 표(type, lat, lon [, points_count, max_variance, avg_pitch])를 지도에 합칩니다.
+        이미 넣은 세션은 중복으로 세지 않도록 건너뜁니다. 반환값: (합쳐진 구역 수, 새로 만든 구역 수)
+        """
+        if self.has_session(session):
+            return 0, 0
+        merged = inserted = 0
+        with self.conn:   # 세션 하나를 한 트랜잭션으로
+            for zone in zones_df.to_dict('records') if zones_df is not None else []:
+                if self._upsert(zone, session):
+                    merged += 1
+                else:
+                    inserted += 1
+            self.conn.execute("INSERT INTO sessions VALUES (?, ?, ?)",
+                              (session, time.time_ns(), 0 if zones_df is None else len(zones_df)))
+        return merged, inserted
+
+    def _upsert(self, zone, session):
+        lat, lon = float(zone['lat']), float(zone['lon'])
+        # 가중 평균의 분모(total)가 0 이하가 되지 않도록 관측 점 수는 1 이상으로 봅니다.
+        points = max(int(_nan_to_none(zone.get('points_count')) or 1), 1)
+        variance = _nan_to_none(zone.get('max_variance'))
+        pitch = _nan_to_none(zone.get('avg_pitch'))
+
+        nearest = self._nearest(zone['type'], lat, lon)
+        if nearest is None:
+            cur = self.conn.execute(
+                "INSERT INTO zones (type, lat, lon, observations, points_count, max_variance, avg_pitch,"
+                " first_session, last_session) VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)",
+                (zone['type'], lat, lon, points, variance, pitch, session, session))
+            self.conn.execute("INSERT INTO zone_index VALUES (?, ?, ?, ?, ?)", (cur.lastrowid, lat, lat, lon, lon))
+            return False
+
+        zone_id, old_lat, old_lon, observations, old_points, old_variance, old_pitch = nearest
+        old_points = max(old_points or 0, 0)
+        total = old_points + points
+        new_lat = (old_lat * old_points + lat * points) / total
+        new_lon = (old_lon * old_points + lon * points) / total
+        if old_variance is not None and variance is not None:
+            variance = max(old_variance, variance)
+        elif variance is None:
+            variance = old_variance
+        if old_pitch is not None and pitch is not None:
+            pitch = (old_pitch * old_points + pitch * points) / total
+        elif pitch is None:
+            pitch = old_pitch
+        self.conn.execute(
+            "UPDATE zones SET lat = ?, lon = ?, observations = ?, points_count = ?, max_variance = ?, avg_pitch = ?,"
+            " last_session = ? WHERE id = ?",
+            (new_lat, new_lon, observations + 1, total, variance, pitch, session, zone_id))
+        self.conn.execute("UPDATE zone_index SET min_lat = ?, max_lat = ?, min_lon = ?, max_lon = ? WHERE id = ?",
+                          (new_lat, new_lat, new_lon, new_lon, zone_id))
+        return True
+
+    def _nearest(self, zone_type, lat, lon):
+        """병합 반경 안에서 같은 종류의 가장 가까운 구역. R*Tree 로 반경을 감싸는 사각형 안의 후보만 봅니다."""
+        dlat = self.merge_radius_m / METERS_PER_DEG_LAT
+        dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        rows = self.conn.execute(
+            "SELECT z.id, z.lat, z.lon, z.observations, z.points_count, z.max_variance, z.avg_pitch"
+            " FROM zone_index i JOIN zones z ON z.id = i.id"
+            " WHERE i.max_lat >= ? AND i.min_lat <= ? AND i.max_lon >= ? AND i.min_lon <= ? AND z.type = ?",
+            (lat - dlat, lat + dlat, lon - dlon, lon + dlon, zone_type)).fetchall()
+        best, best_distance = None, self.merge_radius_m
+        for row in rows:
+            d = distance_m(lat, lon, row[1], row[2])
+            if d <= best_distance:
+                best, best_distance = row, d
+        return best
+
+    def data_version(self):
+        """데이터가 바뀌었는지 확인하기 위한 값 (넣은 세션 수, 마지막으로 넣은 시각). 세션이 들어올 때마다 바뀝니다."""
+        return self.conn.execute("SELECT COUNT(*), COALESCE(MAX(ingested_ns), 0) FROM sessions").fetchone()
+
+    def zones_in_bbox(self, lat_min, lat_max, lon_min, lon_max):
+        """사각형 영역 안의 구역을 DataFrame 으로 반환합니다. (지도 화면에 보이는 구역 조회용)"""
+        rows = self.conn.execute(
+            f"SELECT {', '.join('z.' + col for col in ZONE_COLUMNS)} FROM zone_index i JOIN zones z ON z.id = i.id"
+            " WHERE i.max_lat >= ? AND i.min_lat <= ? AND i.max_lon >= ? AND i.min_lon <= ?",
+            (lat_min, lat_max, lon_min, lon_max)).fetchall()
+        return pd.DataFrame(rows, columns=ZONE_COLUMNS)
+
+    def all_zones(self):
+        return pd.read_sql_query(f"SELECT {', '.join(ZONE_COLUMNS)} FROM zones ORDER BY id", self.conn)
+
+
+def ingest_zone_files(paths, db_path=ZONE_DB_PATH, merge_radius_m=MERGE_RADIUS_M):
+    """<세션>_zones.csv 파일들(batch_analysis.py 결과)을 지도 데이터베이스에 넣습니다."""
+    with ZoneStore(db_path, merge_radius_m) as store:
+        for path in paths:
+            session = os.path.splitext(os.path.basename(path))[0]
+            session = session[:-len('_zones')] if session.endswith('_zones') else session
+            if store.has_session(session):
+                print(f"{session}: 이미 지도에 있는 세션이라 건너뜁니다.")
+                continue
+            zones = pd.read_csv(path)
+            if not {'lat', 'lon'} <= set(zones.columns):
+                print(f"{session}: 위경도(lat, lon) 구역이 아니라 건너뜁니다. (실내 PDR 좌표 등)")
+                continue
+            merged, inserted = store.ingest(session, zones)
+            print(f"{session}: 구역 {len(zones)}개 -> 기존 구역과 병합 {merged}개, 새 구역 {inserted}개")
+        total = store.conn.execute("SELECT COUNT(*) FROM zones").fetchone()[0]
+    print(f"✅ 지도 '{db_path}' 의 구역은 모두 {total}개입니다.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="세션별 구역 표를 하나의 구역 지도 데이터베이스로 합칩니다.")
+    parser.add_argument('--db', default=ZONE_DB_PATH, help="데이터베이스 파일 (기본: %(default)s)")
+    parser.add_argument('--radius', type=float, default=MERGE_RADIUS_M, help="병합 반경 m (기본: %(default)s)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    add = sub.add_parser('add', help="구역 표(csv)들을 넣습니다")
+    add.add_argument('paths', nargs='+')
+    export = sub.add_parser('export', help="합쳐진 구역 전체를 csv 로 내보냅니다")
+    export.add_argument('csv_path')
+    args = parser.parse_args()
+
+    if args.command == 'add':
+        ingest_zone_files(args.paths, args.db, args.radius)
+    else:
+        with ZoneStore(args.db, args.radius) as store:
+            store.all_zones().to_csv(args.csv_path, index=False)
+        print(f"✅ '{args.csv_path}' 파일로 내보냈습니다.")